@@ -0,0 +1,46 @@
+"""vehicles keyset pagination and plate prefix indexes
+
+Revision ID: 5b7e2a91c4d0
+Revises: c39df08ba1c4
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e2a91c4d0'
+down_revision: Union[str, Sequence[str], None] = 'c39df08ba1c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_vehicles_created_at_id',
+        'vehicles',
+        [sa.text('created_at DESC'), sa.text('id DESC')],
+    )
+    op.create_index(
+        'ix_vehicles_active_created_at_id',
+        'vehicles',
+        [sa.text('created_at DESC'), sa.text('id DESC')],
+        postgresql_where=sa.text('is_active'),
+    )
+    op.create_index(
+        'ix_vehicles_license_plate_prefix',
+        'vehicles',
+        ['license_plate'],
+        postgresql_ops={'license_plate': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_vehicles_license_plate_prefix', table_name='vehicles')
+    op.drop_index('ix_vehicles_active_created_at_id', table_name='vehicles')
+    op.drop_index('ix_vehicles_created_at_id', table_name='vehicles')
@@ -0,0 +1,61 @@
+"""add access_events (partitioned by month)
+
+Revision ID: 8f3c1d6e2a47
+Revises: 5b7e2a91c4d0
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3c1d6e2a47'
+down_revision: Union[str, Sequence[str], None] = '5b7e2a91c4d0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE TABLE access_events (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+            occurred_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            camera_id VARCHAR(64),
+            event_id VARCHAR(64),
+            track_id INTEGER,
+            plate VARCHAR(20),
+            vehicle_id INTEGER,
+            decision VARCHAR(32) NOT NULL,
+            decision_latency_ms DOUBLE PRECISION,
+            recognition_latency_ms DOUBLE PRECISION,
+            snapshot VARCHAR(255),
+            PRIMARY KEY (id, occurred_at)
+        ) PARTITION BY RANGE (occurred_at)
+    """)
+    op.create_index('ix_access_events_occurred_at', 'access_events', ['occurred_at'])
+    op.create_index('ix_access_events_camera_occurred_at', 'access_events', ['camera_id', 'occurred_at'])
+    # строки вне месячных секций не теряются
+    op.execute("CREATE TABLE access_events_default PARTITION OF access_events DEFAULT")
+
+    # дальше секции создаёт приложение (AccessEventRepository.ensure_partitions)
+    current = date.today().replace(day=1)
+    for i in range(2):
+        start = _add_months(current, i)
+        op.execute(
+            f"CREATE TABLE access_events_{start:%Y%m} PARTITION OF access_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{_add_months(start, 1).isoformat()}')"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE access_events CASCADE")
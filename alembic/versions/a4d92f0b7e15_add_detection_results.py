@@ -0,0 +1,40 @@
+"""add detection_results
+
+Revision ID: a4d92f0b7e15
+Revises: 8f3c1d6e2a47
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d92f0b7e15'
+down_revision: Union[str, Sequence[str], None] = '8f3c1d6e2a47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('detection_results',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('source', sa.String(length=64), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.Column('description', sa.String(length=1000), nullable=False),
+    sa.Column('link', sa.String(length=500), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_detection_results_created_at_id', 'detection_results', [sa.text('created_at DESC'), sa.text('id DESC')])
+    op.create_index('ix_detection_results_source_created_at', 'detection_results', ['source', sa.text('created_at DESC')])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_detection_results_source_created_at', table_name='detection_results')
+    op.drop_index('ix_detection_results_created_at_id', table_name='detection_results')
+    op.drop_table('detection_results')
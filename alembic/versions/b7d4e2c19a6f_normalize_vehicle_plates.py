@@ -0,0 +1,53 @@
+"""normalize vehicle license plates
+
+Revision ID: b7d4e2c19a6f
+Revises: e6b1f3a9c2d8
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e2c19a6f'
+down_revision: Union[str, Sequence[str], None] = 'e6b1f3a9c2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# копия database.schemas.vehicle.normalize_plate на момент миграции
+_PLATE_TRANSLIT = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+_PLATE_RE = re.compile(r"^[A-Z0-9]{1,20}$")
+
+
+def _normalize(value: str) -> str | None:
+    plate = re.sub(r"[\s\-_.]", "", value).upper().translate(_PLATE_TRANSLIT)
+    return plate if _PLATE_RE.match(plate) else None
+
+
+def upgrade() -> None:
+    """Upgrade data: plates added via POST /vehicles were stored as typed."""
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT id, license_plate FROM vehicles ORDER BY id")).all()
+    taken = {plate for _, plate in rows}
+    for vehicle_id, plate in rows:
+        normalized = _normalize(plate)
+        if normalized is None or normalized == plate:
+            continue
+        if normalized in taken:
+            # такой номер уже есть (например, из импорта) — дубль оставляем как есть
+            print(f"vehicles: {plate!r} (id={vehicle_id}) duplicates {normalized!r}, left unchanged")
+            continue
+        conn.execute(
+            sa.text("UPDATE vehicles SET license_plate = :plate WHERE id = :id"),
+            {"plate": normalized, "id": vehicle_id},
+        )
+        taken.discard(plate)
+        taken.add(normalized)
+
+
+def downgrade() -> None:
+    """Исходное написание номеров не сохраняется — откатывать нечего."""
@@ -0,0 +1,33 @@
+"""add trace and event_id index to access_events
+
+Revision ID: e6b1f3a9c2d8
+Revises: a4d92f0b7e15
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b1f3a9c2d8'
+down_revision: Union[str, Sequence[str], None] = 'a4d92f0b7e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # колонка добавляется к родительской таблице и сразу ко всем секциям
+    op.add_column('access_events', sa.Column('trace', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    # трейс ищется по event_id; индекс на родителе создаётся во всех секциях
+    op.create_index('ix_access_events_event_occurred_at', 'access_events', ['event_id', 'occurred_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_access_events_event_occurred_at', table_name='access_events')
+    op.drop_column('access_events', 'trace')
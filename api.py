@@ -1,42 +1,66 @@
+import importlib
 import threading
 import redis
-import httpx
+import redis.asyncio as aioredis
 import uvicorn
 import base64
-import cv2, base64, numpy as np
 import time
-import requests
 
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends, status, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, status, Query, Request, Response, WebSocket, WebSocketDisconnect
 import asyncio
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials, HTTPBearer
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, List, Dict, Literal, Any
-from uuid import uuid4
-from io import BytesIO
-from PIL import Image
-from ultralytics import YOLO
+from typing import TYPE_CHECKING, Optional, List, Dict, Literal, Any, Tuple
 from models import *
-from update_yolo_class import YoloClass
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 from database.schemas import *
 from database.uow import UnitOfWork
-from database.models import User
+from database.models import DetectionResult, User
+from database.security import create_session_token, decode_session_token
+from database.repositories.access_events import add_months, month_start
+from sqlalchemy import text
 from utils.settings_manager import (
     load_detection_settings,
     update_detection_settings,
     get_public_detection_settings,
+    start_settings_watcher,
+    stop_settings_watcher,
+    subscribe as subscribe_detection_settings,
 )
-from utils.video_stream import VideoStreamManager
+from utils.single_flight import SingleFlight
+from utils.metrics import METRICS_CONTENT_TYPE, STREAM_CLIENTS, record_error, render_metrics, timed_call, watch_queue
+from utils.tracing import Trace, traces
+from utils.profiler import Profiler, ProfilerBusy
+from utils.results_store import ResultsTail
+from utils.snapshot_writer import SNAPSHOT_ROOT, SnapshotWriter
+from utils.write_behind import WriteBehindQueue
+from utils.barrier_controller import BarrierController, BARRIER_STATUS_KEY
+from utils.vehicle_events import decode_event, vehicle_crop_key, vehicle_event_key, vehicle_in_key
+from utils.pagination import CURSOR_HEADER, InvalidCursor, decode_cursor, encode_cursor
+from utils.vehicle_io import export_csv, export_ndjson, format_validation_errors, iter_import_records
+
+if TYPE_CHECKING:
+    # Тяжёлые модули (ultralytics/torch, cv2, PIL) импортируются там, где
+    # используются, и заранее — в фоновом прогреве: старт API их не ждёт
+    import numpy as np
+    from PIL import Image
+    from ultralytics import YOLO
+    from update_yolo_class import YoloClass
+    from utils.video_stream import VideoStreamManager
 
 app = FastAPI()
-security = HTTPBasic()
-
-redis_server = redis.Redis(host="localhost", port=6379, db=0)
+# Basic (логин/пароль) или Bearer (сессионный токен из /auth)
+security = HTTPBasic(auto_error=False)
+bearer_security = HTTPBearer(auto_error=False)
+
+REDIS_URL = "redis://localhost:6379/0"
+redis_server = redis.Redis.from_url(REDIS_URL)
+# обработчики на event loop (решение о въезде, шлагбаум) ходят в Redis асинхронно
+async_redis = aioredis.from_url(REDIS_URL)
 CHATGPT_PLATE_URL = "http://localhost:8080/plate"
 
 
@@ -62,9 +86,9 @@ def ensure_admin_user(user: User):
     if user.role != ROLE_ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
 
-@app.on_event("startup")
 async def _ensure_admin_and_demo():
     # Try to create admin user if DB is reachable
+    # (в фоне, см. _start_warmup: недоступная БД не задерживает старт)
     try:
         async with UnitOfWork()() as uow:
             existing = await uow.users.by_email(ADMIN_EMAIL)
@@ -74,6 +98,46 @@ async def _ensure_admin_and_demo():
         print(f"Startup DB check skipped: {e}")
 
 
+@app.on_event("startup")
+async def _start_barrier_controller():
+    barrier_controller.start()
+
+
+@app.on_event("shutdown")
+async def _stop_barrier_controller():
+    await barrier_controller.stop()
+    await async_redis.close()
+
+
+@app.on_event("startup")
+async def _start_access_log():
+    access_log.start()
+    results_log.start()
+    app.state.access_events_maintenance = asyncio.create_task(_access_events_maintenance())
+
+
+@app.on_event("shutdown")
+async def _stop_access_log():
+    app.state.access_events_maintenance.cancel()
+    await access_log.stop()
+    await results_log.stop()
+
+
+@app.on_event("shutdown")
+async def _flush_snapshots():
+    await asyncio.to_thread(snapshot_writer.flush)
+
+
+@app.on_event("startup")
+async def _start_settings_watcher():
+    start_settings_watcher()
+
+
+@app.on_event("shutdown")
+async def _stop_settings_watcher():
+    stop_settings_watcher()
+
+
 
 # Настройка разрешенных доменов
 origins = [
@@ -96,6 +160,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Or specify: ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
     allow_headers=["*"],  # Or specify: ["Content-Type", "Authorization"]
+    expose_headers=[CURSOR_HEADER],
 )
 
 
@@ -118,11 +183,36 @@ YOLO_MODELS_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 app.mount(DEMO_STATIC_ROUTE, StaticFiles(directory=str(DEMO_DIR)), name="demo-files")
 
+# Снимки въездов: пишутся детектором в фоне, раздаются по /snapshots/<путь>
+SNAPSHOTS_ROUTE = "/snapshots"
+snapshot_writer = SnapshotWriter.default()
+app.mount(SNAPSHOTS_ROUTE, StaticFiles(directory=str(SNAPSHOT_ROOT)), name="snapshots")
+
+
+def snapshot_url(path: Optional[str]) -> str:
+    return f"{SNAPSHOTS_ROUTE.lstrip('/')}/{path}" if path else ""
+
 ALLOWED_DEMO_VIDEO_TYPES = {"video/mp4", "video/webm", "video/ogg"}
 MAX_DEMO_VIDEO_SIZE_MB = 200
 
-# Простейшее «хранилище» результатов в памяти
-RESULTS_DB: List[Dict] = []
+# Результаты: последние — в памяти (ResultsTail), все — в БД, запись пачками в фоне
+RESULTS_TAIL_SIZE = 500
+results_tail = ResultsTail(max_items=RESULTS_TAIL_SIZE)
+
+
+async def _write_results(batch: List[Dict[str, Any]]) -> None:
+    async with UnitOfWork()() as uow:
+        await uow.results.add_many(batch)
+
+
+results_log = WriteBehindQueue(_write_results, name="detection_results")
+
+
+def record_result(source: str, title: str = "", description: str = "", link: str = "") -> Dict[str, Any]:
+    result = ResultsTail.new_result(source=source, title=title, description=description, link=link)
+    results_tail.add(result)
+    results_log.put(result)
+    return result
 
 def resolve_model_path(model_name: str) -> Path:
     candidate = YOLO_MODELS_DIR / model_name
@@ -134,7 +224,9 @@ def resolve_model_path(model_name: str) -> Path:
     return Path(DEFAULT_YOLO_MODEL)
 
 
-def load_yolo_model(model_name: str) -> YOLO:
+def load_yolo_model(model_name: str) -> "YOLO":
+    from ultralytics import YOLO
+
     model_path = resolve_model_path(model_name)
     return YOLO(str(model_path))
 
@@ -142,11 +234,10 @@ def load_yolo_model(model_name: str) -> YOLO:
 current_detection_settings = load_detection_settings()
 # model is loaded lazily to avoid blocking startup
 model_name = current_detection_settings.get("detectionModel", DEFAULT_YOLO_MODEL)
-model: Optional[YOLO] = None
+model: Optional["YOLO"] = None
 
-def get_model() -> YOLO:
+def get_model() -> "YOLO":
     global model
-    global model_name
     if model is None:
         try:
             model = load_yolo_model(model_name)
@@ -155,8 +246,132 @@ def get_model() -> YOLO:
             raise
     return model
 
-video_stream_manager = VideoStreamManager(DEMO_DIR, load_yolo_model)
-video_stream_manager.update_settings(current_detection_settings, restart=False)
+# Менеджер потока создаётся при первом обращении: он тянет cv2 и открывает источник
+video_stream_manager: Optional["VideoStreamManager"] = None
+_video_stream_lock = threading.Lock()
+
+
+def get_video_stream_manager() -> "VideoStreamManager":
+    global video_stream_manager
+    with _video_stream_lock:
+        if video_stream_manager is None:
+            from utils.video_stream import VideoStreamManager
+
+            video_stream_manager = VideoStreamManager(DEMO_DIR, load_yolo_model)
+    return video_stream_manager
+
+
+STREAM_CLIENTS.labels("video_stream").set_function(
+    lambda: video_stream_manager.active_clients if video_stream_manager is not None else 0
+)
+
+
+# ----------------------------------------------------------------------
+# Прогрев после старта: импорты и модели, которые реально работают, — в фоне.
+# API отвечает сразу, состояние прогрева видно в /health/ready
+# ----------------------------------------------------------------------
+WARMUP_ON_STARTUP = True
+WARMUP_IMGSZ = 640
+WARMUP_RETRY_SECONDS = 30
+# модель детекторов из /start_detection
+DETECTOR_MODEL = "yolo11n.pt"
+warmup_state: Dict[str, Any] = {"status": "pending", "models": [], "error": None, "attempts": 0, "duration_ms": None}
+
+# Прогретые экземпляры моделей для детекторов: path -> YOLO. У каждого детектора
+# свой экземпляр (трекер хранит состояние в модели), поэтому запуск детекции
+# забирает готовый, а следующий догревается в фоне
+_warm_models: Dict[str, "YOLO"] = {}
+_warm_models_lock = threading.Lock()
+
+
+def prepare_detector_model(model_path: str) -> None:
+    with _warm_models_lock:
+        if model_path in _warm_models:
+            return
+    import numpy as np
+    from ultralytics import YOLO
+
+    m = YOLO(model_path)
+    # первый инференс инициализирует бэкенд (fuse слоёв, CUDA/MKL)
+    m.predict(np.zeros((WARMUP_IMGSZ, WARMUP_IMGSZ, 3), dtype=np.uint8), verbose=False)
+    with _warm_models_lock:
+        _warm_models.setdefault(model_path, m)
+
+
+def take_detector_model(model_path: str) -> Optional["YOLO"]:
+    """Прогретая модель для нового детектора или None (тогда YoloClass загрузит сам)."""
+    with _warm_models_lock:
+        m = _warm_models.pop(model_path, None)
+    if m is not None and WARMUP_ON_STARTUP:
+        threading.Thread(target=_refill_detector_model, args=(model_path,), name="model-warmup", daemon=True).start()
+    return m
+
+
+def _refill_detector_model(model_path: str) -> None:
+    try:
+        prepare_detector_model(model_path)
+    except Exception as e:
+        print(f"Detector model warmup failed for '{model_path}': {e}")
+
+
+def warm_up() -> None:
+    started = time.perf_counter()
+    warmup_state.update(status="running", error=None)
+    warmup_state["attempts"] += 1
+    try:
+        # первый импорт ultralytics/torch и cv2 — секунды; платим здесь, а не на запросе
+        for module in ("cv2", "httpx", "update_yolo_class"):
+            importlib.import_module(module)
+
+        prepare_detector_model(DETECTOR_MODEL)
+        models = [DETECTOR_MODEL]
+        manager = get_video_stream_manager()
+        # файл-источник поток отдаёт без детекции — модель ему не нужна
+        if manager.settings.get("sourceType") == "rtsp":
+            models.append(manager.warm_up())
+    except Exception as e:
+        warmup_state.update(status="failed", error=f"{type(e).__name__}: {e}")
+    else:
+        warmup_state.update(status="ready", models=models)
+    finally:
+        warmup_state["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _warm_up_until_ready() -> None:
+    # веса могут появиться позже (том ещё монтируется) — повторяем
+    while True:
+        await asyncio.to_thread(warm_up)
+        if warmup_state["status"] != "failed":
+            return
+        print(f"Warmup failed, retrying in {WARMUP_RETRY_SECONDS}s: {warmup_state['error']}")
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
+
+
+@app.on_event("startup")
+async def _start_warmup():
+    app.state.startup_db_check = asyncio.create_task(_ensure_admin_and_demo())
+    app.state.warmup = None
+    if WARMUP_ON_STARTUP:
+        app.state.warmup = asyncio.create_task(_warm_up_until_ready())
+    else:
+        warmup_state["status"] = "disabled"
+
+
+@app.on_event("shutdown")
+async def _stop_warmup():
+    if app.state.warmup is not None:
+        app.state.warmup.cancel()
+
+
+def _on_detection_settings_changed(settings: Dict, previous: Dict) -> None:
+    # сменилась модель — сбрасываем кэш, загрузится лениво при первом вызове
+    global model, model_name
+    if settings.get("detectionModel") != previous.get("detectionModel"):
+        model_name = settings.get("detectionModel", DEFAULT_YOLO_MODEL)
+        model = None
+
+
+subscribe_detection_settings(_on_detection_settings_changed)
 
 
 class WidgetPreferencesPayload(BaseModel):
@@ -202,16 +417,21 @@ def detection_response(settings: Dict[str, Any], mask_rtsp: bool = False) -> Det
 
 NOMEROFF_URL = "http://localhost:8182/nomer"  # сервис A
 
-def pil_to_bgr(img: Image.Image) -> np.ndarray:
+def pil_to_bgr(img: "Image.Image") -> "np.ndarray":
+    import cv2
+    import numpy as np
+
     return cv2.cvtColor(np.asarray(img), cv2.COLOR_RGB2BGR)
 
-def bgr_to_b64_jpg(img: np.ndarray) -> str:
+def bgr_to_b64_jpg(img: "np.ndarray") -> str:
+    import cv2
+
     ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
     if not ok:
         raise RuntimeError("cv2.imencode failed")
     return base64.b64encode(buf.tobytes()).decode("utf-8")
 
-def overlay_yolo(img_bgr: np.ndarray) -> np.ndarray:
+def overlay_yolo(img_bgr: "np.ndarray") -> "np.ndarray":
     """Быстро нанесём YOLO-предсказания на картинку."""
     try:
         m = get_model()
@@ -220,7 +440,9 @@ def overlay_yolo(img_bgr: np.ndarray) -> np.ndarray:
     results = m(img_bgr)
     return results[0].plot()  # BGR ndarray
 
-def overlay_plates(img_bgr: np.ndarray, detections: List[Dict]) -> np.ndarray:
+def overlay_plates(img_bgr: "np.ndarray", detections: List[Dict]) -> "np.ndarray":
+    import cv2
+
     canvas = img_bgr.copy()
     for det in detections:
         if "bbox" in det:
@@ -232,7 +454,45 @@ def overlay_plates(img_bgr: np.ndarray, detections: List[Dict]) -> np.ndarray:
     return canvas
 
 
-async def get_current_user(credentials: HTTPBasicCredentials = Depends(security)) -> User:
+# Пользователь из токена перепроверяется по БД не реже раза в столько секунд:
+# удаление или смена роли действуют раньше, чем истечёт токен
+SESSION_USER_CACHE_TTL = 30
+_session_users: Dict[int, Tuple[float, Optional[User]]] = {}
+
+
+async def load_session_user(user_id: int) -> Optional[User]:
+    async with UnitOfWork()() as uow:
+        user = await uow.users.get(user_id)
+        if user is None:
+            return None
+        return User(id=user.id, email=user.email, role=user.role)
+
+
+async def _user_from_session_token(token: str) -> Optional[User]:
+    """Пользователь из подписанного токена — без Argon2; роль и наличие — из БД (с кэшем)."""
+    claims = decode_session_token(token)
+    if not claims:
+        return None
+    user_id = claims["sub"]
+    cached = _session_users.get(user_id)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    user = await load_session_user(user_id)
+    _session_users[user_id] = (time.monotonic() + SESSION_USER_CACHE_TTL, user)
+    return user
+
+
+async def get_current_user(
+    bearer: Optional[HTTPAuthorizationCredentials] = Depends(bearer_security),
+    credentials: Optional[HTTPBasicCredentials] = Depends(security),
+) -> User:
+    if bearer is not None:
+        user = await _user_from_session_token(bearer.credentials)
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid or expired session token")
+        return user
+    if credentials is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Basic"})
     async with UnitOfWork()() as uow:
         user = await uow.users.check_credentials(credentials.username, credentials.password)
         if not user:
@@ -241,8 +501,12 @@ async def get_current_user(credentials: HTTPBasicCredentials = Depends(security)
 
 
 async def authenticate_token(token: str) -> User:
+    """token: сессионный токен из /auth или base64("email:password")."""
     if not token:
         raise HTTPException(status_code=401, detail="Missing token")
+    user = await _user_from_session_token(token)
+    if user:
+        return user
     try:
         decoded = base64.b64decode(token).decode("utf-8")
     except Exception:
@@ -277,13 +541,14 @@ async def list_users(limit: int = 50, offset: int = 0, current_user: User = Depe
         return users
 
 
-@app.post("/auth", response_model=UserRead)
+@app.post("/auth", response_model=AuthResponse)
 async def auth_user(payload: AuthRequest):
     async with UnitOfWork()() as uow:
         user = await uow.users.check_credentials(payload.email, payload.password)
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
-        return user
+        token, expires_in = create_session_token(user.id, user.email, user.role)
+        return AuthResponse(id=user.id, email=user.email, role=user.role, access_token=token, expires_in=expires_in)
 
 # ----------------------------------------------------------------------
 # Эндпоинт: получить crop одного авто по vehicle_id
@@ -327,122 +592,432 @@ async def get_vehicle_plate(payload: PlateRequest):
         "file": ("crop.jpg", frame, "image/jpeg")
     }
 
+    import httpx
     async with httpx.AsyncClient(timeout=40) as client:
         resp = await client.post(CHATGPT_PLATE_URL, files=files)
         resp.raise_for_status()
         return resp.json()
 
 
+class ZoneConfig(BaseModel):
+    name: str
+    points: List[Tuple[int, int]] = Field(min_length=3)
+
+
+class LineConfig(BaseModel):
+    name: str
+    p1: Tuple[int, int]
+    p2: Tuple[int, int]
+
+
+class ZonesPayload(BaseModel):
+    zones: List[ZoneConfig] = []
+    lines: List[LineConfig] = []
+    trigger_zone: str = "region"   # зона въезда для crop'а и шлагбаума
+
+
 class StartDetectionYolo(BaseModel):
     source: str           # путь к видео или rtsp
     camera_id: str
     skip_frames: int = 1
     resize_w: int | None = None
     resize_h: int | None = None
+    crop_max_side: int = Field(default=640, ge=64)
+    crop_mode: Literal["vehicle", "plate_area"] = "vehicle"
+    # несколько зон/линий на одной камере; без zones используется регион по умолчанию
+    zones: List[ZoneConfig] | None = None
+    lines: List[LineConfig] = []
+    trigger_zone: str = "region"
+    # антидребезг въезда/выезда: кадров подряд в зоне / вне зоны,
+    # секунд без детекции до выезда
+    enter_frames: int = Field(default=2, ge=1)
+    exit_frames: int = Field(default=5, ge=1)
+    exit_grace: float = Field(default=1.5, ge=0)
+    # между кадрами инференса (skip_frames > 1) боксы экстраполируются,
+    # поток и проверка региона идут с частотой камеры
+    interpolate: bool = False
+    # адаптивный инференс: при заданном бюджете задержки skip_frames, imgsz
+    # и модель (из model_tiers, от точной к быстрой) подбираются автоматически
+    imgsz: int | None = Field(default=None, ge=32)
+    latency_budget_ms: float | None = Field(default=None, gt=0)
+    model_tiers: List[str] = []
+    max_skip: int = Field(default=10, ge=1)
+    # каскад: быстрая модель трекает всё, точная (например yolo11l.pt) уточняет
+    # боксы у региона (cascade_margin px) и с уверенностью ниже cascade_conf
+    cascade_model: str | None = None
+    cascade_margin: int = Field(default=80, ge=0)
+    cascade_conf: float = Field(default=0.5, ge=0, le=1)
 
 barrier = False
 
 
-async def get_available():
-    """Проверяет доступность номера, используя список из базы данных"""
-    # Получаем список активных номеров из базы данных
+# ----------------------------------------------------------------------
+# Журнал въездов: запись пачками в фоне, путь решения не ждёт БД
+# ----------------------------------------------------------------------
+ACCESS_EVENTS_RETENTION_MONTHS = 12
+ACCESS_EVENTS_MAINTENANCE_INTERVAL = 6 * 3600
+
+
+async def _write_access_events(batch: List[Dict[str, Any]]) -> None:
+    # трейс сериализуется при записи, а не при решении: к этому моменту
+    # в нём уже есть подъём шлагбаума
+    rows = [{**row, "trace": row["trace"].to_dict() if row.get("trace") else None} for row in batch]
     async with UnitOfWork()() as uow:
-        available_plates = await uow.vehicles.get_active_plates()
-    
-    if not available_plates:
-        return {"status": "no_vehicle"}  # Нет разрешенных номеров в базе
+        await uow.access_events.add_many(rows)
+
+
+access_log = WriteBehindQueue(_write_access_events, name="access_events")
+
+
+def log_access_event(
+    event: Dict[str, Any],
+    decision: str,
+    plate: Optional[str] = None,
+    vehicle_id: Optional[int] = None,
+    recognition_latency_ms: Optional[float] = None,
+    trace: Optional[Trace] = None,
+) -> None:
+    entered_at = event.get("ts")
+    access_log.put({
+        "occurred_at": datetime.fromtimestamp(entered_at) if entered_at else datetime.now(),
+        "camera_id": event.get("camera_id"),
+        "event_id": event.get("event_id"),
+        "track_id": event.get("track_id"),
+        "plate": plate,
+        "vehicle_id": vehicle_id,
+        "decision": decision,
+        "decision_latency_ms": (time.time() - entered_at) * 1000 if entered_at else None,
+        "recognition_latency_ms": recognition_latency_ms,
+        "snapshot": event.get("snapshot"),
+        "trace": trace,
+    })
+
+
+async def _access_events_maintenance() -> None:
+    """Секции на текущий и следующий месяц; старше срока хранения — DROP."""
+    while True:
+        # отдельные транзакции: ошибка создания секций не отменяет удаление старых
+        try:
+            async with UnitOfWork()() as uow:
+                await uow.access_events.ensure_partitions(months_ahead=1)
+        except Exception as e:
+            record_error("access_events_partitions", e)
+            print(f"access_events: failed to create partitions, new rows go to the default partition: {e}")
+        cutoff = add_months(month_start(datetime.now().date()), -ACCESS_EVENTS_RETENTION_MONTHS)
+        try:
+            async with UnitOfWork()() as uow:
+                dropped = await uow.access_events.drop_partitions_before(cutoff)
+            if dropped:
+                print(f"access_events: dropped partitions {dropped}")
+        except Exception as e:
+            record_error("access_events_retention", e)
+            print(f"access_events: failed to drop partitions older than {cutoff}: {e}")
+        await asyncio.sleep(ACCESS_EVENTS_MAINTENANCE_INTERVAL)
 
-    # Ждем появления ключа в Redis (макс 30 секунд)
-    timeout = 30
-    interval = 0.5
-    waited = 0
-    data = None
+
+# Решение о доступе считается один раз на событие въезда (camera_id + event_id)
+# и раздаётся всем одновременным запросам; на время визита оно кэшируется.
+ACCESS_DECISION_TTL = 120
+access_decisions = SingleFlight(ttl=ACCESS_DECISION_TTL, max_items=256)
+
+
+async def wait_vehicle_event(camera_id: Optional[str] = None, timeout: float = 30, interval: float = 0.5) -> Optional[Dict[str, Any]]:
+    """Ждет появления события въезда в Redis (макс timeout секунд)"""
+    waited = 0.0
     while waited < timeout:
-        data = redis_server.get("vehicle_in")
-        if data:
-            break
+        event = decode_event(await async_redis.get(vehicle_event_key(camera_id)))
+        if event:
+            return event
         waited += interval
         await asyncio.sleep(interval)
+    return None
+
+
+ACCESS_STATUS_TEXT = {
+    "available": "Проезд разрешён",
+    "not_available": "Номер не в списке",
+    "no_vehicle": "Нет машины или списка номеров",
+    "error": "Ошибка распознавания",
+}
+
+
+async def decide_access(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Распознаёт номер по crop события и сверяет его со списком из базы данных"""
+    decision = {"camera_id": event.get("camera_id"), "event_id": event.get("event_id")}
+    recognized = {"plate": None, "vehicle_id": None, "recognition_latency_ms": None}
+    # продолжение трейса кадра из детектора: доставка события, БД, OCR, решение
+    trace = traces.start(event)
+
+    def mark(stage: str) -> None:
+        if trace is not None:
+            trace.mark(stage)
+
+    mark("deliver")
+
+    def done(status: str) -> Dict[str, Any]:
+        mark("decision")
+        log_access_event(event, status, trace=trace, **recognized)
+        record_result(
+            source=event.get("camera_id") or "-",
+            title=recognized["plate"] or "",
+            description=ACCESS_STATUS_TEXT.get(status, status),
+            link=snapshot_url(event.get("snapshot")),
+        )
+        return {"status": status, **decision}
 
-    if not data:
-        return {"status": "no_vehicle"}  # ключ так и не появился
+    # Получаем список активных номеров из базы данных
+    with timed_call("db"):
+        async with UnitOfWork()() as uow:
+            available_plates = await uow.vehicles.get_active_plate_ids()
+    mark("db")
 
-    # Декодируем изображение
-    nparr = np.frombuffer(data, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    success, buffer = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 92])
+    if not available_plates:
+        return done("no_vehicle")  # Нет разрешенных номеров в базе
+
+    # crop именно этого въезда; ключ камеры — только для событий без event_id
+    if event.get("event_id"):
+        data = await async_redis.get(vehicle_crop_key(event.get("camera_id"), event["event_id"]))
+    else:
+        data = await async_redis.get(vehicle_in_key(event.get("camera_id")))
+    mark("crop_fetch")
+    if not data:
+        return done("no_vehicle")  # машина уже уехала
 
-    files = {"file": ("vehicle.jpg", buffer.tobytes(), "image/jpeg")}
+    # Детектор уже кладёт в Redis готовый JPEG crop — отправляем как есть
+    files = {"file": ("vehicle.jpg", data, "image/jpeg")}
 
     print(f"Отправка на {NOMEROFF_URL} ...")
-    response = requests.post(NOMEROFF_URL, files=files)
-    result = response.json()
+    import httpx  # уже загружен прогревом; на холодном старте — один раз
+    started = time.perf_counter()
+    try:
+        with timed_call("ocr"):
+            async with httpx.AsyncClient(timeout=40) as client:
+                response = await client.post(NOMEROFF_URL, files=files)
+            response.raise_for_status()
+            result = response.json()
+    except Exception as e:
+        # сбой OCR — обычное решение "error", а не 500 у клиента
+        print(f"Plate recognition failed for {decision}: {type(e).__name__}: {e}")
+        recognized["recognition_latency_ms"] = (time.perf_counter() - started) * 1000
+        mark("ocr")
+        return done("error")
+    recognized["recognition_latency_ms"] = (time.perf_counter() - started) * 1000
+    mark("ocr")
     plates = result.get("plates", [])
     for plate in plates:
         for frame in plate:
-            if frame in available_plates:
-                return {"status": "available"}
-    return {"status": "not_available"}
+            if recognized["plate"] is None:
+                recognized["plate"] = str(frame)[:20]
+            # в базе номера хранятся нормализованными (A123BC77) — сравниваем так же
+            candidate = try_normalize_plate(frame)
+            if candidate in available_plates:
+                recognized["plate"] = candidate
+                recognized["vehicle_id"] = available_plates[candidate]
+                return done("available")
+    return done("not_available")
+
+
+async def get_available(camera_id: Optional[str] = None):
+    """Проверяет доступность номера, используя список из базы данных"""
+    event = await wait_vehicle_event(camera_id)
+    if not event:
+        return {"status": "no_vehicle"}  # событие так и не появилось
+
+    return await decide_event(event)
+
+
+async def decide_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    key = (event.get("camera_id"), event.get("event_id"))
+    result = await access_decisions.do(key, lambda: decide_access(event))
+    if result.get("status") == "error":
+        # ошибку не кэшируем: повторный запрос по въезду снова спросит OCR
+        access_decisions.forget(key)
+    return result
+
+
+# Контроллер сам принимает решение при въезде машины в регион (Redis Pub/Sub)
+barrier_controller = BarrierController(async_redis, decide_event, redis_url=REDIS_URL)
 
 @app.get("/available_plate")
-async def get_available_plate():
-    return await get_available()
+async def get_available_plate(camera_id: Optional[str] = Query(None)):
+    return await get_available(camera_id)
+
+
+@app.get("/access-events", response_model=list[AccessEventRead])
+async def list_access_events(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    camera_id: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+):
+    """Журнал въездов, новые сверху; следующая страница — cursor из X-Next-Cursor"""
+    ensure_admin_user(current_user)
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (datetime, int))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    async with UnitOfWork()() as uow:
+        events = await uow.access_events.list(limit=limit, since=since, until=until, camera_id=camera_id, after=after)
+    if len(events) == limit:
+        response.headers[CURSOR_HEADER] = encode_cursor(events[-1].occurred_at, events[-1].id)
+    return events
+
+
+@app.get("/access-events/{event_id}/trace")
+async def get_access_event_trace(
+    event_id: str,
+    camera_id: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    current_user: User = Depends(get_current_user),
+):
+    """Стадии от захвата кадра до подъёма шлагбаума для события въезда (мс от захвата)"""
+    ensure_admin_user(current_user)
+    # свежие решения ещё могут быть в очереди записи — сначала память
+    trace = traces.get(camera_id, event_id) if camera_id else traces.find(event_id)
+    if trace is not None:
+        return {"event_id": event_id, "source": "memory", **trace.to_dict()}
+    async with UnitOfWork()() as uow:
+        event = await uow.access_events.get_by_event_id(event_id, since=since)
+    if event is None or event.trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"event_id": event_id, "source": "db", "decision": event.decision, **event.trace}
+
+
+@app.get("/access-events/queue")
+def get_access_log_queue(current_user: User = Depends(get_current_user)):
+    """Состояние фоновой записи журнала: в очереди, записано, потеряно"""
+    ensure_admin_user(current_user)
+    return access_log.stats()
+
+
+@app.get("/snapshot-store")
+def get_snapshot_store(current_user: User = Depends(get_current_user)):
+    """Состояние хранилища снимков: файлы, объём, очередь записи, удалённые по квоте"""
+    ensure_admin_user(current_user)
+    return snapshot_writer.stats()
+
+
+@app.get("/snapshot-store/search")
+def search_snapshots(
+    event_id: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user),
+):
+    """Поиск снимков по событию въезда, камере и времени (новые первыми)"""
+    ensure_admin_user(current_user)
+    rows = snapshot_writer.find(
+        event_id=event_id,
+        camera_id=camera_id,
+        since=since.timestamp() if since else None,
+        until=until.timestamp() if until else None,
+        limit=limit,
+    )
+    for row in rows:
+        row["created_at"] = datetime.fromtimestamp(row["created_at"])
+        row["url"] = snapshot_url(row["path"])
+    return rows
+
+
+# Глубины очередей считываются только при опросе /metrics
+watch_queue("access_log", lambda: access_log.stats()["pending"])
+watch_queue("detection_results", lambda: results_log.stats()["pending"])
+watch_queue("snapshots", lambda: snapshot_writer.pending())
+
+
+@app.get("/metrics")
+def metrics(current_user: User = Depends(get_current_user)):
+    """
+    Метрики Prometheus: стадии кадра по камерам, кадры, ошибки, клиенты потоков, очереди.
+    Только для администратора: в scrape-конфиге — basic_auth или authorization (токен из /auth).
+    """
+    ensure_admin_user(current_user)
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.get("/barrier/status")
 def get_barrier_status():
     """Получить текущий статус шлагбаума из Redis"""
-    status = redis_server.get("barrier_status")
+    status = redis_server.get(BARRIER_STATUS_KEY)
     if status:
         return {"status": status.decode("utf-8")}
     return {"status": "down"}
 
 
-def set_barrier_down_after_delay():
-    """Установить шлагбаум в положение 'down' через 10 секунд"""
-    time.sleep(10)
-    redis_server.set("barrier_status", "down")
-
-
 @app.get("/barrier/check")
-async def check_and_raise_barrier():
+async def check_and_raise_barrier(camera_id: Optional[str] = Query(None)):
     """Проверить доступность номера и автоматически поднять шлагбаум"""
-    result = await get_available()
+    result = await get_available(camera_id)
     
     if result.get("status") == "available":
-        # Устанавливаем статус "up" в Redis
-        redis_server.set("barrier_status", "up")
-        
-        # Запускаем поток для автоматического опускания через 10 секунд
-        thread = threading.Thread(target=set_barrier_down_after_delay)
-        thread.daemon = True
-        thread.start()
-        
+        # Поднимаем шлагбаум; опускание — таймер контроллера на event loop
+        barrier_controller.raise_barrier(result.get("camera_id"), event_id=result.get("event_id"))
         return {"status": "up", "message": "Шлагбаум поднят автоматически"}
     
     # Если не available, возвращаем текущий статус из Redis
-    current_status = redis_server.get("barrier_status")
+    current_status = await async_redis.get(BARRIER_STATUS_KEY)
     if current_status:
         return {"status": current_status.decode("utf-8")}
     
     return {"status": "down"}
 
 
+@app.get("/barrier/lanes")
+def get_barrier_lanes(current_user: User = Depends(get_current_user)):
+    """Состояние шлагбаумов по полосам и задержки принятия решений"""
+    ensure_admin_user(current_user)
+    return barrier_controller.status()
+
+
 # ----------------------------------------------------------------------
 # Эндпоинты для управления разрешенными номерами
 # ----------------------------------------------------------------------
 
 @app.get("/vehicles", response_model=list[VehicleRead])
 async def list_vehicles(
+    response: Response,
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0),
     active_only: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    plate_prefix: Optional[str] = Query(None, max_length=20),
     current_user: User = Depends(get_current_user)
 ):
-    """Получить список разрешенных номеров"""
+    """
+    Получить список разрешенных номеров.
+    Следующая страница — с cursor из заголовка X-Next-Cursor (нет заголовка — страниц больше нет).
+    """
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (datetime, int))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    prefix = None
+    if plate_prefix:
+        try:
+            prefix = normalize_plate(plate_prefix)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     async with UnitOfWork()() as uow:
-        vehicles = await uow.vehicles.list(limit=limit, offset=offset, active_only=active_only)
-        return vehicles
+        vehicles = await uow.vehicles.list(
+            limit=limit,
+            offset=offset,
+            active_only=active_only,
+            after=after,
+            plate_prefix=prefix,
+        )
+    if len(vehicles) == limit:
+        last = vehicles[-1]
+        response.headers[CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return vehicles
 
 
 @app.post("/vehicles", response_model=VehicleRead, status_code=201)
@@ -471,47 +1046,376 @@ async def get_active_plates(current_user: User = Depends(get_current_user)):
         return {"plates": plates}
 
 
+# ----------------------------------------------------------------------
+# Массовый импорт / экспорт списка машин
+# ----------------------------------------------------------------------
+VEHICLE_IMPORT_BATCH_SIZE = 5000
+VEHICLE_IMPORT_MAX_ERRORS = 1000
+
+
+@app.post("/vehicles/import", response_model=VehicleImportResult)
+async def import_vehicles(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    on_conflict: Literal["update", "skip"] = Query("update"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Потоковый импорт CSV/NDJSON: тело разбирается по мере получения,
+    номера нормализуются, строки пишутся пачками (COPY + INSERT ... ON CONFLICT).
+    Ошибочные строки попадают в errors и не прерывают загрузку.
+    """
+    ensure_admin_user(current_user)
+    content_type = request.headers.get("content-type", "")
+    fmt = format or ("ndjson" if "json" in content_type else "csv")
+    result = VehicleImportResult()
+
+    def add_error(line: int, error: str) -> None:
+        result.failed += 1
+        if len(result.errors) < VEHICLE_IMPORT_MAX_ERRORS:
+            result.errors.append(VehicleImportError(line=line, error=error))
+        else:
+            result.errors_truncated = True
+
+    # номер -> (строка файла, данные); повтор номера в пачке — побеждает последний
+    batch: Dict[str, Tuple[int, VehicleImportRow]] = {}
+
+    async def flush() -> None:
+        if not batch:
+            return
+        rows = [row for _, row in batch.values()]
+        try:
+            async with UnitOfWork()() as uow:
+                inserted, updated = await uow.vehicles.bulk_upsert(rows, on_conflict=on_conflict)
+        except Exception as e:
+            for line, _ in batch.values():
+                add_error(line, f"batch failed: {e}")
+        else:
+            result.inserted += inserted
+            result.updated += updated
+            result.skipped += len(rows) - inserted - updated
+        batch.clear()
+
+    async for line, record, error in iter_import_records(request.stream(), fmt):
+        result.received += 1
+        if error:
+            add_error(line, error)
+            continue
+        try:
+            row = VehicleImportRow.model_validate(record)
+        except ValidationError as e:
+            add_error(line, format_validation_errors(e.errors()))
+            continue
+        if row.license_plate in batch:
+            result.skipped += 1
+        batch[row.license_plate] = (line, row)
+        if len(batch) >= VEHICLE_IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+    return result
+
+
+@app.get("/vehicles/export")
+async def export_vehicles(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    active_only: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+):
+    """Потоковый экспорт всех машин (серверный курсор, без загрузки в память)"""
+
+    async def rows():
+        async with UnitOfWork()() as uow:
+            async for row in uow.vehicles.iter_all(active_only=active_only):
+                yield row
+
+    if format == "ndjson":
+        return StreamingResponse(export_ndjson(rows()), media_type="application/x-ndjson")
+    return StreamingResponse(
+        export_csv(rows()),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="vehicles.csv"'},
+    )
+
+
 @app.post("/start_detection")
 def start_detection(payload: StartDetectionYolo):
+    from update_yolo_class import YoloClass
 
     resize = None
     if payload.resize_w and payload.resize_h:
         resize = (payload.resize_w, payload.resize_h)
+    # с бюджетом задержки детектор стартует с первой модели из model_tiers
+    model_path = payload.model_tiers[0] if payload.latency_budget_ms and payload.model_tiers else DETECTOR_MODEL
+    # зоны проверяются до открытия источника: 422 не оставляет открытый захват
+    zones = ZonesPayload(zones=payload.zones, lines=payload.lines, trigger_zone=payload.trigger_zone) if payload.zones else None
+    if zones is not None:
+        validate_zones(zones)
+    model = take_detector_model(model_path)
 
     detector = YoloClass(
         source=payload.source,
         camera_id=payload.camera_id,
         skip_frames=payload.skip_frames,
         resize=resize,
-        model_path="yolo11n.pt"
+        model_path=model_path,
+        model=model,
+        model_warm=model is not None,
+        crop_max_side=payload.crop_max_side,
+        crop_mode=payload.crop_mode,
+        trigger_zone=payload.trigger_zone,
+        enter_frames=payload.enter_frames,
+        exit_frames=payload.exit_frames,
+        exit_grace=payload.exit_grace,
+        interpolate=payload.interpolate,
+        imgsz=payload.imgsz,
+        latency_budget_ms=payload.latency_budget_ms,
+        model_tiers=payload.model_tiers or None,
+        max_skip=payload.max_skip,
+        cascade_model_path=payload.cascade_model,
+        cascade_margin=payload.cascade_margin,
+        cascade_conf=payload.cascade_conf,
+        snapshot_writer=snapshot_writer,
     )
-    detector.set_region((678, 186, 1055, 471))
+    if zones is not None:
+        apply_zones(detector, zones)
+    else:
+        detector.set_region((678, 186, 1055, 471))
+        for line in payload.lines:
+            detector.zones.set_line(line.name, line.p1, line.p2)
     detection_dict[payload.camera_id] = detector
 
-    import threading
     thread = threading.Thread(target=detector.run, daemon=True)
     thread.start()
 
     return {"message": f"Detection started for camera {payload.camera_id}"}
 
 
-@app.get("/get-results")
-def get_results():
-    # Можно отсортировать по дате (свежие сверху)
-    sorted_results = sorted(RESULTS_DB, key=lambda r: r["Date"], reverse=True)
-    print(sorted_results)
+def validate_zones(payload: ZonesPayload) -> None:
+    """422, если зоны или линии заданы неверно; детектор не нужен."""
+    from utils.zones import ZoneEngine
+
+    try:
+        ZoneEngine().configure(
+            {zone.name: zone.points for zone in payload.zones},
+            {line.name: (line.p1, line.p2) for line in payload.lines},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def apply_zones(detector: "YoloClass", payload: ZonesPayload) -> None:
+    try:
+        detector.set_zones(
+            {zone.name: zone.points for zone in payload.zones},
+            {line.name: (line.p1, line.p2) for line in payload.lines},
+            trigger_zone=payload.trigger_zone,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/detection/{camera_id}/zones")
+def get_detection_zones(camera_id: str):
+    """Зоны, линии подсчёта и счётчики пересечений камеры"""
+    detector = detection_dict.get(camera_id)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Camera not active")
+    return {"trigger_zone": detector.trigger_zone, **detector.zones.to_dict()}
+
+
+@app.put("/detection/{camera_id}/zones")
+def put_detection_zones(camera_id: str, payload: ZonesPayload):
+    """Заменить зоны и линии подсчёта камеры без перезапуска детекции"""
+    detector = detection_dict.get(camera_id)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Camera not active")
+    apply_zones(detector, payload)
+    return {"trigger_zone": detector.trigger_zone, **detector.zones.to_dict()}
+
+
+@app.get("/detection/{camera_id}/tracks")
+def get_detection_tracks(camera_id: str):
+    """Состояние треков по зонам: въезд, время в зоне, выезд"""
+    detector = detection_dict.get(camera_id)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Camera not active")
+    return detector.track_states.snapshot()
+
+
+@app.get("/detection/{camera_id}/inference")
+def get_detection_inference(camera_id: str):
+    """Текущие skip_frames / imgsz / модель камеры и почему они такие"""
+    detector = detection_dict.get(camera_id)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Camera not active")
+    return detector.inference_status()
+
+
+# ----------------------------------------------------------------------
+# Профилирование по запросу: поток детекции камеры и память процесса
+# ----------------------------------------------------------------------
+profiler = Profiler()
+
+
+class ProfileRequest(BaseModel):
+    mode: Literal["sampling", "cprofile"] = "sampling"
+    seconds: float = Field(default=10, gt=0, le=300)
+    interval_ms: float = Field(default=5, ge=1, le=1000)   # шаг семплирования
+
+
+class TracemallocStart(BaseModel):
+    frames: int = Field(default=1, ge=1, le=64)   # глубина стека на выделение
+
+
+def get_profile_session(session_id: str):
+    session = profiler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profile session not found")
+    return session
+
+
+@app.post("/profiling/detection/{camera_id}")
+def start_detection_profile(camera_id: str, payload: ProfileRequest, current_user: User = Depends(get_current_user)):
+    """Профиль потока детекции камеры на payload.seconds секунд (семплирование или cProfile)"""
+    ensure_admin_user(current_user)
+    detector = detection_dict.get(camera_id)
+    if not detector:
+        raise HTTPException(status_code=404, detail="Camera not active")
+    try:
+        session = profiler.profile_thread(camera_id, detector, payload.mode, payload.seconds, payload.interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.to_dict()
+
+
+@app.get("/profiling/sessions")
+def list_profile_sessions(current_user: User = Depends(get_current_user)):
+    """Сессии профилирования, новые первыми"""
+    ensure_admin_user(current_user)
+    return profiler.list()
+
+
+@app.get("/profiling/sessions/{session_id}")
+def get_profile_session_info(session_id: str, current_user: User = Depends(get_current_user)):
+    """Статус сессии и сводка: топ функций или выделений памяти"""
+    ensure_admin_user(current_user)
+    return get_profile_session(session_id).to_dict()
+
+
+@app.post("/profiling/sessions/{session_id}/stop")
+def stop_profile_session(session_id: str, current_user: User = Depends(get_current_user)):
+    """Остановить сессию досрочно; собранное сохраняется"""
+    ensure_admin_user(current_user)
+    get_profile_session(session_id)
+    return profiler.stop(session_id).to_dict()
+
+
+@app.get("/profiling/sessions/{session_id}/download")
+def download_profile_session(session_id: str, current_user: User = Depends(get_current_user)):
+    """Файл результата: .pstats (cProfile), .collapsed (семплирование), .snapshot (tracemalloc)"""
+    ensure_admin_user(current_user)
+    session = get_profile_session(session_id)
+    if not session.path or not Path(session.path).is_file():
+        raise HTTPException(status_code=409, detail=f"Profile session is {session.status}")
+    return FileResponse(session.path, media_type="application/octet-stream", filename=Path(session.path).name)
+
+
+@app.get("/profiling/tracemalloc")
+def get_tracemalloc_status(current_user: User = Depends(get_current_user)):
+    ensure_admin_user(current_user)
+    return profiler.tracemalloc_status()
+
+
+@app.post("/profiling/tracemalloc/start")
+def start_tracemalloc(payload: TracemallocStart, current_user: User = Depends(get_current_user)):
+    """Включить трассировку выделений памяти (замедляет процесс, пока включена)"""
+    ensure_admin_user(current_user)
+    return profiler.tracemalloc_start(payload.frames)
+
+
+@app.post("/profiling/tracemalloc/stop")
+def stop_tracemalloc(current_user: User = Depends(get_current_user)):
+    ensure_admin_user(current_user)
+    return profiler.tracemalloc_stop()
+
+
+@app.post("/profiling/tracemalloc/snapshot")
+def take_tracemalloc_snapshot(
+    limit: int = Query(30, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+):
+    """Снимок памяти: сохраняется как сессия, в ответе — топ мест выделения"""
+    ensure_admin_user(current_user)
+    try:
+        session = profiler.tracemalloc_snapshot(limit)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.to_dict()
+
+
+@app.get("/profiling/tracemalloc/diff")
+def diff_tracemalloc_snapshots(
+    base: str,
+    current: str,
+    limit: int = Query(30, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+):
+    """Рост памяти между двумя снимками (base → current) по строкам кода"""
+    ensure_admin_user(current_user)
+    try:
+        return profiler.tracemalloc_diff(base, current, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Snapshot {e.args[0]} not found")
+
+
+def _result_response(r: Dict[str, Any]) -> Dict[str, Any]:
     # Отдаём ключи так, как ждёт фронт: Id, Link, Date
-    return [
-        {
-            "Id": r["Id"],
-            "Link": r["Link"],  # например: static/uploads/20251016_…jpg
-            "Date": r["Date"],
-            "Title": r.get("Title", ""),
-            "Description": r["Description"],
-            "Source": r.get("Source", "-"),
-        }
-        for r in sorted_results
-    ]
+    return {
+        "Id": r["id"],
+        "Link": r["link"],  # например: static/uploads/20251016_…jpg
+        "Date": r["created_at"].isoformat(),
+        "Title": r["title"],
+        "Description": r["description"],
+        "Source": r["source"],
+    }
+
+
+@app.get("/get-results")
+async def get_results(
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    source: Optional[str] = Query(None),
+):
+    """Результаты, свежие сверху. Первая страница обычно отдаётся из памяти."""
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, (datetime, str))
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    first_page = after is None and since is None and until is None
+    page = results_tail.recent(limit, source) if first_page else []
+    if len(page) < limit:
+        try:
+            async with UnitOfWork()() as uow:
+                rows = await uow.results.list(limit=limit, since=since, until=until, source=source, after=after)
+            page = [{c.name: getattr(row, c.name) for c in DetectionResult.__table__.columns} for row in rows]
+        except Exception as e:
+            if not first_page:
+                raise HTTPException(status_code=503, detail=f"Results storage unavailable: {e}")
+            print(f"get-results: DB unavailable, serving cached results: {e}")
+        if first_page:
+            # ещё не записанные в БД результаты берём из памяти
+            page = results_tail.merge(page, limit, source)
+
+    if len(page) == limit:
+        last = page[-1]
+        response.headers[CURSOR_HEADER] = encode_cursor(last["created_at"], last["id"])
+    return [_result_response(r) for r in page]
 
 
 @app.get("/settings/detection", response_model=DetectionSettingsResponse)
@@ -533,21 +1437,13 @@ async def patch_detection_settings(
     current_user: User = Depends(get_current_user),
 ):
     ensure_admin_user(current_user)
-    global model
     partial = payload.model_dump(exclude_unset=True)
     widgets = partial.get("widgets")
     if widgets:
         partial["widgets"] = {k: v for k, v in widgets.items() if v is not None}
+    # модель и видеопоток обновляются подписчиками настроек
     updated = update_detection_settings(partial)
 
-    if "detectionModel" in partial:
-        video_stream_manager.update_model(updated["detectionModel"], restart=False)
-        # update model name and reset cached model so it will be loaded lazily
-        model_name = updated["detectionModel"]
-        model = None
-
-    video_stream_manager.update_settings(updated)
-
     return detection_response(updated)
 
 
@@ -563,6 +1459,59 @@ def root_healthcheck():
     return {"status": "ok"}
 
 
+HEALTH_CHECK_TIMEOUT = 1.0
+CAMERA_STALE_SECONDS = 5.0
+
+
+async def _health_check(check) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=HEALTH_CHECK_TIMEOUT)
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
+async def _ping_database() -> None:
+    async with UnitOfWork()() as uow:
+        await uow.session.execute(text("SELECT 1"))
+
+
+@app.get("/health/live")
+def health_live():
+    """Процесс жив и отвечает; зависимости не проверяются"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready(response: Response):
+    """
+    Готов ли сервис к трафику: прогрев закончен, Redis и БД отвечают, камеры
+    дают кадры (иначе 503). Неудачный прогрев не держит сервис неготовым —
+    решения о въезде от него не зависят; он повторяется в фоне (см. "warmup").
+    """
+    redis_check, db_check = await asyncio.gather(
+        _health_check(lambda: asyncio.to_thread(redis_server.ping)),
+        _health_check(_ping_database),
+    )
+    cameras = {camera_id: detector.health(CAMERA_STALE_SECONDS) for camera_id, detector in list(detection_dict.items())}
+    ready = (
+        warmup_state["status"] not in ("pending", "running")
+        and redis_check["ok"]
+        and db_check["ok"]
+        and all(camera["ready"] for camera in cameras.values())
+    )
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "not_ready",
+        "warmup": warmup_state,
+        "redis": redis_check,
+        "database": db_check,
+        "cameras": cameras,
+    }
+
+
 def _latest_demo_video() -> Optional[Path]:
     files = sorted(
         [f for f in DEMO_DIR.iterdir() if f.is_file()],
@@ -613,14 +1562,13 @@ async def delete_demo_video(
     target.unlink()
     settings = load_detection_settings()
     if settings.get("videoFileName") == safe_name:
-        updated = update_detection_settings(
+        update_detection_settings(
             {
                 "sourceType": None,
                 "videoPath": "",
                 "videoFileName": "",
             }
         )
-        video_stream_manager.update_settings(updated)
     return {"detail": "Deleted"}
 
 
@@ -648,14 +1596,14 @@ def get_yolo_models(current_user: User = Depends(get_current_user)):
 @app.get("/video/stream")
 async def video_stream(token: str = Query(..., alias="token")):
     await authenticate_token(token)
-    generator = video_stream_manager.stream()
+    generator = get_video_stream_manager().stream()
     return StreamingResponse(generator, media_type="multipart/x-mixed-replace; boundary=frame")
 
 
 @app.get("/video/frame")
 def get_latest_frame():
     """Return latest frame as image/jpeg."""
-    data = video_stream_manager.get_frame_bytes()
+    data = get_video_stream_manager().get_frame_bytes()
     return Response(content=data, media_type="image/jpeg")
 
 
@@ -671,24 +1619,26 @@ async def websocket_video(websocket: WebSocket, token: str = Query(..., alias="t
         return
 
     # Ensure producer is running
+    manager = get_video_stream_manager()
     try:
-        video_stream_manager.start()
+        manager.start()
     except Exception:
         pass
 
     try:
-        while True:
-            data = video_stream_manager.get_frame_bytes()
+        with STREAM_CLIENTS.labels("ws_video").track_inprogress():
+            while True:
+                data = manager.get_frame_bytes()
 
-            if data:
-                try:
-                    b64 = base64.b64encode(data).decode("ascii")
-                    await websocket.send_text(b64)
-                except Exception:
-                    # If sending fails, break to close socket
-                    break
+                if data:
+                    try:
+                        b64 = base64.b64encode(data).decode("ascii")
+                        await websocket.send_text(b64)
+                    except Exception:
+                        # If sending fails, break to close socket
+                        break
 
-            await asyncio.sleep(0.05)
+                await asyncio.sleep(0.05)
 
     except WebSocketDisconnect:
         return
@@ -716,24 +1666,25 @@ def stop_detection(payload: StopDetectionYolo):
 def generate_processed(camera_id):
     stream_start_date = datetime.now().date()
 
-    while True:
-        if datetime.now().date() != stream_start_date:
-            break
-
-        # читаем обработанный кадр
-        frame = redis_server.get(f"{camera_id}_processed_frame")
-        flag = redis_server.get(f"{camera_id}_processed_flag")
-
-        # Redis → bytes, поэтому сравнение с b"1"
-        if flag == b"1" and frame:
-            yield (
-                b"--frame\r\n"
-                b"Content-Type: image/jpeg\r\n\r\n" +
-                frame +
-                b"\r\n"
-            )
-
-        time.sleep(0.03)   # ~30 FPS
+    with STREAM_CLIENTS.labels("video_feed").track_inprogress():
+        while True:
+            if datetime.now().date() != stream_start_date:
+                break
+
+            # читаем обработанный кадр
+            frame = redis_server.get(f"{camera_id}_processed_frame")
+            flag = redis_server.get(f"{camera_id}_processed_flag")
+
+            # Redis → bytes, поэтому сравнение с b"1"
+            if flag == b"1" and frame:
+                yield (
+                    b"--frame\r\n"
+                    b"Content-Type: image/jpeg\r\n\r\n" +
+                    frame +
+                    b"\r\n"
+                )
+
+            time.sleep(0.03)   # ~30 FPS
 
 
 
@@ -0,0 +1,220 @@
+"""
+Stand-ins for external services in benchmarks.
+
+FakeRedis keeps keys in memory and counts published messages. StubModel
+stands in for YOLO: cars cross the frame on fixed paths, with an optional
+fixed inference delay. SyntheticFrames produces pre-encoded JPEGs stamped
+with a sequence number and publish time, for stream load tests.
+Measurements then cover the pipeline itself, not the network or the
+weights.
+"""
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+COCO_NAMES = {0: "person", 2: "car", 3: "motorcycle", 5: "bus", 7: "truck"}
+
+
+class FakeRedis:
+    """Subset of redis.Redis used by the detector and the API: get/set/delete/publish/pipeline."""
+
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.published = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if not isinstance(value, bytes):
+            value = str(value).encode()
+        with self._lock:
+            self.data[key] = value
+        return True
+
+    def delete(self, *keys):
+        with self._lock:
+            return sum(self.data.pop(key, None) is not None for key in keys)
+
+    def publish(self, channel, message):
+        with self._lock:
+            self.published += 1
+        return 0
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class _FakePipeline:
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.calls: List = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return call
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        self.calls = []
+        return results
+
+
+class _Array:
+    """Как torch.Tensor для кода детектора: .cpu().numpy()."""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.data
+
+
+class _Boxes:
+    def __init__(self, xyxy: np.ndarray, cls: np.ndarray, conf: np.ndarray, ids: Optional[np.ndarray]):
+        self.xyxy = _Array(xyxy)
+        self.cls = _Array(cls)
+        self.conf = _Array(conf)
+        self.id = _Array(ids) if ids is not None else None
+
+
+class _Result:
+    def __init__(self, frame: np.ndarray, boxes: _Boxes):
+        self.orig_img = frame
+        self.boxes = boxes
+        self.names = COCO_NAMES
+
+    def plot(self):
+        img = self.orig_img.copy()
+        for x1, y1, x2, y2 in self.boxes.xyxy.data.astype(int):
+            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        return img
+
+
+class StubModel:
+    """
+    YOLO-compatible stub (track / predict / __call__).
+
+    ``cars`` cars drive left to right in separate lanes, each at its own
+    speed. Every call moves them one step, so boxes enter and leave the
+    region as in real footage. ``latency_ms`` emulates the cost of a real
+    model's inference.
+    """
+
+    def __init__(self, cars: int = 3, latency_ms: float = 0.0, speed: float = 12.0):
+        self.cars = cars
+        self.latency_ms = latency_ms
+        self.speed = speed
+        self.calls = 0
+
+    def _detect(self, frame: np.ndarray, with_ids: bool) -> List[_Result]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.calls += 1
+        h, w = frame.shape[:2]
+        box_w, box_h = max(8, w // 8), max(6, h // 8)
+        lane = h / (self.cars + 1)
+        span = w + box_w
+        rows = []
+        for i in range(self.cars):
+            x1 = (self.calls * self.speed * (1 + 0.25 * i)) % span - box_w
+            y1 = lane * (i + 1) - box_h / 2
+            rows.append([max(0.0, x1), y1, min(float(w), x1 + box_w), y1 + box_h])
+        xyxy = np.array(rows, dtype=np.float32).reshape(-1, 4)
+        keep = xyxy[:, 2] - xyxy[:, 0] > 1
+        xyxy = xyxy[keep]
+        n = len(xyxy)
+        boxes = _Boxes(
+            xyxy,
+            np.full(n, 2.0, dtype=np.float32),
+            np.full(n, 0.9, dtype=np.float32),
+            (np.flatnonzero(keep) + 1).astype(np.float32) if with_ids else None,
+        )
+        return [_Result(frame, boxes)]
+
+    def track(self, frame, persist: bool = True, classes=None, imgsz=None, **kwargs):
+        return self._detect(frame, with_ids=True)
+
+    def predict(self, frame, classes=None, imgsz=None, verbose: bool = False, **kwargs):
+        return self._detect(frame, with_ids=False)
+
+    def __call__(self, frame, classes=None, **kwargs):
+        return self._detect(frame, with_ids=False)
+
+
+def make_synthetic_video(path: str, frames: int = 300, size=(1280, 720), fps: float = 25.0) -> str:
+    """Пишет видео с движущимися прямоугольниками (для запуска без записанного ролика)."""
+    w, h = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError(f"cannot write synthetic video to {path}")
+    rng = np.random.default_rng(0)
+    background = rng.integers(40, 90, size=(h, w, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = background.copy()
+        for lane in range(3):
+            x = int((i * 9 * (1 + 0.3 * lane)) % (w + 200)) - 200
+            y = int(h * (lane + 1) / 4)
+            cv2.rectangle(frame, (x, y - 40), (x + 180, y + 40), (30 + 70 * lane, 120, 220), -1)
+        cv2.putText(frame, f"{i:05d}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+    return str(path)
+
+
+# ---------------------- синтетические кадры со штампом времени ----------------------
+STAMP_TAG = b"BENCH"
+
+
+def stamp_jpeg(jpeg: bytes, seq: int, ts: float) -> bytes:
+    """Вставляет после SOI комментарий (COM) с номером кадра и временем публикации."""
+    payload = STAMP_TAG + f" {seq} {ts:.6f}".encode()
+    return jpeg[:2] + b"\xff\xfe" + (len(payload) + 2).to_bytes(2, "big") + payload + jpeg[2:]
+
+
+def read_stamp(data: bytes):
+    """(seq, ts) из начала JPEG или None, если штампа нет."""
+    if data[2:4] != b"\xff\xfe":
+        return None
+    length = int.from_bytes(data[4:6], "big")
+    payload = data[6:4 + length]
+    if not payload.startswith(STAMP_TAG):
+        return None
+    _, seq, ts = payload.split()
+    return int(seq), float(ts)
+
+
+class SyntheticFrames:
+    """
+    Pre-encoded JPEG frames, handed out in a loop with a fresh stamp.
+
+    Frames are encoded once at start, so a producer costs the server almost
+    no CPU and the measurement shows the cost of serving, not of encoding.
+    """
+
+    def __init__(self, size=(1280, 720), variants: int = 25, quality: int = 80):
+        w, h = size
+        rng = np.random.default_rng(0)
+        background = rng.integers(40, 90, size=(h, w, 3), dtype=np.uint8)
+        self.frames = []
+        for i in range(variants):
+            frame = background.copy()
+            x = int(i * (w + 200) / variants) - 200
+            cv2.rectangle(frame, (x, h // 2 - 40), (x + 180, h // 2 + 40), (60, 120, 220), -1)
+            ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            self.frames.append(buf.tobytes())
+        self.seq = 0
+
+    def next(self) -> bytes:
+        self.seq += 1
+        return stamp_jpeg(self.frames[self.seq % len(self.frames)], self.seq, time.time())
@@ -0,0 +1,218 @@
+"""
+Офлайн-бенчмарк конвейера детекции на записанном видео.
+
+Прогоняет локальный ролик через YoloClass (pipeline=detector) и
+VideoStreamManager (pipeline=stream) с Redis в памяти и, по желанию, с
+заглушкой модели. Для каждой конфигурации (модель, resize, skip_frames,
+регион) выводит FPS, p50/p95/p99 по стадиям, CPU и пик памяти. Каждая
+конфигурация идёт в отдельном процессе, поэтому память и CPU не смешиваются.
+Сеть и GPU не нужны: веса берутся только с диска.
+
+Запуск (из корня проекта):
+    python -m benchmarks.pipeline_bench --synthetic --models stub
+    python -m benchmarks.pipeline_bench --video demo/cars.mp4 \\
+        --models stub,yolo11n.pt --resize none,1280x720 --skip 1,3 \\
+        --regions "none;678,186,1055,471" --output bench.json
+    # сравнение с прошлым прогоном (код выхода 1 при регрессии)
+    python -m benchmarks.pipeline_bench ... --output new.json --baseline bench.json
+"""
+import argparse
+import itertools
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeRedis, StubModel, make_synthetic_video
+from benchmarks.stats import SampleRecorder, compare, environment
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+YOLO_MODELS_DIR = PROJECT_ROOT / "models" / "yolo"
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def config_key(cfg: Dict) -> str:
+    resize = "x".join(map(str, cfg["resize"])) if cfg["resize"] else "none"
+    region = ",".join(map(str, cfg["region"])) if cfg["region"] else "none"
+    return f"{cfg['pipeline']}|model={cfg['model']}|resize={resize}|skip={cfg['skip_frames']}|region={region}"
+
+
+def build_configs(args) -> List[Dict]:
+    resizes = [None if r == "none" else [int(v) for v in r.lower().split("x")] for r in args.resize.split(",")]
+    regions = [None if r == "none" else [int(v) for v in r.split(",")] for r in args.regions.split(";")]
+    skips = [int(s) for s in args.skip.split(",")]
+    models = args.models.split(",")
+
+    configs, seen = [], set()
+    for pipeline in args.pipeline.split(","):
+        if pipeline == "detector":
+            grid = itertools.product(models, resizes, skips, regions)
+        else:
+            # у VideoStreamManager нет resize, пропуска кадров и региона
+            grid = ((model, None, 1, None) for model in models)
+        for model, resize, skip, region in grid:
+            cfg = {"pipeline": pipeline, "model": model, "resize": resize, "skip_frames": skip, "region": region}
+            cfg["key"] = config_key(cfg)
+            if cfg["key"] not in seen:
+                seen.add(cfg["key"])
+                configs.append(cfg)
+    return configs
+
+
+def resolve_weights(name: str) -> str:
+    """Путь к локальным весам; скачивание ultralytics не допускаем."""
+    for candidate in (Path(name), YOLO_MODELS_DIR / name, PROJECT_ROOT / name):
+        if candidate.is_file():
+            return str(candidate)
+    raise SystemExit(f"weights '{name}' not found locally (looked in ., {YOLO_MODELS_DIR}); the benchmark never downloads")
+
+
+def load_model(name: str, stub_latency_ms: float):
+    if name == "stub":
+        return StubModel(latency_ms=stub_latency_ms)
+    from ultralytics import YOLO
+
+    return YOLO(resolve_weights(name))
+
+
+# ---------------------- один прогон (в дочернем процессе) ----------------------
+def run_detector(cfg: Dict, args, workdir: Path) -> Dict:
+    from update_yolo_class import YoloClass
+    from utils.snapshot_writer import SnapshotWriter
+
+    detector = YoloClass(
+        source=args.video,
+        camera_id="bench",
+        skip_frames=cfg["skip_frames"],
+        resize=tuple(cfg["resize"]) if cfg["resize"] else None,
+        model_path=cfg["model"],
+        model=load_model(cfg["model"], args.stub_latency_ms),
+        region=tuple(cfg["region"]) if cfg["region"] else None,
+        snapshot_writer=SnapshotWriter(root=workdir / "snapshots"),
+        redis_client=FakeRedis(),
+        show=False,
+    )
+    recorder = SampleRecorder("bench", frames=args.frames, warmup=args.warmup, on_done=detector.stop)
+    detector.metrics = recorder
+    watchdog = threading.Timer(args.timeout, detector.stop)
+    watchdog.start()
+    try:
+        detector.run()
+    finally:
+        watchdog.cancel()
+    return {**recorder.report(), "timed_out": not recorder.done.is_set(), "redis_publishes": detector.redis_server.published}
+
+
+def run_stream(cfg: Dict, args, workdir: Path) -> Dict:
+    from utils.video_stream import VideoStreamManager
+
+    model = load_model(cfg["model"], args.stub_latency_ms)
+    manager = VideoStreamManager(Path(args.video).parent, model_loader=lambda name: model)
+    # файл-источник менеджер отдаёт без детекции, поэтому видео открываем
+    # как URL потока — cv2.VideoCapture читает файл по пути так же
+    manager._unsubscribe()
+    manager.settings = {"sourceType": "rtsp", "rtspUrl": str(args.video), "detectionTarget": "vehicles"}
+    manager.model_name = cfg["model"]
+    manager.model = model
+    recorder = SampleRecorder("stream", frames=args.frames, warmup=args.warmup)
+    manager.metrics = recorder
+    manager.start()
+    recorder.done.wait(args.timeout)
+    manager.stop()
+    return {**recorder.report(), "timed_out": not recorder.done.is_set()}
+
+
+def run_single(cfg: Dict, args) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        runner = run_detector if cfg["pipeline"] == "detector" else run_stream
+        result = runner(cfg, args, Path(tmp))
+    return {**cfg, **result}
+
+
+# ---------------------- оркестрация ----------------------
+def spawn(cfg: Dict, args) -> Dict:
+    cmd = [
+        sys.executable, "-m", "benchmarks.pipeline_bench",
+        "--run-config", json.dumps(cfg),
+        "--video", str(args.video),
+        "--frames", str(args.frames),
+        "--warmup", str(args.warmup),
+        "--timeout", str(args.timeout),
+        "--stub-latency-ms", str(args.stub_latency_ms),
+    ]
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=args.timeout + 120)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    return {**cfg, "error": (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ["no output"]}
+
+
+def print_row(result: Dict) -> None:
+    if "error" in result:
+        print(f"{result['key']:<70} ERROR {result['error'][0]}")
+        return
+    stages = result["stages_ms"]
+    hot = stages.get("detect") or stages.get("inference") or {}
+    print(
+        f"{result['key']:<70} fps={result['fps']!s:>8} src_fps={result['source_fps']!s:>8} "
+        f"cpu={result['cpu_percent']!s:>6}% peak={result.get('peak_rss_mb', '-')!s:>7}MB "
+        f"detect p50/p95/p99={hot.get('p50', '-')}/{hot.get('p95', '-')}/{hot.get('p99', '-')} ms"
+        + (" TIMED OUT" if result.get("timed_out") else "")
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline detection pipeline benchmark")
+    parser.add_argument("--video", help="local video file to replay")
+    parser.add_argument("--synthetic", action="store_true", help="generate a synthetic video instead of --video")
+    parser.add_argument("--pipeline", default="detector,stream", help="detector,stream")
+    parser.add_argument("--models", default="stub", help="comma-separated: stub or local weights (yolo11n.pt, ...)")
+    parser.add_argument("--resize", default="none", help="comma-separated: none or WxH")
+    parser.add_argument("--skip", default="1", help="comma-separated skip_frames values")
+    parser.add_argument("--regions", default="none", help="semicolon-separated: none or x1,y1,x2,y2")
+    parser.add_argument("--frames", type=int, default=200, help="measured frames per configuration")
+    parser.add_argument("--warmup", type=int, default=10, help="frames excluded from measurement")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="emulated inference time of the stub model")
+    parser.add_argument("--timeout", type=float, default=600.0, help="seconds per configuration")
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression (fraction)")
+    parser.add_argument("--run-config", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_config:
+        print(RESULT_PREFIX + json.dumps(run_single(json.loads(args.run_config), args)), flush=True)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="bench-video-") as tmp:
+        if args.synthetic:
+            args.video = make_synthetic_video(Path(tmp) / "synthetic.avi", frames=args.frames + args.warmup + 10)
+        elif not args.video:
+            parser.error("--video or --synthetic is required")
+        args.video = str(Path(args.video).resolve())
+
+        results = []
+        for cfg in build_configs(args):
+            result = spawn(cfg, args)
+            print_row(result)
+            results.append(result)
+
+    report = {"environment": environment(), "video": None if args.synthetic else args.video, "frames": args.frames, "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    failed = any("error" in r or r.get("timed_out") for r in results)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        problems = compare(baseline, results, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import os
+import platform
+import resource
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+from utils.metrics import StageRecorder
+
+PERCENTILES = (50, 95, 99)
+
+
+def summarize(samples_ms: Iterable[float]) -> Dict[str, float]:
+    """count, mean and p50/p95/p99 of millisecond samples."""
+    data = np.asarray(list(samples_ms), dtype=np.float64)
+    if not len(data):
+        return {"count": 0}
+    out = {"count": int(len(data)), "mean": round(float(data.mean()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(data, PERCENTILES)):
+        out[f"p{p}"] = round(float(value), 3)
+    return out
+
+
+def proc_status(pid: Optional[int] = None) -> Dict[str, float]:
+    """RSS, peak RSS (MB) and thread count from /proc; outside Linux, peak RSS of this process only."""
+    path = f"/proc/{pid or 'self'}/status"
+    try:
+        with open(path) as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {
+            "rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+            "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+            "threads": int(fields["Threads"]),
+        }
+    except (OSError, KeyError, ValueError):
+        if pid is not None:
+            return {}
+        # ru_maxrss: КБ в Linux, байты в macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+        return {"peak_rss_mb": round(peak / scale, 1), "threads": threading.active_count()}
+
+
+def proc_cpu_seconds(pid: int) -> Optional[float]:
+    """user+system CPU seconds of another process (Linux /proc/<pid>/stat)."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def environment() -> Dict[str, object]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+
+
+class SampleRecorder(StageRecorder):
+    """
+    StageRecorder that keeps every raw sample instead of Prometheus buckets,
+    so exact percentiles can be reported.
+
+    The first ``warmup`` frames (model load, first inference, caches; at
+    least one) are not counted, and wall-clock and CPU time start after
+    them. After ``frames`` measured frames ``done`` is set and ``on_done``
+    is called.
+    """
+
+    def __init__(self, camera: str, frames: int, warmup: int = 0, on_done: Optional[Callable[[], None]] = None):
+        super().__init__(camera)
+        self.limit = frames
+        self.warmup = max(1, warmup)
+        self.on_done = on_done
+        self.samples: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, int] = {}
+        self.frames_seen = 0
+        self.done = threading.Event()
+        self._wall = [0.0, 0.0]
+        self._cpu = [0.0, 0.0]
+
+    @property
+    def measuring(self) -> bool:
+        return self.warmup <= self.frames_seen < self.warmup + self.limit
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if self.measuring:
+            self.samples.setdefault(stage, []).append(seconds * 1000)
+
+    def frame(self, outcome: str, count: int = 1) -> None:
+        if outcome == "skipped":
+            # пропущенные grab-кадры идут вместе со следующим обработанным
+            if self.measuring:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+            return
+        if self.measuring:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + count
+        if outcome in ("read_failed", "encode_failed"):
+            return
+        self.frames_seen += 1
+        if self.frames_seen == self.warmup:
+            self._wall[0], self._cpu[0] = time.perf_counter(), time.process_time()
+        if self.frames_seen == self.warmup + self.limit:
+            self._wall[1], self._cpu[1] = time.perf_counter(), time.process_time()
+            self.done.set()
+            if self.on_done:
+                self.on_done()
+
+    def report(self) -> Dict[str, object]:
+        wall = self._wall[1] - self._wall[0]
+        cpu = self._cpu[1] - self._cpu[0]
+        frames = sum(n for k, n in self.outcomes.items() if k in ("processed", "interpolated"))
+        source_frames = frames + self.outcomes.get("skipped", 0)
+        return {
+            "frames": frames,
+            "wall_s": round(wall, 3),
+            "fps": round(frames / wall, 2) if wall > 0 else None,
+            "source_fps": round(source_frames / wall, 2) if wall > 0 else None,
+            "cpu_percent": round(100 * cpu / wall, 1) if wall > 0 else None,
+            "outcomes": dict(self.outcomes),
+            "stages_ms": {stage: summarize(values) for stage, values in self.samples.items()},
+            **proc_status(),
+        }
+
+
+def compare(baseline: List[Dict], current: List[Dict], tolerance: float = 0.1) -> List[str]:
+    """
+    Matches results by ``key`` and lists regressions: fps lower or p95 of any
+    stage higher than the baseline by more than ``tolerance`` (fraction).
+    """
+    base = {r["key"]: r for r in baseline}
+    problems = []
+    for result in current:
+        ref = base.get(result["key"])
+        if ref is None:
+            continue
+        if ref.get("fps") and result.get("fps") is not None and result["fps"] < ref["fps"] * (1 - tolerance):
+            problems.append(f"{result['key']}: fps {ref['fps']} -> {result['fps']}")
+        for stage, stats in result.get("stages_ms", {}).items():
+            ref_p95 = ref.get("stages_ms", {}).get(stage, {}).get("p95")
+            # доли миллисекунды — шум таймера, не регрессия
+            if ref_p95 and ref_p95 >= 0.5 and stats.get("p95", 0) > ref_p95 * (1 + tolerance):
+                problems.append(f"{result['key']}: {stage} p95 {ref_p95} -> {stats['p95']} ms")
+    return problems
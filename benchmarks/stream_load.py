@@ -0,0 +1,307 @@
+"""
+Нагрузочный тест потоковых эндпоинтов: /video_feed, /video/stream, /ws/video.
+
+Поднимает benchmarks.stream_server (api.py с синтетическим источником кадров),
+открывает N одновременных MJPEG / WebSocket клиентов, часть из которых —
+медленные (пауза после каждого кадра), и для каждого сценария выводит:
+доставленный fps на клиента, задержку от публикации кадра до получения
+(p50/p95/p99), CPU, потоки и память сервера. Результат — JSON; с --baseline
+сравнивает с прошлым прогоном и выходит с кодом 1 при регрессии.
+
+Запуск (из корня проекта):
+    python -m benchmarks.stream_load --clients 20 --duration 15
+    python -m benchmarks.stream_load --endpoints video_feed --clients 50 \\
+        --slow 10 --slow-delay-ms 200 --output load.json
+    # против уже запущенного сервера (CPU/потоки сервера — по --server-pid)
+    python -m benchmarks.stream_load --url http://127.0.0.1:8000 --token ...
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.fakes import read_stamp
+from benchmarks.pipeline_bench import PROJECT_ROOT
+from benchmarks.stats import compare, environment, proc_cpu_seconds, proc_status, summarize
+from benchmarks.stream_server import CAMERA_ID
+
+ENDPOINTS = ("video_feed", "video_stream", "ws_video")
+MJPEG_BOUNDARY = b"--frame"
+
+
+class ClientStats:
+    def __init__(self, endpoint: str, slow_delay: float):
+        self.endpoint = endpoint
+        self.slow_delay = slow_delay
+        self.frames = 0
+        self.duplicates = 0
+        self.bytes = 0
+        self.latencies_ms: List[float] = []
+        self.last_seq = 0
+        self.error: Optional[str] = None
+        self.started = 0.0
+        self.finished = 0.0
+
+    async def on_frame(self, data: bytes) -> None:
+        received = time.time()
+        self.bytes += len(data)
+        stamp = read_stamp(data)
+        # /video/stream и /ws/video шлют последний кадр по таймеру — повторы не считаем
+        if stamp is None or stamp[0] <= self.last_seq:
+            self.duplicates += 1
+        else:
+            self.last_seq = stamp[0]
+            self.frames += 1
+            self.latencies_ms.append((received - stamp[1]) * 1000)
+        if self.slow_delay:
+            await asyncio.sleep(self.slow_delay)
+
+    def report(self) -> Dict:
+        elapsed = max(1e-9, self.finished - self.started)
+        return {
+            "fps": round(self.frames / elapsed, 2),
+            "frames": self.frames,
+            "duplicates": self.duplicates,
+            "mbit_s": round(self.bytes * 8 / elapsed / 1e6, 2),
+            "latency_ms": summarize(self.latencies_ms),
+            "slow": bool(self.slow_delay),
+            "error": self.error,
+        }
+
+
+async def mjpeg_client(client: httpx.AsyncClient, url: str, stats: ClientStats, deadline: float) -> None:
+    async with client.stream("GET", url) as response:
+        response.raise_for_status()
+        buffer = b""
+        async for chunk in response.aiter_raw():
+            buffer += chunk
+            # часть: "--frame\r\nContent-Type: image/jpeg\r\n\r\n<jpeg>\r\n"
+            while True:
+                start = buffer.find(MJPEG_BOUNDARY)
+                if start < 0:
+                    break
+                body = buffer.find(b"\r\n\r\n", start)
+                end = buffer.find(MJPEG_BOUNDARY, body + 4) if body >= 0 else -1
+                if end < 0:
+                    buffer = buffer[start:]
+                    break
+                await stats.on_frame(buffer[body + 4:end].rstrip(b"\r\n"))
+                buffer = buffer[end:]
+            if time.monotonic() >= deadline:
+                return
+
+
+async def ws_client(url: str, stats: ClientStats, deadline: float) -> None:
+    async with websockets.connect(url, max_size=None) as ws:
+        while time.monotonic() < deadline:
+            try:
+                message = await asyncio.wait_for(ws.recv(), timeout=max(0.01, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                return
+            await stats.on_frame(base64.b64decode(message))
+
+
+async def run_client(endpoint: str, base_url: str, token: str, stats: ClientStats, deadline: float) -> None:
+    stats.started = time.time()
+    try:
+        if endpoint == "ws_video":
+            ws_url = base_url.replace("http", "ws", 1) + f"/ws/video?token={token}"
+            await ws_client(ws_url, stats, deadline)
+        else:
+            path = f"/video_feed/{CAMERA_ID}" if endpoint == "video_feed" else f"/video/stream?token={token}"
+            timeout = httpx.Timeout(10.0, read=max(10.0, deadline - time.monotonic() + 10))
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                await mjpeg_client(client, base_url + path, stats, deadline)
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+    finally:
+        stats.finished = time.time()
+
+
+async def sample_server(pid: Optional[int], stop: asyncio.Event, interval: float = 0.5) -> Dict:
+    """CPU (% одного ядра), число потоков и RSS процесса сервера за время сценария."""
+    if pid is None:
+        await stop.wait()
+        return {}
+    cpu, threads, rss = [], [], []
+    prev_cpu, prev_t = proc_cpu_seconds(pid), time.monotonic()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        now_cpu, now_t = proc_cpu_seconds(pid), time.monotonic()
+        if now_cpu is not None and prev_cpu is not None:
+            cpu.append(100 * (now_cpu - prev_cpu) / (now_t - prev_t))
+        prev_cpu, prev_t = now_cpu, now_t
+        status = proc_status(pid)
+        if status:
+            threads.append(status["threads"])
+            rss.append(status["rss_mb"])
+    return {
+        "cpu_percent": summarize(cpu),
+        "threads_max": max(threads, default=None),
+        "rss_mb_max": max(rss, default=None),
+    }
+
+
+async def run_scenario(endpoint: str, args, token: str, server_pid: Optional[int]) -> Dict:
+    clients = [
+        ClientStats(endpoint, args.slow_delay_ms / 1000 if i < args.slow else 0.0)
+        for i in range(args.clients)
+    ]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_server(server_pid, stop))
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*(run_client(endpoint, args.url, token, c, deadline) for c in clients))
+    stop.set()
+    server = await sampler
+
+    reports = [c.report() for c in clients]
+    ok = [r for r in reports if not r["error"]]
+    fast = [r for r in ok if not r["slow"]] or ok
+    result = {
+        "key": f"{endpoint}|clients={args.clients}|slow={args.slow}x{args.slow_delay_ms}ms|fps={args.fps}",
+        "endpoint": endpoint,
+        "clients": args.clients,
+        "errors": len(reports) - len(ok),
+        # fps по «быстрым» клиентам — по нему compare ищет регрессии
+        "fps": round(sum(r["fps"] for r in fast) / len(fast), 2) if fast else 0.0,
+        "fps_min": min((r["fps"] for r in fast), default=0.0),
+        # задержка отдельно для обычных и медленных клиентов
+        "stages_ms": {
+            "latency": summarize(ms for c in clients if not c.slow_delay for ms in c.latencies_ms),
+            "latency_slow": summarize(ms for c in clients if c.slow_delay for ms in c.latencies_ms),
+        },
+        "server": server,
+        "per_client": reports,
+    }
+    return result
+
+
+# ---------------------- сервер ----------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, secret: str) -> subprocess.Popen:
+    port = free_port()
+    args.url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, "SESSION_SECRET": secret}
+    cmd = [
+        sys.executable, "-m", "benchmarks.stream_server",
+        "--port", str(port), "--fps", str(args.fps), "--width", str(args.width), "--height", str(args.height),
+    ]
+    # stderr — в файл: переполненный pipe остановил бы сервер посреди теста
+    log = tempfile.TemporaryFile()
+    proc = subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=log)
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            log.seek(0)
+            raise SystemExit(f"server exited: {log.read().decode(errors='replace')[-2000:]}")
+        try:
+            if httpx.get(args.url + "/video/frame", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.kill()
+    raise SystemExit("server did not start in time")
+
+
+def mint_token(secret: str) -> str:
+    """Сессионный токен тем же ключом, что у сервера — без БД."""
+    os.environ["SESSION_SECRET"] = secret
+    from database.security import create_session_token
+
+    token, _ = create_session_token(0, "bench@example.com", "admin", ttl=3600)
+    return token
+
+
+def print_result(result: Dict) -> None:
+    latency = result["stages_ms"]["latency"]
+    slow = result["stages_ms"]["latency_slow"]
+    server = result["server"]
+    cpu = server.get("cpu_percent", {})
+    print(
+        f"{result['key']:<55} fps avg/min={result['fps']}/{result['fps_min']} "
+        f"latency p50/p95/p99={latency.get('p50', '-')}/{latency.get('p95', '-')}/{latency.get('p99', '-')} ms "
+        + (f"(slow p95={slow.get('p95', '-')} ms) " if slow.get("count") else "")
+        + f"server cpu avg={cpu.get('mean', '-')}% threads={server.get('threads_max', '-')} "
+        f"rss={server.get('rss_mb_max', '-')}MB errors={result['errors']}"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent viewer load test for streaming endpoints")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help=",".join(ENDPOINTS))
+    parser.add_argument("--clients", type=int, default=10, help="concurrent clients per scenario")
+    parser.add_argument("--slow", type=int, default=0, help="how many of them are slow consumers")
+    parser.add_argument("--slow-delay-ms", type=float, default=200.0, help="pause of a slow consumer after each frame")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--fps", type=float, default=25.0, help="synthetic producer fps")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--url", help="use an already running server instead of starting one")
+    parser.add_argument("--token", help="session token for --url (from /auth)")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU/thread sampling")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="write JSON results here")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed regression (fraction)")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        token, server_pid = args.token or "", args.server_pid
+    else:
+        secret = secrets.token_urlsafe(32)
+        server = start_server(args, secret)
+        token, server_pid = mint_token(secret), server.pid
+
+    results = []
+    try:
+        for endpoint in args.endpoints.split(","):
+            result = asyncio.run(run_scenario(endpoint, args, token, server_pid))
+            print_result(result)
+            results.append(result)
+            # отключившиеся клиенты освобождают потоки сервера не мгновенно
+            time.sleep(1.0)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    failed = any(r["errors"] for r in results)
+    if args.baseline:
+        problems = compare(json.loads(Path(args.baseline).read_text())["results"], results, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+api.py с синтетическим источником кадров — сервер для нагрузочного теста потоков.
+
+Кадры в Redis (/video_feed) и в VideoStreamManager (/video/stream, /ws/video)
+кладёт генератор с заданным fps. Кадры заранее закодированы, в каждом JPEG —
+номер и время публикации (см. benchmarks.fakes.stamp_jpeg), по ним клиент
+считает задержку. Redis — в памяти процесса, камера и модель не нужны.
+
+Запуск (обычно его поднимает benchmarks.stream_load):
+    SESSION_SECRET=... python -m benchmarks.stream_server --port 8765 --fps 25
+"""
+import argparse
+import threading
+import time
+from pathlib import Path
+
+import uvicorn
+
+from benchmarks.fakes import FakeRedis, SyntheticFrames
+
+CAMERA_ID = "bench"
+
+
+def produce_redis_frames(redis_client: FakeRedis, frames: SyntheticFrames, fps: float, camera_id: str) -> None:
+    """Как YoloClass.run: обработанный кадр и флаг в Redis с частотой fps."""
+    interval = 1.0 / fps
+    next_at = time.perf_counter()
+    while True:
+        redis_client.set(f"{camera_id}_processed_frame", frames.next())
+        redis_client.set(f"{camera_id}_processed_flag", 1)
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.perf_counter()))
+
+
+def synthetic_stream_manager(base, frames: SyntheticFrames, fps: float):
+    """VideoStreamManager, у которого вместо захвата и детекции — генератор кадров."""
+
+    class SyntheticStreamManager(base):
+        def _process_loop(self, stop) -> None:
+            interval = 1.0 / fps
+            next_at = time.perf_counter()
+            while not stop.is_set():
+                data = frames.next()
+                with self.frame_lock:
+                    self.latest_frame = data
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+
+    return SyntheticStreamManager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="api.py with a synthetic frame producer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    args = parser.parse_args()
+
+    import api
+    from utils.video_stream import VideoStreamManager
+
+    # прогрев модели грузил бы настоящие веса и занимал CPU во время замера
+    api.WARMUP_ON_STARTUP = False
+    size = (args.width, args.height)
+    # генераторы независимы: /video/stream останавливает свой, когда уходит
+    # последний клиент, а /video_feed читает Redis всегда
+    redis_client = FakeRedis()
+    api.redis_server = redis_client
+    # БД нет: пользователь токена из stream_load — админ-заглушка
+    async def load_session_user(user_id: int):
+        return api.User(id=user_id, email="bench@example.com", role=api.ROLE_ADMIN)
+
+    api.load_session_user = load_session_user
+    threading.Thread(
+        target=produce_redis_frames,
+        args=(redis_client, SyntheticFrames(size), args.fps, CAMERA_ID),
+        name="synthetic-redis-producer",
+        daemon=True,
+    ).start()
+    manager_cls = synthetic_stream_manager(VideoStreamManager, SyntheticFrames(size), args.fps)
+    api.video_stream_manager = manager_cls(Path(api.DEMO_DIR), api.load_yolo_model)
+
+    uvicorn.run(api.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,196 @@
 import os
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
 import uvicorn
 from openai import AsyncOpenAI
 from fastapi import FastAPI, UploadFile, HTTPException, File
-from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
 load_dotenv()
 
 app = FastAPI()
-client = AsyncOpenAI(api_key=os.getenv("API"))
+# OPENAI_BASE_URL позволяет направить запросы в локальную заглушку (stub_openai.py)
+client = AsyncOpenAI(api_key=os.getenv("API"), base_url=os.getenv("OPENAI_BASE_URL") or None)
+
+# Детектор присылает уменьшенный crop транспорта, поэтому "low" обычно хватает
+# и стоит заметно меньше токенов; "auto"/"high" — для мелких номеров
+IMAGE_DETAIL = os.getenv("PLATE_IMAGE_DETAIL", "low")
+PLATE_MODEL = os.getenv("PLATE_MODEL", "gpt-4.1")
+
+# Кэш ответов: несколько клиентов шлагбаума часто присылают один и тот же кадр.
+# Совпадение — только точное (sha256): похожий кадр может быть другой машиной
+# той же модели и цвета, а номер из кэша решает, открыть ли шлагбаум
+CACHE_TTL = float(os.getenv("PLATE_CACHE_TTL", "30"))
+CACHE_MAX_ITEMS = int(os.getenv("PLATE_CACHE_MAX_ITEMS", "512"))
+MAX_BATCH_FILES = 16
+
+SYSTEM_PROMPT = "Ты — система распознавания автомобильных номеров. Дай ответ строго JSON."
+USER_PROMPT = "Определи номер автомобиля. Ответ строго в формате {\"plate\": \"...\"}"
+
+
+class ModelResponseError(Exception):
+    """Модель вернула ответ, который не разбирается как JSON-объект."""
+
+
+class PlateCache:
+    """TTL-кэш ответов модели с ограничением по количеству записей (LRU)."""
+
+    def __init__(self, ttl: float, max_items: int):
+        self.ttl = ttl
+        self.max_items = max_items
+        # sha256 -> (expires_at, result)
+        self._items: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [key for key, (expires_at, _) in self._items.items() if expires_at <= now]
+        for key in expired:
+            del self._items[key]
+
+    def get(self, key: str) -> Optional[Dict]:
+        self._evict_expired(time.monotonic())
+        item = self._items.get(key)
+        if item is None:
+            return None
+        self._items.move_to_end(key)
+        return dict(item[1])
+
+    def put(self, key: str, result: Dict) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, dict(result))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+cache = PlateCache(CACHE_TTL, CACHE_MAX_ITEMS)
+# Запросы к модели, которые выполняются прямо сейчас: sha256 -> future
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def _ask_model(image_bytes: bytes, mime: str) -> Dict:
+    # base64-кодирование
+    encoded = base64.b64encode(image_bytes).decode()
+
+    ai_response = await client.chat.completions.create(
+        model=PLATE_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": USER_PROMPT
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:{mime};base64,{encoded}",
+                            "detail": IMAGE_DETAIL,
+                        }
+                    }
+                ]
+            }
+        ]
+    )
+
+    raw = ai_response.choices[0].message.content or ""
+    # модель иногда присылает код-блоки → убираем
+    raw = raw.replace("```json", "").replace("```", "").strip()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        raise ModelResponseError(raw)
+    if not isinstance(data, dict):
+        raise ModelResponseError(raw)
+    return data
+
+
+async def recognize(image_bytes: bytes, mime: str) -> Dict:
+    """
+    Распознаёт номер с кэшем и объединением одинаковых запросов.
+
+    Одинаковые (по sha256) кадры, пришедшие одновременно, ждут один общий
+    запрос к модели.
+    """
+    key = hashlib.sha256(image_bytes).hexdigest()
+
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        try:
+            return dict(await asyncio.shield(pending))
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # отменили нас самих
+            # клиент-владелец отключился и отменил запрос — спрашиваем модель сами
+            return await recognize(image_bytes, mime)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await _ask_model(image_bytes, mime)
+    except asyncio.CancelledError:
+        # клиент отключился — ожидающие не должны зависнуть навсегда
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # исключение уже получил текущий вызов — не даём asyncio ругаться на future
+        future.exception()
+        raise
+    else:
+        cache.put(key, result)
+        future.set_result(result)
+        return dict(result)
+    finally:
+        _inflight.pop(key, None)
+
+
+def _to_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, ModelResponseError):
+        return HTTPException(status_code=500, detail=f"AI returned non-JSON object: {e}")
+    return HTTPException(status_code=500, detail=str(e))
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from openai import AsyncOpenAI
-import base64
-import json
 
 @app.post("/plate")
 async def plate(file: UploadFile = File(...)):
+    image_bytes = await file.read()
+    mime = file.content_type or "image/jpeg"
     try:
-        image_bytes = await file.read()
-
-        # base64-кодирование
-        encoded = base64.b64encode(image_bytes).decode()
-        mime = file.content_type or "image/jpeg"
-
-        system_prompt = "Ты — система распознавания автомобильных номеров. Дай ответ строго JSON."
-
-        ai_response = await client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Определи номер автомобиля. Ответ строго в формате {\"plate\": \"...\"}"
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:{mime};base64,{encoded}"
-                            }
-                        }
-                    ]
-                }
-            ]
-        )
+        return await recognize(image_bytes, mime)
+    except Exception as e:
+        raise _to_http_error(e)
 
-        raw = ai_response.choices[0].message.content
-        # модель иногда присылает код-блоки → убираем
-        raw = raw.replace("```json", "").replace("```", "").strip()
 
-        return json.loads(raw)
+@app.post("/plate/batch")
+async def plate_batch(files: List[UploadFile] = File(...)):
+    """Распознаёт несколько crop'ов за один запрос. Ошибки возвращаются по каждому файлу."""
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many files, max {MAX_BATCH_FILES}")
 
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=500, detail=f"AI returned non-JSON: {raw}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    payloads = [(await f.read(), f.content_type or "image/jpeg") for f in files]
+    results = await asyncio.gather(
+        *(recognize(data, mime) for data, mime in payloads),
+        return_exceptions=True,
+    )
+
+    response = []
+    for upload, result in zip(files, results):
+        if isinstance(result, BaseException):
+            response.append({"file": upload.filename, "error": _to_http_error(result).detail})
+        else:
+            response.append({"file": upload.filename, **result})
+    return response
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, port=8080)
\ No newline at end of file
+    uvicorn.run(app, port=8080)
@@ -0,0 +1,54 @@
+"""
+Локальная заглушка OpenAI Chat Completions для проверки сервиса номеров без сети.
+
+Запуск:
+    python stub_openai.py
+    OPENAI_BASE_URL=http://localhost:8090/v1 API=stub python app.py
+
+GET /calls показывает, сколько раз сервис действительно обратился к "модели" —
+удобно проверять объединение запросов и кэш.
+"""
+import asyncio
+import json
+import os
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+STUB_PLATE = os.getenv("STUB_PLATE", "A123BC77")
+# Искусственная задержка ответа, чтобы одновременные запросы успели "встретиться"
+STUB_DELAY = float(os.getenv("STUB_DELAY", "1.0"))
+
+app = FastAPI()
+calls = {"count": 0}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    calls["count"] += 1
+    await asyncio.sleep(STUB_DELAY)
+    return {
+        "id": f"chatcmpl-stub-{calls['count']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"plate": STUB_PLATE})},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.get("/calls")
+def get_calls():
+    return calls
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, port=8090)
@@ -11,6 +11,11 @@ class Settings(BaseSettings):
     db_user: str = Field(default="app", alias="DB_USER")
     db_pass: str = Field(default="secret", alias="DB_PASS")
 
+    # обязателен: общий для всех воркеров и перезапусков ключ подписи токенов
+    session_secret: str = Field(alias="SESSION_SECRET", min_length=16)
+    session_ttl: int = Field(default=900, alias="SESSION_TTL")
+    credential_cache_ttl: int = Field(default=300, alias="CREDENTIAL_CACHE_TTL")
+
     @property
     def sync_dsn(self) -> str:
         return f"postgresql+psycopg://{self.db_user}:{self.db_pass}@{self.db_host}:{self.db_port}/{self.db_name}"
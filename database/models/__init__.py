@@ -1,2 +1,4 @@
 from .users import User
-from .vehicles import Vehicle
\ No newline at end of file
+from .vehicles import Vehicle
+from .access_events import AccessEvent
+from .results import DetectionResult
@@ -0,0 +1,36 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Float, Identity, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from database.db import Base
+
+
+class AccessEvent(Base):
+    """
+    Журнал решений о въезде. Таблица секционирована по месяцам
+    (PARTITION BY RANGE (occurred_at)), поэтому ключ включает occurred_at,
+    а старые месяцы удаляются DROP'ом секции.
+    """
+    __tablename__ = "access_events"
+    __table_args__ = (
+        Index("ix_access_events_occurred_at", "occurred_at"),
+        Index("ix_access_events_camera_occurred_at", "camera_id", "occurred_at"),
+        # /access-events/{event_id}/trace: поиск по событию без обхода всех секций
+        Index("ix_access_events_event_occurred_at", "event_id", "occurred_at"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    occurred_at: Mapped[datetime] = mapped_column(primary_key=True, default=datetime.now)
+    camera_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    event_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    track_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    plate: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    vehicle_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    decision: Mapped[str] = mapped_column(String(32))
+    # от въезда в регион до решения и время распознавания номера, мс
+    decision_latency_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    recognition_latency_ms: Mapped[float | None] = mapped_column(Float, nullable=True)
+    snapshot: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    # стадии от захвата кадра до подъёма шлагбаума (utils.tracing.Trace.to_dict)
+    trace: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Index, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+from database.db import Base
+
+
+class DetectionResult(Base):
+    __tablename__ = "detection_results"
+    __table_args__ = (
+        Index("ix_detection_results_created_at_id", text("created_at DESC"), text("id DESC")),
+        Index("ix_detection_results_source_created_at", "source", text("created_at DESC")),
+    )
+
+    # uuid задаётся при создании записи — до записи в БД (write-behind)
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(default=datetime.now)
+    source: Mapped[str] = mapped_column(String(64), default="-")
+    title: Mapped[str] = mapped_column(String(255), default="")
+    description: Mapped[str] = mapped_column(String(1000), default="")
+    link: Mapped[str] = mapped_column(String(500), default="")
@@ -1,11 +1,28 @@
 from datetime import datetime
-from sqlalchemy import String, Boolean
+from sqlalchemy import String, Boolean, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 from database.db import Base
 
 
 class Vehicle(Base):
     __tablename__ = "vehicles"
+    __table_args__ = (
+        # keyset-пагинация: ORDER BY created_at DESC, id DESC
+        Index("ix_vehicles_created_at_id", text("created_at DESC"), text("id DESC")),
+        # то же для active_only — частичный индекс только по активным
+        Index(
+            "ix_vehicles_active_created_at_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_where=text("is_active"),
+        ),
+        # поиск по префиксу номера (LIKE 'A12%') при любой collation
+        Index(
+            "ix_vehicles_license_plate_prefix",
+            "license_plate",
+            postgresql_ops={"license_plate": "varchar_pattern_ops"},
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     license_plate: Mapped[str] = mapped_column(String(20), unique=True, index=True)
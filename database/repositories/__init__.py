@@ -1,2 +1,4 @@
 from .users import UserRepository
-from .vehicles import VehicleRepository
\ No newline at end of file
+from .vehicles import VehicleRepository
+from .access_events import AccessEventRepository
+from .results import ResultRepository
@@ -0,0 +1,127 @@
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import insert, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import AccessEvent
+
+PARTITION_PREFIX = "access_events_"
+DEFAULT_PARTITION = "access_events_default"
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+class AccessEventRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_many(self, events: Sequence[Dict[str, Any]]) -> int:
+        """Одна пачка — один INSERT (executemany)."""
+        if not events:
+            return 0
+        await self.session.execute(insert(AccessEvent), list(events))
+        return len(events)
+
+    async def list(
+        self,
+        limit: int = 100,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        camera_id: Optional[str] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+    ) -> Sequence[AccessEvent]:
+        """Новые сверху; фильтр по времени отсекает лишние секции."""
+        query = select(AccessEvent)
+        if since is not None:
+            query = query.where(AccessEvent.occurred_at >= since)
+        if until is not None:
+            query = query.where(AccessEvent.occurred_at < until)
+        if camera_id:
+            query = query.where(AccessEvent.camera_id == camera_id)
+        if after is not None:
+            query = query.where(tuple_(AccessEvent.occurred_at, AccessEvent.id) < tuple_(*after))
+        query = query.order_by(AccessEvent.occurred_at.desc(), AccessEvent.id.desc()).limit(limit)
+        res = await self.session.execute(query)
+        return res.scalars().all()
+
+    async def get_by_event_id(self, event_id: str, since: Optional[datetime] = None) -> Optional[AccessEvent]:
+        """Последняя запись по событию въезда; since ограничивает просматриваемые секции."""
+        query = select(AccessEvent).where(AccessEvent.event_id == event_id)
+        if since is not None:
+            query = query.where(AccessEvent.occurred_at >= since)
+        query = query.order_by(AccessEvent.occurred_at.desc(), AccessEvent.id.desc()).limit(1)
+        res = await self.session.execute(query)
+        return res.scalars().first()
+
+    async def ensure_partitions(self, months_ahead: int = 1) -> List[str]:
+        """
+        Создаёт секции на текущий и следующие months_ahead месяцев.
+
+        Строки месяца, уже попавшие в default-секцию, переносятся в новую:
+        иначе CREATE ... PARTITION OF падает на проверке default-секции.
+        """
+        created = []
+        current = month_start(date.today())
+        for i in range(months_ahead + 1):
+            start = add_months(current, i)
+            name = partition_name(start)
+            exists = await self.session.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name})
+            if not exists:
+                await self._create_partition(name, start, add_months(start, 1))
+            created.append(name)
+        return created
+
+    async def _create_partition(self, name: str, start: date, end: date) -> None:
+        bounds = {"start": start, "end": end}
+        in_default = await self.session.scalar(text(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+            f"WHERE occurred_at >= :start AND occurred_at < :end)"
+        ), bounds)
+        create = (
+            f"CREATE TABLE {name} PARTITION OF access_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        if not in_default:
+            await self.session.execute(text(create))
+            return
+        # detach -> create -> перенос строк -> attach, в одной транзакции
+        await self.session.execute(text(f"ALTER TABLE access_events DETACH PARTITION {DEFAULT_PARTITION}"))
+        await self.session.execute(text(create))
+        await self.session.execute(text(
+            f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} "
+            f"WHERE occurred_at >= :start AND occurred_at < :end"
+        ), bounds)
+        await self.session.execute(text(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE occurred_at >= :start AND occurred_at < :end"
+        ), bounds)
+        await self.session.execute(text(f"ALTER TABLE access_events ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+    async def drop_partitions_before(self, cutoff: date) -> List[str]:
+        """Удаляет месячные секции, целиком лежащие раньше cutoff."""
+        res = await self.session.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'access_events'"
+        ))
+        dropped = []
+        limit = month_start(cutoff)
+        for name in res.scalars().all():
+            suffix = name[len(PARTITION_PREFIX):]
+            if not (name.startswith(PARTITION_PREFIX) and suffix.isdigit() and len(suffix) == 6):
+                continue  # default-секция и прочее не трогаем
+            start = datetime.strptime(suffix, "%Y%m").date()
+            if add_months(start, 1) <= limit:
+                await self.session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+        return dropped
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import DetectionResult
+
+
+class ResultRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def add_many(self, results: Sequence[Dict[str, Any]]) -> int:
+        if not results:
+            return 0
+        await self.session.execute(insert(DetectionResult), list(results))
+        return len(results)
+
+    async def list(
+        self,
+        limit: int = 50,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        source: Optional[str] = None,
+        after: Optional[Tuple[datetime, str]] = None,
+    ) -> Sequence[DetectionResult]:
+        """Новые сверху, keyset по (created_at, id)."""
+        query = select(DetectionResult)
+        if source:
+            query = query.where(DetectionResult.source == source)
+        if since is not None:
+            query = query.where(DetectionResult.created_at >= since)
+        if until is not None:
+            query = query.where(DetectionResult.created_at < until)
+        if after is not None:
+            query = query.where(tuple_(DetectionResult.created_at, DetectionResult.id) < tuple_(*after))
+        query = query.order_by(DetectionResult.created_at.desc(), DetectionResult.id.desc()).limit(limit)
+        res = await self.session.execute(query)
+        return res.scalars().all()
@@ -3,14 +3,14 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import User
 from database.schemas import UserCreate
-from database.security import hash_password, verify_password
+from database.security import credential_cache, hash_password_async, verify_password_async
 
 class UserRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create(self, data: UserCreate) -> User:
-        hashed = hash_password(data.password)
+        hashed = await hash_password_async(data.password)
         user = User(email=data.email, password=hashed, role=data.role or "operator")
         self.session.add(user)
         await self.session.flush()
@@ -28,7 +28,11 @@ class UserRepository:
         user = await self.by_email(email)
         if not user:
             return None
-        if verify_password(password, user.password):
+        # недавно проверенная пара email/пароль — без повторного Argon2
+        if credential_cache.check(email, password, user.id, user.password):
+            return user
+        if await verify_password_async(password, user.password):
+            credential_cache.put(email, password, user.id, user.password)
             return user
         return None
 
@@ -1,9 +1,13 @@
-from typing import Sequence
-from sqlalchemy import select, delete, update
+from datetime import datetime
+from typing import AsyncIterator, Optional, Sequence, Tuple
+from sqlalchemy import select, delete, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.models import Vehicle
 from database.schemas import VehicleCreate, VehicleUpdate
 
+IMPORT_STAGING_TABLE = "vehicles_import"
+IMPORT_COLUMNS = ("license_plate", "owner_name", "notes", "is_active")
+
 
 class VehicleRepository:
     def __init__(self, session: AsyncSession):
@@ -29,11 +33,29 @@ class VehicleRepository:
         )
         return res.scalar_one_or_none()
 
-    async def list(self, limit: int = 100, offset: int = 0, active_only: bool = False) -> Sequence[Vehicle]:
+    async def list(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        active_only: bool = False,
+        after: Optional[Tuple[datetime, int]] = None,
+        plate_prefix: Optional[str] = None,
+    ) -> Sequence[Vehicle]:
+        """
+        Новые сверху. after=(created_at, id) последней строки предыдущей
+        страницы — keyset-пагинация по индексу, без OFFSET; offset оставлен
+        для старых клиентов.
+        """
         query = select(Vehicle)
         if active_only:
             query = query.where(Vehicle.is_active == True)
-        query = query.order_by(Vehicle.created_at.desc()).limit(limit).offset(offset)
+        if plate_prefix:
+            query = query.where(Vehicle.license_plate.startswith(plate_prefix, autoescape=True))
+        if after is not None:
+            query = query.where(tuple_(Vehicle.created_at, Vehicle.id) < tuple_(*after))
+        elif offset:
+            query = query.offset(offset)
+        query = query.order_by(Vehicle.created_at.desc(), Vehicle.id.desc()).limit(limit)
         res = await self.session.execute(query)
         return res.scalars().all()
 
@@ -44,6 +66,13 @@ class VehicleRepository:
         )
         return [plate for plate in res.scalars().all()]
 
+    async def get_active_plate_ids(self) -> dict:
+        """Активные номера -> id машины (для журнала въездов)"""
+        res = await self.session.execute(
+            select(Vehicle.license_plate, Vehicle.id).where(Vehicle.is_active == True)
+        )
+        return {plate: vehicle_id for plate, vehicle_id in res.all()}
+
     async def update(self, vehicle_id: int, data: VehicleUpdate) -> Vehicle | None:
         vehicle = await self.get(vehicle_id)
         if not vehicle:
@@ -65,3 +94,57 @@ class VehicleRepository:
         res = await self.session.execute(delete(Vehicle).where(Vehicle.id == vehicle_id))
         return res.rowcount or 0
 
+    async def bulk_upsert(self, rows: Sequence[VehicleCreate], on_conflict: str = "update") -> Tuple[int, int]:
+        """
+        Массовая загрузка: COPY во временную таблицу, затем один
+        INSERT ... ON CONFLICT (license_plate) в vehicles.
+        on_conflict: "update" — перезаписать существующие, "skip" — оставить.
+        Возвращает (inserted, updated).
+        """
+        if not rows:
+            return 0, 0
+        connection = await self.session.connection()
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection  # asyncpg.Connection
+
+        await driver.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {IMPORT_STAGING_TABLE} ("
+            "license_plate varchar(20), owner_name varchar(255), "
+            "notes varchar(1000), is_active boolean)"
+        )
+        await driver.execute(f"TRUNCATE {IMPORT_STAGING_TABLE}")
+        await driver.copy_records_to_table(
+            IMPORT_STAGING_TABLE,
+            records=[(r.license_plate, r.owner_name, r.notes, r.is_active) for r in rows],
+            columns=list(IMPORT_COLUMNS),
+        )
+
+        if on_conflict == "skip":
+            conflict = "DO NOTHING"
+        else:
+            conflict = (
+                "DO UPDATE SET owner_name = EXCLUDED.owner_name, "
+                "notes = EXCLUDED.notes, is_active = EXCLUDED.is_active"
+            )
+        # xmax = 0 только у только что вставленных строк
+        result = await self.session.execute(text(
+            f"INSERT INTO vehicles (license_plate, owner_name, notes, is_active, created_at) "
+            f"SELECT license_plate, owner_name, notes, is_active, LOCALTIMESTAMP FROM {IMPORT_STAGING_TABLE} "
+            f"ON CONFLICT (license_plate) {conflict} "
+            f"RETURNING (xmax = 0) AS inserted"
+        ))
+        flags = result.scalars().all()
+        inserted = sum(1 for flag in flags if flag)
+        return inserted, len(flags) - inserted
+
+    async def iter_all(self, active_only: bool = False, batch_size: int = 1000) -> AsyncIterator[dict]:
+        """
+        Все машины серверным курсором, без загрузки таблицы в память.
+        Строки, а не ORM-объекты — они не копятся в identity map сессии.
+        """
+        query = select(*Vehicle.__table__.columns).order_by(Vehicle.id).execution_options(yield_per=batch_size)
+        if active_only:
+            query = query.where(Vehicle.is_active == True)
+        result = await self.session.stream(query)
+        async for row in result.mappings():
+            yield row
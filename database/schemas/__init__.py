@@ -1,2 +1,12 @@
-from .user import UserCreate, UserRead, AuthRequest, UserRole
-from .vehicle import VehicleCreate, VehicleRead, VehicleUpdate
\ No newline at end of file
+from .user import UserCreate, UserRead, AuthRequest, AuthResponse, UserRole
+from .vehicle import (
+    VehicleCreate,
+    VehicleRead,
+    VehicleUpdate,
+    VehicleImportRow,
+    VehicleImportError,
+    VehicleImportResult,
+    normalize_plate,
+    try_normalize_plate,
+)
+from .access_event import AccessEventRead
@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Any
+from pydantic import BaseModel
+
+
+class AccessEventRead(BaseModel):
+    id: int
+    occurred_at: datetime
+    camera_id: str | None
+    event_id: str | None
+    track_id: int | None
+    plate: str | None
+    vehicle_id: int | None
+    decision: str
+    decision_latency_ms: float | None
+    recognition_latency_ms: float | None
+    snapshot: str | None
+    trace: dict[str, Any] | None = None
+
+    class Config:
+        from_attributes = True
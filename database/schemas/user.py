@@ -20,4 +20,11 @@ class UserRead(BaseModel):
 
 class AuthRequest(BaseModel):
     email: EmailStr
-    password: str
\ No newline at end of file
+    password: str
+
+
+class AuthResponse(UserRead):
+    # короткоживущий подписанный токен: Authorization: Bearer <access_token>
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
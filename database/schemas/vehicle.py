@@ -1,5 +1,29 @@
-from pydantic import BaseModel
+import re
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
+from typing import List, Optional
+
+# Кириллица, похожая на латиницу на номерах, -> латиница (как отдаёт распознавание)
+_PLATE_TRANSLIT = str.maketrans("АВЕКМНОРСТУХ", "ABEKMHOPCTYX")
+_PLATE_RE = re.compile(r"^[A-Z0-9]{1,20}$")
+
+
+def normalize_plate(value: str) -> str:
+    """' а 123 вс-77 ' -> 'A123BC77'"""
+    if not isinstance(value, str):
+        raise ValueError("license plate must be a string")
+    plate = re.sub(r"[\s\-_.]", "", value).upper().translate(_PLATE_TRANSLIT)
+    if not _PLATE_RE.match(plate):
+        raise ValueError(f"invalid license plate: {value!r}")
+    return plate
+
+
+def try_normalize_plate(value) -> Optional[str]:
+    """normalize_plate для текста распознавания: None вместо ошибки."""
+    try:
+        return normalize_plate(str(value))
+    except ValueError:
+        return None
 
 
 class VehicleCreate(BaseModel):
@@ -8,6 +32,12 @@ class VehicleCreate(BaseModel):
     notes: str | None = None
     is_active: bool = True
 
+    # номер хранится в одном виде, как его отдаёт распознавание: A123BC77
+    @field_validator("license_plate", mode="before")
+    @classmethod
+    def _normalize_plate(cls, value: str) -> str:
+        return normalize_plate(value)
+
 
 class VehicleRead(BaseModel):
     id: int
@@ -27,3 +57,32 @@ class VehicleUpdate(BaseModel):
     notes: str | None = None
     is_active: bool | None = None
 
+    @field_validator("license_plate", mode="before")
+    @classmethod
+    def _normalize_plate(cls, value: str | None) -> str | None:
+        return normalize_plate(value) if value is not None else None
+
+
+class VehicleImportRow(VehicleCreate):
+    owner_name: str = Field(max_length=255)
+    notes: str | None = Field(default=None, max_length=1000)
+
+    @field_validator("notes", mode="before")
+    @classmethod
+    def _empty_notes(cls, value):
+        return value or None
+
+
+class VehicleImportError(BaseModel):
+    line: int
+    error: str
+
+
+class VehicleImportResult(BaseModel):
+    received: int = 0
+    inserted: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: List[VehicleImportError] = []
+    errors_truncated: bool = False
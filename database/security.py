@@ -1,5 +1,18 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
 from passlib.context import CryptContext
 
+from database.config import settings
+
 # Argon2id — самый безопасный вариант
 pwd_context = CryptContext(
     schemes=["argon2"],
@@ -9,8 +22,114 @@ pwd_context = CryptContext(
     argon2__parallelism=8,       # 8 threads
 )
 
+# Argon2 не должен блокировать event loop; пул маленький — каждая проверка
+# занимает 100 MB, одновременно их идёт не больше max_workers
+_hash_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="argon2")
+
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+
+# ----------------------------------------------------------------------
+# Кэш недавно проверенных логинов/паролей
+# ----------------------------------------------------------------------
+class CredentialCache:
+    """
+    email+password -> (user_id, password hash), bounded and with a TTL.
+
+    Keys are HMACs of the credentials with a server secret, so plain passwords
+    are never kept in memory. An entry is only valid while the user's stored
+    hash is unchanged, so a password change invalidates it immediately.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_items: int = 1024):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items: "OrderedDict[bytes, Tuple[int, str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(email: str, password: str) -> bytes:
+        msg = email.lower().encode("utf-8") + b"\0" + password.encode("utf-8")
+        return hmac.new(settings.session_secret.encode("utf-8"), msg, hashlib.sha256).digest()
+
+    def check(self, email: str, password: str, user_id: int, password_hash: str) -> bool:
+        key = self._key(email, password)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return False
+            cached_id, cached_hash, expires_at = entry
+            if expires_at < time.monotonic() or cached_id != user_id or cached_hash != password_hash:
+                del self._items[key]
+                return False
+            self._items.move_to_end(key)
+            return True
+
+    def put(self, email: str, password: str, user_id: int, password_hash: str) -> None:
+        key = self._key(email, password)
+        with self._lock:
+            self._items[key] = (user_id, password_hash, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+credential_cache = CredentialCache(ttl=settings.credential_cache_ttl)
+
+
+# ----------------------------------------------------------------------
+# Подписанные сессионные токены: "<payload>.<signature>" (base64url)
+# ----------------------------------------------------------------------
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    digest = hmac.new(settings.session_secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).digest()
+    return _b64encode(digest)
+
+
+def create_session_token(user_id: int, email: str, role: str, ttl: Optional[int] = None) -> Tuple[str, int]:
+    """Returns the token and its lifetime in seconds."""
+    ttl = ttl or settings.session_ttl
+    claims = {"sub": user_id, "email": email, "role": role, "exp": int(time.time()) + ttl}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}", ttl
+
+
+def decode_session_token(token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired token, otherwise None."""
+    payload, sep, signature = token.partition(".")
+    # байты, а не str: compare_digest на не-ASCII строке бросает TypeError
+    if not sep or not hmac.compare_digest(signature.encode("utf-8"), _sign(payload).encode("ascii")):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) < time.time():
+        return None
+    return claims
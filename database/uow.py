@@ -1,12 +1,14 @@
 from contextlib import asynccontextmanager
 from .db import SessionLocal
-from .repositories import UserRepository, VehicleRepository
+from .repositories import AccessEventRepository, ResultRepository, UserRepository, VehicleRepository
 
 class UnitOfWork:
     def __init__(self):
         self.session = SessionLocal()
         self.users = UserRepository(self.session)
         self.vehicles = VehicleRepository(self.session)
+        self.access_events = AccessEventRepository(self.session)
+        self.results = ResultRepository(self.session)
 
     @asynccontextmanager
     async def __call__(self):
@@ -0,0 +1,74 @@
+from utils.inference_control import InferenceController, imgsz_levels_from
+
+
+def feed(controller, latency_ms, frames, inferred=True, source_frames=1):
+    changed = False
+    for _ in range(frames):
+        changed |= controller.observe({"infer": latency_ms}, inferred=inferred, source_frames=source_frames)
+    return changed
+
+
+def make(**kwargs):
+    options = dict(budget_ms=100, source_fps=10, window=4, cooldown=0, imgsz_levels=(640, 320))
+    options.update(kwargs)
+    return InferenceController(**options)
+
+
+def test_imgsz_levels_from():
+    assert imgsz_levels_from(None) == [640, 512, 416, 320]
+    assert imgsz_levels_from(512) == [512, 416, 320]
+
+
+def test_no_decision_before_half_window():
+    controller = make()
+    assert not feed(controller, 500, 1)
+    assert controller.imgsz == 640
+
+
+def test_over_budget_lowers_imgsz_then_model_then_sampling():
+    controller = make(model_tiers=("yolo11l.pt", "yolo11n.pt"))
+
+    assert feed(controller, 500, 2) and controller.imgsz == 320
+    assert feed(controller, 500, 2) and controller.model_path == "yolo11n.pt"
+    assert feed(controller, 500, 2) and controller.skip_frames == 2
+    assert controller.changes == 3
+
+
+def test_falling_behind_source_raises_skip_only():
+    # 60 ms на кадр при 10 fps источника (100 ms) — не отстаём, при 150 ms — отстаём
+    controller = make(budget_ms=1000)
+    assert not feed(controller, 60, 2)
+
+    assert feed(controller, 150, 2)
+    assert controller.skip_frames == 2 and controller.imgsz == 640
+
+
+def test_headroom_restores_in_reverse_order():
+    controller = make(model_tiers=("l", "n"))
+    controller.imgsz_index, controller.model_tier, controller.skip_frames = 1, 1, 3
+
+    steps = []
+    while feed(controller, 10, 2):
+        steps.append((controller.skip_frames, controller.model_path, controller.imgsz))
+
+    assert steps == [(2, "n", 320), (1, "n", 320), (1, "l", 320), (1, "l", 640)]
+
+
+def test_cooldown_limits_changes():
+    controller = make(cooldown=60)
+    controller._last_change -= 61
+
+    assert feed(controller, 500, 4)
+    assert not feed(controller, 500, 4)
+    assert controller.changes == 1
+
+
+def test_status():
+    controller = make()
+    feed(controller, 50, 1)
+
+    status = controller.status()
+
+    assert status["imgsz"] == 640 and status["skip_frames"] == 1
+    assert status["p95_latency_ms"] == 50.0
+    assert status["stage_avg_ms"] == {"infer": 50.0}
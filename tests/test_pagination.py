@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+
+from utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_round_trip():
+    ts = datetime(2026, 10, 19, 12, 30, 15, 123456)
+
+    cursor = encode_cursor(ts, 42)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, (datetime, int)) == (ts, 42)
+
+
+@pytest.mark.parametrize("cursor, types", [
+    ("not base64!!", (int,)),
+    (encode_cursor(1, 2), (int,)),
+    (encode_cursor("yesterday", 1), (datetime, int)),
+    (encode_cursor("x"), (int,)),
+])
+def test_invalid_cursor(cursor, types):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, types)
+
+
+def test_invalid_cursor_is_value_error():
+    assert issubclass(InvalidCursor, ValueError)
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [1] * 5
+    assert calls == 1
+
+
+def test_results_cached_for_ttl_and_forget():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def main():
+        flight = SingleFlight(ttl=60)
+        first = await flight.do("k", fetch)
+        cached = await flight.do("k", fetch)
+        flight.forget("k")
+        fresh = await flight.do("k", fetch)
+        return first, cached, fresh
+
+    assert asyncio.run(main()) == (1, 1, 2)
+
+
+def test_max_items_evicts_oldest():
+    async def main():
+        flight = SingleFlight(ttl=60, max_items=2)
+        for key in ("a", "b", "c"):
+            await flight.do(key, lambda key=key: asyncio.sleep(0, result=key))
+        return list(flight._results)
+
+    assert asyncio.run(main()) == ["b", "c"]
+
+
+def test_failures_are_shared_but_not_cached():
+    calls = 0
+
+    async def fail():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight(ttl=60)
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do("k", fail)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert calls == 2
+
+
+def test_owner_cancellation_is_not_inherited_by_waiters():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "plate"
+
+    async def main():
+        flight = SingleFlight()
+        owner = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(main()) == "plate"
+    assert calls == 2
+
+
+def test_cancelled_waiter_does_not_cancel_owner():
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "plate"
+
+    async def main():
+        flight = SingleFlight()
+        owner = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await owner
+
+    assert asyncio.run(main()) == "plate"
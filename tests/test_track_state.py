@@ -0,0 +1,86 @@
+from utils.track_state import ENTERED, EXITED, TrackStateMachine
+
+ZONES = ["gate"]
+
+
+def kinds(events):
+    return [e["type"] for e in events]
+
+
+def test_enter_after_enter_frames():
+    fsm = TrackStateMachine(enter_frames=3)
+
+    assert fsm.update({1: {"gate"}}, ZONES, now=0.0) == []
+    assert fsm.update({1: {"gate"}}, ZONES, now=0.1) == []
+    events = fsm.update({1: {"gate"}}, ZONES, now=0.2)
+
+    assert kinds(events) == ["enter"]
+    assert events[0]["track_id"] == 1 and events[0]["zone"] == "gate"
+    assert events[0]["event_id"]
+    assert [s.track_id for s in fsm.inside("gate")] == [1]
+
+
+def test_enter_streak_resets_on_frame_outside():
+    fsm = TrackStateMachine(enter_frames=2)
+
+    fsm.update({1: {"gate"}}, ZONES, now=0.0)
+    fsm.update({1: set()}, ZONES, now=0.1)
+    assert fsm.update({1: {"gate"}}, ZONES, now=0.2) == []
+    assert kinds(fsm.update({1: {"gate"}}, ZONES, now=0.3)) == ["enter"]
+
+
+def test_exit_after_exit_frames_not_on_single_miss():
+    fsm = TrackStateMachine(enter_frames=1, exit_frames=3)
+    enter = fsm.update({1: {"gate"}}, ZONES, now=0.0)[0]
+
+    fsm.update({1: set()}, ZONES, now=0.1)
+    fsm.update({1: set()}, ZONES, now=0.2)
+    # один кадр снова внутри обнуляет счётчик выхода
+    assert fsm.update({1: {"gate"}}, ZONES, now=0.3) == []
+    fsm.update({1: set()}, ZONES, now=0.4)
+    fsm.update({1: set()}, ZONES, now=0.5)
+    events = fsm.update({1: set()}, ZONES, now=0.6)
+
+    assert kinds(events) == ["exit"]
+    assert events[0]["event_id"] == enter["event_id"]
+    assert events[0]["dwell"] == 0.6
+    assert fsm.states[(1, "gate")].phase == EXITED
+
+
+def test_detection_dropout_within_grace_keeps_track_inside():
+    fsm = TrackStateMachine(enter_frames=1, exit_grace=1.0)
+    fsm.update({1: {"gate"}}, ZONES, now=0.0)
+
+    assert fsm.update({}, ZONES, now=0.5) == []
+    assert fsm.update({1: {"gate"}}, ZONES, now=0.6) == []
+    assert fsm.states[(1, "gate")].phase == ENTERED
+
+
+def test_exit_by_grace_uses_last_seen_time():
+    fsm = TrackStateMachine(enter_frames=1, exit_grace=1.0)
+    fsm.update({1: {"gate"}}, ZONES, now=0.0)
+    fsm.update({1: {"gate"}}, ZONES, now=0.4)
+
+    events = fsm.update({}, ZONES, now=1.5)
+
+    assert kinds(events) == ["exit"]
+    assert fsm.states[(1, "gate")].exited_at == 0.4
+
+
+def test_reentry_gets_new_event_id():
+    fsm = TrackStateMachine(enter_frames=1, exit_frames=1)
+    first = fsm.update({1: {"gate"}}, ZONES, now=0.0)[0]
+    fsm.update({1: set()}, ZONES, now=0.1)
+    second = fsm.update({1: {"gate"}}, ZONES, now=0.2)[0]
+
+    assert second["type"] == "enter"
+    assert second["event_id"] != first["event_id"]
+
+
+def test_stale_states_are_removed():
+    fsm = TrackStateMachine(enter_frames=5, stale_after=2.0)
+    fsm.update({1: {"gate"}}, ZONES, now=0.0)
+
+    fsm.update({}, ZONES, now=2.5)
+
+    assert fsm.snapshot() == []
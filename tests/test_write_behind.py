@@ -0,0 +1,94 @@
+import asyncio
+
+from utils.write_behind import WriteBehindQueue
+
+
+class Sink:
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    async def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("db down")
+        self.batches.append(list(batch))
+
+
+def test_flushes_full_batches_without_waiting_for_interval():
+    sink = Sink()
+
+    async def main():
+        queue = WriteBehindQueue(sink, max_batch=3, flush_interval=60)
+        queue.start()
+        for i in range(6):
+            queue.put(i)
+        await asyncio.sleep(0.05)
+        flushed = list(sink.batches)
+        await queue.stop()
+        return flushed
+
+    assert asyncio.run(main()) == [[0, 1, 2], [3, 4, 5]]
+
+
+def test_flushes_partial_batch_after_interval():
+    sink = Sink()
+
+    async def main():
+        queue = WriteBehindQueue(sink, max_batch=100, flush_interval=0.02)
+        queue.start()
+        queue.put("a")
+        await asyncio.sleep(0.1)
+        flushed = list(sink.batches)
+        await queue.stop()
+        return flushed, queue.stats()
+
+    flushed, stats = asyncio.run(main())
+    assert flushed == [["a"]]
+    assert stats["written"] == 1 and stats["pending"] == 0
+
+
+def test_stop_writes_out_the_rest():
+    sink = Sink()
+
+    async def main():
+        queue = WriteBehindQueue(sink, max_batch=2, flush_interval=60)
+        queue.start()
+        await asyncio.sleep(0)
+        queue.put(1)
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(main())
+    assert sink.batches == [[1]]
+    assert stats["written"] == 1
+
+
+def test_failed_batch_is_retried_then_dropped(monkeypatch):
+    async def no_sleep(_):
+        return None
+
+    async def main(sink, max_retries):
+        queue = WriteBehindQueue(sink, max_retries=max_retries)
+        queue.put("x")
+        monkeypatch.setattr(asyncio, "sleep", no_sleep)
+        await queue._flush_batch()
+        monkeypatch.undo()
+        return queue.stats()
+
+    recovered = Sink(failures=2)
+    stats = asyncio.run(main(recovered, max_retries=2))
+    assert recovered.batches == [["x"]] and stats["written"] == 1
+
+    broken = Sink(failures=10)
+    stats = asyncio.run(main(broken, max_retries=2))
+    assert broken.batches == [] and stats["failed"] == 1 and stats["written"] == 0
+
+
+def test_full_queue_drops_oldest():
+    queue = WriteBehindQueue(Sink(), max_queue=3)
+    for i in range(5):
+        queue.put(i)
+
+    assert list(queue._items) == [2, 3, 4]
+    assert queue.stats()["dropped"] == 2
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from utils.zones import MAX_ZONES, ZoneEngine, region_to_points
+
+SHAPE = (100, 200)
+
+
+def test_region_to_points_rectangle_and_polygon():
+    rect = region_to_points((10, 20, 30, 40))
+    assert rect.tolist() == [[10, 20], [30, 20], [30, 40], [10, 40]]
+    poly = region_to_points([(0, 0), (10, 0), (5, 10)])
+    assert poly.shape == (3, 2)
+
+
+def test_region_to_points_rejects_degenerate_region():
+    with pytest.raises(ValueError):
+        region_to_points([(0, 0), (10, 10)])
+
+
+def test_hit_test_overlapping_zones():
+    engine = ZoneEngine()
+    engine.configure({"left": (0, 0, 100, 99), "right": (50, 0, 199, 99)}, {})
+
+    hits, names = engine.hit_test(np.array([[10, 50], [75, 50], [150, 50]]), SHAPE)
+
+    assert names == ["left", "right"]
+    assert hits.tolist() == [[True, False], [True, True], [False, True]]
+
+
+def test_hit_test_points_outside_frame():
+    engine = ZoneEngine()
+    engine.set_zone("all", (0, 0, 199, 99))
+
+    hits, _ = engine.hit_test(np.array([[-1, 10], [10, -5], [200, 10], [10, 100]]), SHAPE)
+
+    assert not hits.any()
+
+
+def test_hit_test_follows_zone_changes():
+    engine = ZoneEngine()
+    engine.set_zone("a", (0, 0, 50, 50))
+    point = np.array([[100, 20]])
+    assert not engine.hit_test(point, SHAPE)[0].any()
+
+    engine.set_zone("a", (80, 0, 150, 50))
+    assert engine.hit_test(point, SHAPE)[0].all()
+
+    engine.remove_zone("a")
+    hits, names = engine.hit_test(point, SHAPE)
+    assert names == [] and hits.shape == (1, 0)
+
+
+def test_too_many_zones():
+    engine = ZoneEngine()
+    zones = {f"z{i}": (0, 0, 10, 10) for i in range(MAX_ZONES + 1)}
+    with pytest.raises(ValueError):
+        engine.configure(zones, {})
+
+
+def test_line_crossing_directions():
+    engine = ZoneEngine()
+    # горизонтальная линия слева направо: "in" — снизу вверх на экране
+    engine.set_line("gate", (0, 50), (200, 50))
+
+    assert engine.update_tracks([1, 2], np.array([[20, 80], [40, 20]])) == []
+    crossings = engine.update_tracks([1, 2], np.array([[20, 20], [40, 80]]))
+
+    assert sorted((c["track_id"], c["direction"]) for c in crossings) == [(1, "in"), (2, "out")]
+    assert engine.lines[0].counts == {"in": 1, "out": 1}
+
+
+def test_line_crossing_ignores_line_extension_and_new_tracks():
+    engine = ZoneEngine()
+    engine.set_line("gate", (0, 50), (100, 50))
+
+    engine.update_tracks([1], np.array([[150, 80]]))
+    # пересекает продолжение линии за её концом
+    assert engine.update_tracks([1], np.array([[150, 20]])) == []
+    # первый кадр нового трека — предыдущей точки нет
+    assert engine.update_tracks([2], np.array([[50, 20]])) == []
+    assert engine.lines[0].counts == {"in": 0, "out": 0}
@@ -3,11 +3,35 @@ import redis
 import numpy as np
 from ultralytics import YOLO
 from ultralytics.utils.plotting import Annotator, colors
-from typing import Optional, List, Tuple, Union
-import os
-from datetime import datetime
-
-RegionType = Union[Tuple[int, int, int, int], List[Tuple[int, int]]]
+from typing import Dict, Optional, List, Tuple, Literal
+import threading
+import time
+
+from utils.cascade import CascadeRefiner
+from utils.crop_store import CropStore
+from utils.frame import Frame, as_frame, encode_jpeg
+from utils.tracing import Trace
+from utils.metrics import StageRecorder
+from utils.inference_control import InferenceController, imgsz_levels_from
+from utils.motion import BoxPredictor, TrackHandover
+from utils.profiler import ThreadProfile
+from utils.snapshot_writer import SnapshotWriter
+from utils.track_state import TrackStateMachine
+from utils.zones import REGION_ZONE, RegionType, ZoneEngine, region_to_points
+from utils.vehicle_events import (
+    VEHICLE_EVENTS_CHANNEL,
+    decode_event,
+    encode_event,
+    VEHICLE_CROP_TTL,
+    vehicle_crop_key,
+    vehicle_event_key,
+    vehicle_in_key,
+)
+
+CropMode = Literal["vehicle", "plate_area"]
+
+# JPEG качество для crop'ов, которые уходят в сервисы распознавания номеров
+CROP_JPEG_QUALITY = 90
 
 
 class YoloClass:
@@ -28,31 +52,138 @@ class YoloClass:
         resize=None,
         model_path="yolo_model.pt",
         region: Optional[RegionType] = None,
+        crop_max_side: int = 640,
+        crop_mode: CropMode = "vehicle",
+        crop_store_max_bytes: int = 32 * 1024 * 1024,
+        crop_max_age: float = 30.0,
+        trigger_zone: str = REGION_ZONE,
+        enter_frames: int = 2,
+        exit_frames: int = 5,
+        exit_grace: float = 1.5,
+        interpolate: bool = False,
+        imgsz: Optional[int] = None,
+        latency_budget_ms: Optional[float] = None,
+        model_tiers: Optional[List[str]] = None,
+        max_skip: int = 10,
+        cascade_model_path: Optional[str] = None,
+        cascade_margin: int = 80,
+        cascade_conf: float = 0.5,
+        snapshot_writer: Optional[SnapshotWriter] = None,
+        model=None,
+        model_warm: bool = False,
+        redis_client: Optional[redis.Redis] = None,
+        show: bool = True,
+        warmup: bool = True,
     ):
         self.source = source
         self.videocapture = cv2.VideoCapture(source)
         if not self.videocapture.isOpened():
             raise RuntimeError(f"❌ Не удалось открыть видеоисточник: {source}")
 
-        self.model = YOLO(model_path)
+        if latency_budget_ms and model_tiers:
+            # стартуем с самой точной модели из списка
+            model_path = model_tiers[0]
+        # model/redis_client можно передать готовыми (бенчмарк: заглушка модели, Redis в памяти)
+        self.model = model if model is not None else YOLO(model_path)
+        self._models: Dict[str, YOLO] = {model_path: self.model}
+        self._models_lock = threading.Lock()
+        self.model_path = model_path
+        # модель, выбранная контроллером; подменяется, когда загружена
+        self._wanted_model_path = model_path
+        # после смены модели трекер начинает id с 1 — сдвигаем их, а треки,
+        # которые уже были в кадре, сопоставляем со старыми по боксам
+        self._track_id_offset = 0
+        self._max_track_id = 0
+        self._last_tracks: Tuple[Optional[np.ndarray], np.ndarray] = (None, np.zeros((0, 4)))
+        self.track_handover = TrackHandover()
 
         # COCO classes: 2-car, 3-motorcycle, 5-bus, 7-truck
         self.car_classes = [2, 3, 5, 7]
 
         self.camera_id = camera_id
+        # гистограммы стадий и счётчики кадров для /metrics
+        self.metrics = StageRecorder(camera_id)
+        # профилирование по запросу (utils.profiler): поток цикла и активный cProfile
+        self.thread_ident: Optional[int] = None
+        self.profile: Optional[ThreadProfile] = None
+        # пробный инференс до первого кадра и время последнего кадра (для /health/ready)
+        # model_warm=True — модель уже прогрета (пул api), второй пробный инференс не нужен
+        self.warmup = warmup
+        self.warmed_up = model_warm
+        self.last_frame_at: Optional[float] = None
         self.skip_frames = skip_frames
         self.frame_counter = 0
         self.frame = None
         self.detection_status = True
         self.resize = resize
+        self.imgsz = imgsz
 
-        # сохранения кадра по id
-        self.vehicle_frames = {}  # vehicle_id -> jpeg bytes
+        # сохранения кадра по id: vehicle_id -> лучший jpeg crop трека
+        # (ограничен по суммарному размеру, ушедшие треки удаляются)
+        self.vehicle_frames = CropStore(max_bytes=crop_store_max_bytes, max_age=crop_max_age)
 
-        # Redis для стриминга
-        self.redis_server = redis.Redis(host="localhost", port=6379, db=0)
+        # Параметры crop'а для распознавания номера:
+        #   crop_max_side — максимальная сторона crop'а после уменьшения
+        #   crop_mode     — "vehicle" (весь бокс) или "plate_area" (нижняя часть бокса)
+        self.crop_max_side = crop_max_side
+        self.crop_mode = crop_mode
+
+        # Снимки въездов пишутся в фоне (очередь, контент-адресация, квота)
+        self.snapshots = snapshot_writer or SnapshotWriter.default()
 
-        # Регион (None, rect, or polygon)
+        # Redis для стриминга
+        self.redis_server = redis_client if redis_client is not None else redis.Redis(host="localhost", port=6379, db=0)
+        # show=False — без окна OpenCV (сервер, бенчмарк)
+        self.show = show
+
+        # interpolate=True: кадры между инференсами тоже читаются, боксы на них
+        # предсказываются по скорости трека — поток и проверка зон идут
+        # с частотой камеры, а YOLO — раз в skip_frames кадров
+        self.interpolate = interpolate
+        self.box_predictor = BoxPredictor()
+        self.class_names: Dict[int, str] = {}
+
+        # Адаптивный инференс: при заданном бюджете задержки контроллер сам
+        # меняет skip_frames, imgsz и (если заданы model_tiers) модель
+        self.controller: Optional[InferenceController] = None
+        if latency_budget_ms:
+            self.controller = InferenceController(
+                budget_ms=latency_budget_ms,
+                source_fps=self.videocapture.get(cv2.CAP_PROP_FPS),
+                skip_frames=skip_frames,
+                max_skip=max_skip,
+                imgsz_levels=imgsz_levels_from(imgsz),
+                model_tiers=model_tiers or (),
+            )
+            self._apply_controller()
+            # остальные модели грузятся заранее в фоне: переключение между
+            # ними — одно присваивание, цикл детекции не ждёт загрузки
+            self._preload_models(model_tiers or [])
+
+        # Каскад: model_path (nano) трекает каждый кадр инференса, точная модель
+        # запускается только на боксах у региона или с низкой уверенностью
+        self.cascade: Optional[CascadeRefiner] = None
+        if cascade_model_path:
+            self.cascade = CascadeRefiner(
+                YOLO(cascade_model_path),
+                classes=self.car_classes,
+                margin=cascade_margin,
+                low_conf=cascade_conf,
+            )
+
+        # Состояние каждого трека по зонам (въезд, время в зоне, выезд)
+        self.track_states = TrackStateMachine(
+            enter_frames=enter_frames,
+            exit_frames=exit_frames,
+            exit_grace=exit_grace,
+        )
+
+        # Зоны и линии подсчёта камеры. trigger_zone — зона въезда, по которой
+        # сохраняется crop и публикуются события для шлагбаума
+        self.zones = ZoneEngine()
+        self.trigger_zone = trigger_zone
+
+        # Регион (None, rect, or polygon) — зона trigger_zone
         self.region = None
         if region is not None:
             self.set_region(region)
@@ -66,45 +197,199 @@ class YoloClass:
           - (x1, y1, x2, y2)  -> rectangle
           - [(x1,y1), (x2,y2), ...] -> polygon
         """
-        if isinstance(region, tuple) and len(region) == 4:
-            x1, y1, x2, y2 = region
-            pts = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.int32)
-        else:
-            # assume polygon-like list of tuples
-            pts = np.array(region, dtype=np.int32)
-
-        # ensure shape (N, 2)
-        if pts.ndim != 2 or pts.shape[1] != 2:
-            raise ValueError("region must be (x1,y1,x2,y2) or list of (x,y) tuples")
-
-        self.region = pts
+        self.zones.set_zone(self.trigger_zone, region)
+        self.region = region_to_points(region)
 
     def clear_region(self):
+        self.zones.remove_zone(self.trigger_zone)
         self.region = None
 
-    def _is_point_in_region(self, x: int, y: int) -> bool:
-        """Возвращает True если точка внутри region. Если region отсутствует - False."""
-        if self.region is None:
-            return False
-        # cv2.pointPolygonTest принимает contour как Nx2 или Nx1x2
-        return cv2.pointPolygonTest(self.region, (int(x), int(y)), False) >= 0
+    def set_zones(self, zones: Dict[str, RegionType], lines: Dict[str, Tuple[Tuple[int, int], Tuple[int, int]]], trigger_zone: Optional[str] = None):
+        """Заменяет все зоны и линии подсчёта камеры."""
+        self.zones.configure(zones, lines)
+        if trigger_zone:
+            self.trigger_zone = trigger_zone
+        region = zones.get(self.trigger_zone)
+        self.region = region_to_points(region) if region is not None else None
+
+    # ---------------------- crop helpers ----------------------
+    def _crop_vehicle(self, frame: Frame, bbox: List[int]) -> Optional[bytes]:
+        """
+        Вырезает транспорт по bbox трека и возвращает JPEG bytes.
+
+        В режиме "plate_area" берётся нижняя половина бокса — там находится номер.
+        Crop уменьшается так, чтобы большая сторона не превышала crop_max_side.
+        Один и тот же crop кадра кодируется один раз (кэш в Frame).
+        """
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = bbox
+
+        # небольшой запас, чтобы номер не обрезался по краю бокса
+        pad_x = int((x2 - x1) * 0.05)
+        pad_y = int((y2 - y1) * 0.05)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(w, x2 + pad_x), min(h, y2 + pad_y)
+
+        if self.crop_mode == "plate_area":
+            y1 = y1 + (y2 - y1) // 2
+
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        return frame.crop_jpeg(x1, y1, x2, y2, max_side=self.crop_max_side, quality=CROP_JPEG_QUALITY)
 
     # ------------------------------------------------------------------
     # Основная детекция + трекинг
     # ------------------------------------------------------------------
-    def detect_and_track(self, frame):
-        results = self.model.track(frame, persist=True, classes=self.car_classes)
+    # ---------------------- adaptive inference ----------------------
+    def _preload_models(self, model_paths: List[str]) -> None:
+        missing = [path for path in dict.fromkeys(model_paths) if path not in self._models]
+        if not missing:
+            return
+
+        def load() -> None:
+            for path in missing:
+                try:
+                    model = YOLO(path)
+                    model.predict(np.zeros((640, 640, 3), dtype=np.uint8), classes=self.car_classes, verbose=False)
+                except Exception as e:
+                    print(f"Failed to preload model '{path}' for camera {self.camera_id}: {e}")
+                    continue
+                with self._models_lock:
+                    self._models.setdefault(path, model)
+
+        threading.Thread(target=load, name=f"model-preload-{self.camera_id}", daemon=True).start()
+
+    def _use_model(self, model_path: str):
+        self._wanted_model_path = model_path
+        self._switch_model()
+
+    def _switch_model(self):
+        """Подменяет модель на выбранную контроллером, если она уже загружена."""
+        model_path = self._wanted_model_path
+        if model_path == self.model_path:
+            return
+        with self._models_lock:
+            model = self._models.get(model_path)
+        if model is None:
+            return  # ещё грузится в фоне — переключимся на следующем инференсе
+        self.model = model
+        self.model_path = model_path
+        self._track_id_offset = self._max_track_id
+        self.track_handover.start(self.frame_counter, *self._last_tracks)
+
+    def _apply_controller(self):
+        """Применяет текущие ручки контроллера к детектору."""
+        self.skip_frames = self.controller.skip_frames
+        self.imgsz = self.controller.imgsz
+        if self.controller.model_path:
+            self._use_model(self.controller.model_path)
+
+    def inference_status(self) -> Dict:
+        status = {
+            "adaptive": self.controller is not None,
+            "skip_frames": self.skip_frames,
+            "imgsz": self.imgsz,
+            "model": self.model_path,
+        }
+        if self.controller is not None:
+            status.update(self.controller.status())
+        if self.cascade is not None:
+            status["cascade"] = self.cascade.stats()
+        return status
+
+    def health(self, stale_after: float = 5.0) -> Dict:
+        """Камера готова, если цикл запущен и кадр приходил не позже stale_after секунд назад."""
+        age = time.monotonic() - self.last_frame_at if self.last_frame_at is not None else None
+        running = self.thread_ident is not None
+        return {
+            "running": running,
+            "warmed_up": self.warmed_up,
+            "last_frame_age_s": round(age, 3) if age is not None else None,
+            "ready": running and age is not None and age <= stale_after,
+        }
+
+    def _warm_up(self) -> None:
+        """
+        Пробный инференс на пустом кадре до начала цикла: загрузка весов на
+        устройство и инициализация бэкенда не ложатся на первый въезд.
+        predict, а не track — состояние трекера не трогаем.
+        """
+        size = self.imgsz or 640
+        kwargs = {"classes": self.car_classes, "verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        t0 = time.perf_counter()
+        try:
+            self.model.predict(np.zeros((size, size, 3), dtype=np.uint8), **kwargs)
+        except Exception as e:
+            print(f"Warmup inference failed for camera {self.camera_id}: {e}")
+            return
+        self.metrics.observe("warmup", time.perf_counter() - t0)
+        self.warmed_up = True
 
-        any_vehicle_in_region = False
-        tracked_objects = []
+    def detect_and_track(self, frame):
+        self._switch_model()
+        packet = as_frame(frame)
+        frame = packet.image
+        track_kwargs = {"persist": True, "classes": self.car_classes}
+        if self.imgsz:
+            track_kwargs["imgsz"] = self.imgsz
+        t0 = time.perf_counter()
+        results = self.model.track(frame, **track_kwargs)
+        self.metrics.observe("inference", time.perf_counter() - t0)
+        packet.mark("inference")
 
         boxes = results[0].boxes.xyxy.cpu().numpy()
         ids = results[0].boxes.id
         clss = results[0].boxes.cls.cpu().numpy()
-        names = results[0].names
+        confs = results[0].boxes.conf.cpu().numpy()
+        self.class_names = results[0].names
 
         if ids is not None:
-            ids = ids.cpu().numpy()
+            ids = ids.cpu().numpy() + self._track_id_offset
+            if len(ids):
+                self._max_track_id = max(self._max_track_id, int(ids.max()))
+            # после смены модели: те же машины сохраняют свои id
+            ids = self.track_handover.map(self.frame_counter, ids, boxes)
+        self._last_tracks = (ids, boxes)
+
+        if self.cascade is not None and len(boxes):
+            t0 = time.perf_counter()
+            boxes, clss, confs = self.cascade.refine(frame, boxes, clss, confs, self.region)
+            self.metrics.observe("cascade", time.perf_counter() - t0)
+            packet.mark("cascade")
+
+        if self.interpolate:
+            self.box_predictor.update(self.frame_counter, ids, boxes, clss, confs)
+
+        t0 = time.perf_counter()
+        processed = self._process_detections(packet, boxes, ids, clss, confs, inferred=True)
+        self.metrics.observe("annotate", time.perf_counter() - t0)
+        return processed
+
+    def interpolate_tracks(self, frame):
+        """
+        Кадр без инференса: боксы треков экстраполируются по скорости
+        с последнего инференса, дальше — та же проверка зон и аннотация.
+        """
+        t0 = time.perf_counter()
+        packet = as_frame(frame)
+        ids, boxes, clss, confs = self.box_predictor.predict(self.frame_counter)
+        packet.mark("interpolate")
+        processed = self._process_detections(packet, boxes, ids, clss, confs, inferred=False)
+        self.metrics.observe("annotate", time.perf_counter() - t0)
+        return processed
+
+    def _process_detections(self, packet: Frame, boxes, ids, clss, confs, inferred: bool):
+        frame = packet.image
+        tracked_objects = []
+        names = self.class_names
+
+        # центры всех боксов проверяются по всем зонам одним вызовом
+        centers = np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2))
+        zone_hits, zone_names = self.zones.hit_test(centers, frame.shape)
+        trigger_idx = zone_names.index(self.trigger_zone) if self.trigger_zone in zone_names else None
 
         annotator = Annotator(frame.copy(), line_width=2)
 
@@ -113,102 +398,198 @@ class YoloClass:
             cls = int(clss[i])
             obj_id = int(ids[i]) if ids is not None else None
 
-            # центр
-            cx = int((x1 + x2) / 2)
-            cy = int((y1 + y2) / 2)
-
-            in_region = self._is_point_in_region(cx, cy) if self.region is not None else False
-            if in_region:
-                any_vehicle_in_region = True
+            in_region = bool(zone_hits[i, trigger_idx]) if trigger_idx is not None else False
+            obj_zones = [zone_names[j] for j in np.flatnonzero(zone_hits[i])]
 
             # рисование бокса
             box_color = colors(cls, True)
-            label = f"{names[cls]}"
+            label = f"{names.get(cls, cls)}"
             if obj_id is not None:
                 label += f" ID:{obj_id}"
             label += f" {'IN' if in_region else 'OUT'}"
+            other_zones = [z for z in obj_zones if z != self.trigger_zone]
+            if other_zones:
+                label += f" [{','.join(other_zones)}]"
 
             annotator.box_label([x1, y1, x2, y2], label, color=box_color)
 
             tracked_objects.append({
                 "id": obj_id,
                 "bbox": [x1, y1, x2, y2],
-                "in_region": in_region
+                "in_region": in_region,
+                "zones": obj_zones,
             })
 
+            # лучший crop трека: крупнее и увереннее — лучше
+            # (только по реальным детекциям, не по экстраполированным боксам)
+            if inferred and obj_id is not None:
+                score = (x2 - x1) * (y2 - y1) * float(confs[i])
+                if self.vehicle_frames.wants(obj_id, score):
+                    crop = self._crop_vehicle(packet, [x1, y1, x2, y2])
+                    if crop:
+                        self.vehicle_frames.put(obj_id, crop, score)
+
+        track_ids = [obj["id"] for obj in tracked_objects if obj["id"] is not None]
+        if inferred:
+            self.vehicle_frames.touch(track_ids)
+            self.vehicle_frames.expire()
+
+        # ---- Пересечение линий подсчёта по траекториям треков ----
+        if ids is not None:
+            crossings = self.zones.update_tracks(track_ids, centers)
+            if crossings:
+                self._publish_line_crossings(crossings)
+
         annotated = annotator.result()
         annotated = self._draw_region_overlay(annotated)
 
-        # ---- Проверяем, есть ли активное транспортное средство в регионе ----
-        if not hasattr(self, "vehicle_active_in_region"):
-            self.vehicle_active_in_region = False
-
-        if any_vehicle_in_region and not self.vehicle_active_in_region:
-            # Сохраняем кадр один раз при первом появлении
-            ok, buf = cv2.imencode(".jpg", frame)
-            if ok:
-                self.redis_server.set("vehicle_in", buf.tobytes())
-                os.makedirs("detect_image", exist_ok=True)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-                filename = f"detect_image/vehicle_{timestamp}.jpg"
-                cv2.imwrite(filename, frame)
-            self.vehicle_active_in_region = True
-        elif not any_vehicle_in_region and self.vehicle_active_in_region:
-            # Автомобиль ушел — сбрасываем состояние
-            self.redis_server.delete("vehicle_in")
-            self.vehicle_active_in_region = False
+        # ---- Въезд/выход по каждому треку с антидребезгом ----
+        observations = {obj["id"]: set(obj["zones"]) for obj in tracked_objects if obj["id"] is not None}
+        events = self.track_states.update(observations, zone_names)
+        if events:
+            bboxes = {obj["id"]: obj["bbox"] for obj in tracked_objects if obj["id"] is not None}
+            self._handle_track_events(packet, events, bboxes)
 
         return annotated, tracked_objects
 
+    def _handle_track_events(self, frame: Frame, events: List[Dict], bboxes: Dict[int, List[int]]) -> None:
+        zone_events = []
+        for event in events:
+            if event["zone"] != self.trigger_zone:
+                zone_events.append({**event, "type": f"zone_{event['type']}"})
+                continue
+
+            if event["type"] == "enter":
+                frame.mark("track")
+                # Сохраняем crop один раз при въезде трека — в сервисы номеров
+                # уходит только транспорт, а не весь кадр
+                crop = self._crop_vehicle(frame, bboxes[event["track_id"]])
+                frame.mark("crop")
+                if crop:
+                    # снимок кадра — те же байты, что ушли в Redis, без перекодирования
+                    meta = {"camera_id": self.camera_id, "event_id": event["event_id"], "track_id": event["track_id"]}
+                    snapshot = self.snapshots.submit(frame.jpeg(), kind="frame", **meta)
+                    self.snapshots.submit(crop, kind="crop", **meta)
+                    frame.mark("snapshot")
+                    self._publish_vehicle_in(crop, event, snapshot, frame.trace)
+            else:
+                # ключи въезда чистим, когда в зоне не осталось ни одного трека
+                self._publish_vehicle_out(event, clear=not self.track_states.inside(self.trigger_zone))
+
+        if zone_events:
+            pipe = self.redis_server.pipeline()
+            for event in zone_events:
+                pipe.publish(VEHICLE_EVENTS_CHANNEL, encode_event({"camera_id": self.camera_id, **event}))
+            pipe.execute()
+
+    # ------------------------------------------------------------------
+    # события въезда в регион (Redis)
+    # ------------------------------------------------------------------
+    def _publish_vehicle_in(
+        self,
+        crop: bytes,
+        track_event: Dict,
+        snapshot: Optional[str] = None,
+        trace: Optional[Trace] = None,
+    ) -> None:
+        """
+        Кладёт crop и описание события въезда в Redis.
+
+        event_id уникален для каждого въезда трека — по нему API объединяет
+        одновременные проверки доступа и кэширует решение на время визита.
+        trace — стадии кадра с момента захвата; API продолжает его до
+        подъёма шлагбаума.
+        """
+        event = {
+            "camera_id": self.camera_id,
+            "event_id": track_event["event_id"],
+            "track_id": track_event["track_id"],
+            "ts": track_event["ts"],
+        }
+        if snapshot:
+            event["snapshot"] = snapshot
+        if trace is not None:
+            event["trace"] = trace.to_dict()
+        pipe = self.redis_server.pipeline()
+        pipe.set(vehicle_crop_key(self.camera_id, event["event_id"]), crop, ex=VEHICLE_CROP_TTL)
+        for camera_id in (None, self.camera_id):
+            pipe.set(vehicle_in_key(camera_id), crop)
+            pipe.set(vehicle_event_key(camera_id), encode_event(event))
+        # публикуем после записи crop'а — подписчик сразу может его прочитать
+        pipe.publish(VEHICLE_EVENTS_CHANNEL, encode_event({"type": "enter", **event}))
+        pipe.execute()
+
+    def _publish_vehicle_out(self, track_event: Dict, clear: bool) -> None:
+        pipe = self.redis_server.pipeline()
+        if clear:
+            keys = [vehicle_in_key(self.camera_id), vehicle_event_key(self.camera_id)]
+            # общие ключи чистим, только если последнее событие было от этой камеры
+            latest = decode_event(self.redis_server.get(vehicle_event_key()))
+            if latest is None or latest.get("camera_id") == self.camera_id:
+                keys += [vehicle_in_key(), vehicle_event_key()]
+            pipe.delete(*keys)
+        pipe.publish(VEHICLE_EVENTS_CHANNEL, encode_event({
+            "type": "exit",
+            "camera_id": self.camera_id,
+            "event_id": track_event["event_id"],
+            "track_id": track_event["track_id"],
+            "dwell": track_event["dwell"],
+            "ts": track_event["ts"],
+        }))
+        pipe.execute()
+
+    def _publish_line_crossings(self, crossings: List[Dict]) -> None:
+        now = time.time()
+        pipe = self.redis_server.pipeline()
+        for crossing in crossings:
+            pipe.publish(VEHICLE_EVENTS_CHANNEL, encode_event({
+                "type": "line_cross",
+                "camera_id": self.camera_id,
+                "ts": now,
+                **crossing,
+            }))
+        pipe.execute()
+
     # ------------------------------------------------------------------
     # region drawing
     # ------------------------------------------------------------------
     def _draw_region_overlay(self, img: np.ndarray) -> np.ndarray:
-        """Рисует полупрозрачный регион и контур. Возвращает изображение."""
-        if self.region is None:
-            return img
-
-        overlay = img.copy()
-        out = img.copy()
-
-        # fill region with alpha
-        pts = self.region.reshape((-1, 1, 2))
-        cv2.fillPoly(overlay, [pts], color=(0, 255, 0))  # fill (will be blended)
-        alpha = 0.15
-        cv2.addWeighted(overlay, alpha, out, 1 - alpha, 0, out)
-
-        # draw polygon border thicker
-        cv2.polylines(out, [pts], isClosed=True, color=(0, 255, 0), thickness=2)
-
-        # label region in top-left corner of bbox of region
-        x, y, w, h = cv2.boundingRect(pts)
-        text = "Region"
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        thickness = 1
-        (tw, th), _ = cv2.getTextSize(text, font, font_scale, thickness)
-        # text background
-        cv2.rectangle(out, (x, y - th - 8), (x + tw + 8, y), (0, 255, 0), -1)
-        cv2.putText(out, text, (x + 4, y - 6), font, font_scale, (0, 0, 0), thickness, cv2.LINE_AA)
-
-        return out
+        """Рисует зоны и линии подсчёта. Возвращает изображение."""
+        return self.zones.draw(img)
 
     # ------------------------------------------------------------------
     # Основной цикл
     # ------------------------------------------------------------------
     def run(self):
+        if self.warmup and not self.warmed_up:
+            self._warm_up()
+        self.thread_ident = threading.get_ident()
+        grabbed, grab_s = 0, 0.0
         while self.detection_status:
+            if self.profile is not None:
+                self.profile = self.profile.step()
 
-            if self.frame_counter % self.skip_frames != 0:
+            infer = self.frame_counter % self.skip_frames == 0
+            if not infer and not self.interpolate:
+                t_grab = time.perf_counter()
                 self.videocapture.grab()
+                grab_s += time.perf_counter() - t_grab
                 self.frame_counter += 1
+                grabbed += 1
                 continue
 
+            t0 = time.perf_counter()
             ret, frame = self.videocapture.read()
+            # момент захвата: от него считается трейс до решения о въезде
+            captured_at = time.monotonic()
+            if ret:
+                self.last_frame_at = captured_at
 
             if not ret:
+                self.metrics.frame("read_failed")
                 self.videocapture.set(cv2.CAP_PROP_POS_FRAMES, 0)
                 continue
+            t_read = time.perf_counter()
 
             if self.resize:
                 w, h = self.resize
@@ -216,29 +597,70 @@ class YoloClass:
 
             self.frame = frame
             self.frame_counter += 1
+            # кадр и его JPEG идут дальше одним объектом: Redis, снимок, crop
+            packet = Frame(frame, trace=Trace(self.frame_counter, captured_at))
+            packet.mark("resize")
+            t_resize = time.perf_counter()
 
             # RAW frame → Redis
-            ok_raw, encoded_raw = cv2.imencode(".jpg", frame)
-            if ok_raw:
-                self.redis_server.set(f"{self.camera_id}_stream_frame", encoded_raw.tobytes())
+            raw = packet.jpeg()
+            t_encode_raw = time.perf_counter()
+            if raw:
+                self.redis_server.set(f"{self.camera_id}_stream_frame", raw)
                 self.redis_server.set(f"{self.camera_id}_stream_flag", 1)
+            t_raw = time.perf_counter()
+            packet.mark("publish_raw")
 
-            # DETECT + TRACK
-            processed, tracked = self.detect_and_track(frame)
+            # DETECT + TRACK (между инференсами — экстраполяция боксов)
+            if infer:
+                processed, tracked = self.detect_and_track(packet)
+            else:
+                processed, tracked = self.interpolate_tracks(packet)
+            t_detect = time.perf_counter()
 
             # Save processed frame
-            ok_p, enc_p = cv2.imencode(".jpg", processed)
-            if ok_p:
-                self.redis_server.set(f"{self.camera_id}_processed_frame", enc_p.tobytes())
+            enc_p = encode_jpeg(processed)
+            t_encode_p = time.perf_counter()
+            if enc_p:
+                self.redis_server.set(f"{self.camera_id}_processed_frame", enc_p)
                 self.redis_server.set(f"{self.camera_id}_processed_flag", 1)
+            t_done = time.perf_counter()
+
+            # стадии не пересекаются; inference/cascade/annotate пишутся внутри detect
+            stages = {
+                "grab": grab_s * 1000,
+                "read": (t_read - t0) * 1000,
+                "resize": (t_resize - t_read) * 1000,
+                "encode_raw": (t_encode_raw - t_resize) * 1000,
+                "redis_raw": (t_raw - t_encode_raw) * 1000,
+                "detect": (t_detect - t_raw) * 1000,
+                "encode_processed": (t_encode_p - t_detect) * 1000,
+                "redis_processed": (t_done - t_encode_p) * 1000,
+            }
+            if not grabbed:
+                del stages["grab"]
+            self.metrics.observe_ms(stages)
+            if grabbed:
+                self.metrics.frame("skipped", grabbed)
+            self.metrics.frame("processed" if infer else "interpolated")
+
+            if self.controller is not None:
+                if self.controller.observe(stages, inferred=infer, source_frames=grabbed + 1):
+                    self._apply_controller()
+            grabbed, grab_s = 0, 0.0
 
             # Show window
-            cv2.imshow(f"Camera {self.camera_id}", processed)
-            if cv2.waitKey(1) & 0xFF == ord("q"):
-                break
-
+            if self.show:
+                cv2.imshow(f"Camera {self.camera_id}", processed)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+
+        if self.profile is not None:
+            self.profile = self.profile.step(final=True)
+        self.thread_ident = None
         self.videocapture.release()
-        cv2.destroyAllWindows()
+        if self.show:
+            cv2.destroyAllWindows()
 
     def stop(self):
         self.detection_status = False
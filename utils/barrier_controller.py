@@ -0,0 +1,242 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from utils.tracing import traces
+from utils.vehicle_events import VEHICLE_EVENTS_CHANNEL, decode_event
+
+BARRIER_STATUS_KEY = "barrier_status"
+DEFAULT_LANE = "default"
+
+
+def lane_status_key(lane_id: str) -> str:
+    return f"{lane_id}_{BARRIER_STATUS_KEY}"
+
+
+@dataclass
+class LaneState:
+    lane_id: str
+    status: str = "down"
+    event_id: Optional[str] = None
+    raised_at: Optional[float] = None
+    lower_at: Optional[float] = None
+    lower_handle: Optional[asyncio.TimerHandle] = field(default=None, repr=False)
+    decisions: int = 0
+    allowed: int = 0
+    # latency from the detector's entry timestamp to the decision, ms
+    last_latency_ms: Optional[float] = None
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+
+    def record_latency(self, latency_ms: float) -> None:
+        self.decisions += 1
+        self.last_latency_ms = latency_ms
+        if self.avg_latency_ms is None:
+            self.avg_latency_ms = latency_ms
+        else:
+            self.avg_latency_ms += (latency_ms - self.avg_latency_ms) / self.decisions
+        self.max_latency_ms = max(self.max_latency_ms or 0.0, latency_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "lane_id": self.lane_id,
+            "status": self.status,
+            "event_id": self.event_id,
+            "raised_at": self.raised_at,
+            "lowers_in": round(self.lower_at - now, 2) if self.lower_at else None,
+            "decisions": self.decisions,
+            "allowed": self.allowed,
+            "last_latency_ms": self.last_latency_ms,
+            "avg_latency_ms": self.avg_latency_ms,
+            "max_latency_ms": self.max_latency_ms,
+        }
+
+
+class BarrierController:
+    """
+    Push-based barrier control.
+
+    Subscribes to region enter/exit events published by the detectors, asks
+    ``decide(event)`` for an access decision as soon as a vehicle enters and
+    keeps raise/lower timers on the event loop, one lane per camera:
+
+      - an allowed vehicle raises the barrier for ``hold_seconds``;
+      - another allowed vehicle while it is up extends the timer;
+      - when the vehicle leaves the region the long timer is cancelled and the
+        barrier goes down after ``exit_clearance`` seconds;
+      - a vehicle that leaves while its decision is still pending (slow OCR)
+        does not raise the barrier when the decision arrives.
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        decide: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        redis_url: str = "redis://localhost:6379/0",
+        hold_seconds: float = 10.0,
+        exit_clearance: float = 2.0,
+    ):
+        self.redis = redis_client
+        self.redis_url = redis_url
+        self.decide = decide
+        self.hold_seconds = hold_seconds
+        self.exit_clearance = exit_clearance
+        self.lanes: Dict[str, LaneState] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set[asyncio.Task] = set()
+        # (lane_id, event_id) въездов с решением в работе -> машина уже уехала
+        self._deciding: Dict[Tuple[str, Optional[str]], bool] = {}
+        # записи статуса идут по очереди: поздняя не обгонит раннюю
+        self._status_lock = asyncio.Lock()
+
+    # ---------------------- lifecycle ----------------------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for lane in self.lanes.values():
+            if lane.lower_handle:
+                lane.lower_handle.cancel()
+
+    async def _listen(self) -> None:
+        while True:
+            client = aioredis.from_url(self.redis_url)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(VEHICLE_EVENTS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    event = decode_event(message.get("data"))
+                    if event:
+                        self.handle_event(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Barrier controller: redis subscription failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+    # ---------------------- events ----------------------
+    def lane(self, lane_id: Optional[str]) -> LaneState:
+        lane_id = lane_id or DEFAULT_LANE
+        if lane_id not in self.lanes:
+            self.lanes[lane_id] = LaneState(lane_id=lane_id)
+        return self.lanes[lane_id]
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        kind = event.get("type")
+        if kind == "enter":
+            # регистрируем до создания задачи: выезд может прийти раньше, чем она начнётся
+            self._deciding[self._event_key(event)] = False
+            task = asyncio.create_task(self._on_enter(event))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+        elif kind == "exit":
+            self._on_exit(event)
+
+    def _event_key(self, event: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        return event.get("camera_id") or DEFAULT_LANE, event.get("event_id")
+
+    async def _on_enter(self, event: Dict[str, Any]) -> None:
+        lane = self.lane(event.get("camera_id"))
+        key = self._event_key(event)
+        try:
+            decision = await self.decide(event)
+        except Exception as e:
+            print(f"Barrier controller: access decision failed for {event}: {e}")
+            return
+        finally:
+            exited = self._deciding.pop(key, False)
+
+        entered_at = event.get("ts")
+        if entered_at:
+            lane.record_latency((time.time() - entered_at) * 1000)
+
+        if decision.get("status") == "available":
+            lane.allowed += 1
+            if exited:
+                # машина уехала, пока решение считалось — шлагбаум не поднимаем
+                return
+            self.raise_barrier(lane.lane_id, event_id=event.get("event_id"))
+
+    def _on_exit(self, event: Dict[str, Any]) -> None:
+        key = self._event_key(event)
+        if key in self._deciding:
+            self._deciding[key] = True
+            return
+        lane = self.lane(event.get("camera_id"))
+        if lane.status != "up" or lane.event_id != event.get("event_id"):
+            return
+        # машина проехала — не держим шлагбаум весь hold_seconds
+        self._schedule_lower(lane, self.exit_clearance)
+
+    # ---------------------- barrier ----------------------
+    def raise_barrier(self, lane_id: Optional[str] = None, event_id: Optional[str] = None) -> LaneState:
+        lane = self.lane(lane_id)
+        if lane.status == "up" and event_id and lane.event_id == event_id:
+            # повторный запрос по тому же въезду не продлевает таймер
+            return lane
+        if lane.status != "up":
+            lane.raised_at = time.time()
+        lane.status = "up"
+        lane.event_id = event_id
+        self._write_status(lane)
+        # последняя стадия трейса въезда: шлагбаум поднят
+        traces.mark(lane_id, event_id, "barrier")
+        self._schedule_lower(lane, self.hold_seconds)
+        return lane
+
+    def lower_barrier(self, lane_id: Optional[str] = None) -> LaneState:
+        lane = self.lane(lane_id)
+        if lane.lower_handle:
+            lane.lower_handle.cancel()
+        lane.status = "down"
+        lane.event_id = None
+        lane.raised_at = None
+        lane.lower_handle = None
+        lane.lower_at = None
+        self._write_status(lane)
+        return lane
+
+    def _schedule_lower(self, lane: LaneState, delay: float) -> None:
+        if lane.lower_handle:
+            lane.lower_handle.cancel()
+        loop = asyncio.get_running_loop()
+        lane.lower_handle = loop.call_later(delay, self.lower_barrier, lane.lane_id)
+        lane.lower_at = time.time() + delay
+
+    def _write_status(self, lane: LaneState) -> None:
+        # общий ключ "up", пока поднят хотя бы один шлагбаум
+        overall = "up" if any(l.status == "up" for l in self.lanes.values()) else "down"
+        # запись в Redis — фоновая задача, event loop её не ждёт
+        task = asyncio.get_running_loop().create_task(self._store_status(lane.lane_id, lane.status, overall))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _store_status(self, lane_id: str, status: str, overall: str) -> None:
+        async with self._status_lock:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.set(lane_status_key(lane_id), status)
+                pipe.set(BARRIER_STATUS_KEY, overall)
+                await pipe.execute()
+            except Exception as e:
+                print(f"Barrier controller: failed to store status of lane {lane_id}: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {lane_id: lane.to_dict() for lane_id, lane in self.lanes.items()}
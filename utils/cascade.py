@@ -0,0 +1,115 @@
+from typing import Dict, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU matrix (len(a), len(b)) of xyxy boxes."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class CascadeRefiner:
+    """
+    Second stage of a two-model cascade.
+
+    The fast model tracks every inferred frame. The accurate model runs only
+    when a fast-model box is near the trigger region (within ``margin`` pixels
+    of its bounding rectangle) or has confidence below ``low_conf``. It runs on
+    a crop that covers just those boxes and the region, not on the full frame.
+    Its detections are matched to the tracked boxes by IoU. A matched track
+    takes the accurate box, class and confidence and keeps its track id.
+    Accurate detections with no matching track are dropped, because only the
+    tracker can assign ids.
+    """
+
+    def __init__(self, model, classes: Sequence[int], margin: int = 80, low_conf: float = 0.5, min_iou: float = 0.3, imgsz: Optional[int] = None):
+        self.model = model
+        self.classes = list(classes)
+        self.margin = margin
+        self.low_conf = low_conf
+        self.min_iou = min_iou
+        self.imgsz = imgsz
+        self.frames = 0
+        self.runs = 0
+        self.refined = 0
+
+    def _gate(self, boxes: np.ndarray, confs: np.ndarray, region: Optional[np.ndarray]) -> np.ndarray:
+        """Indices of boxes that need the accurate model."""
+        need = confs < self.low_conf
+        if region is not None:
+            rx, ry, rw, rh = cv2.boundingRect(region.reshape((-1, 1, 2)))
+            cx = (boxes[:, 0] + boxes[:, 2]) / 2
+            cy = (boxes[:, 1] + boxes[:, 3]) / 2
+            near = (
+                (cx >= rx - self.margin) & (cx <= rx + rw + self.margin)
+                & (cy >= ry - self.margin) & (cy <= ry + rh + self.margin)
+            )
+            need |= near
+        return np.flatnonzero(need)
+
+    def refine(
+        self,
+        frame: np.ndarray,
+        boxes: np.ndarray,
+        clss: np.ndarray,
+        confs: np.ndarray,
+        region: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self.frames += 1
+        gated = self._gate(boxes, confs, region)
+        if not len(gated):
+            return boxes, clss, confs
+
+        # crop под все отобранные боксы (с запасом)
+        h, w = frame.shape[:2]
+        sel = boxes[gated]
+        x1 = int(max(0, sel[:, 0].min() - self.margin))
+        y1 = int(max(0, sel[:, 1].min() - self.margin))
+        x2 = int(min(w, sel[:, 2].max() + self.margin))
+        y2 = int(min(h, sel[:, 3].max() + self.margin))
+        if x2 <= x1 or y2 <= y1:
+            return boxes, clss, confs
+
+        kwargs = {"classes": self.classes, "verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        results = self.model.predict(frame[y1:y2, x1:x2], **kwargs)
+        self.runs += 1
+
+        big = results[0].boxes
+        big_boxes = big.xyxy.cpu().numpy().reshape(-1, 4) + np.array([x1, y1, x1, y1], dtype=np.float64)
+        if not len(big_boxes):
+            return boxes, clss, confs
+        big_clss = big.cls.cpu().numpy()
+        big_confs = big.conf.cpu().numpy()
+
+        iou = box_iou(boxes[gated], big_boxes)
+        best = iou.argmax(axis=1)
+        matched = iou[np.arange(len(gated)), best] >= self.min_iou
+
+        boxes, clss, confs = boxes.copy(), clss.copy(), confs.copy()
+        dst, src = gated[matched], best[matched]
+        boxes[dst] = big_boxes[src]
+        clss[dst] = big_clss[src]
+        confs[dst] = big_confs[src]
+        self.refined += int(matched.sum())
+        return boxes, clss, confs
+
+    def stats(self) -> Dict:
+        return {
+            "frames": self.frames,
+            "runs": self.runs,
+            "run_ratio": round(self.runs / self.frames, 3) if self.frames else 0.0,
+            "refined_boxes": self.refined,
+        }
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+
+@dataclass
+class CropEntry:
+    data: bytes
+    score: float
+    created_at: float
+    last_seen: float
+
+
+class CropStore:
+    """
+    Best JPEG crop per track id with a total-bytes budget.
+
+    Entries are kept in LRU order of the last time the track was seen.
+    Tracks that disappear for longer than ``max_age`` seconds are dropped.
+    When the budget is exceeded, the least recently seen tracks go first.
+    A new crop replaces the stored one only if its score is at least
+    ``min_gain`` better, so a track is not re-encoded on every frame.
+
+    Reads use the same API as a dict (``get``, ``in``, ``len``), so endpoints
+    that expect ``vehicle_id -> jpeg bytes`` keep working.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_age: float = 30.0, min_gain: float = 0.2):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.min_gain = min_gain
+        self.total_bytes = 0
+        self.evicted = 0
+        self._items: "OrderedDict[int, CropEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def wants(self, track_id: int, score: float) -> bool:
+        """True if a crop with this score would replace the stored one."""
+        entry = self._items.get(track_id)
+        return entry is None or score > entry.score * (1 + self.min_gain)
+
+    def put(self, track_id: int, data: bytes, score: float) -> None:
+        if len(data) > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            old = self._items.pop(track_id, None)
+            if old is not None:
+                self.total_bytes -= len(old.data)
+            self._items[track_id] = CropEntry(
+                data=data,
+                score=score,
+                created_at=old.created_at if old else now,
+                last_seen=now,
+            )
+            self.total_bytes += len(data)
+            self._evict_over_budget()
+
+    def touch(self, track_ids: Iterable[int]) -> None:
+        """Marks tracks as seen on the current frame."""
+        now = time.monotonic()
+        with self._lock:
+            for track_id in track_ids:
+                entry = self._items.get(track_id)
+                if entry is not None:
+                    entry.last_seen = now
+                    self._items.move_to_end(track_id)
+
+    def expire(self) -> int:
+        """Drops tracks not seen for ``max_age`` seconds. Returns how many were removed."""
+        deadline = time.monotonic() - self.max_age
+        removed = 0
+        with self._lock:
+            # LRU order: the oldest entries are at the front
+            while self._items:
+                track_id, entry = next(iter(self._items.items()))
+                if entry.last_seen > deadline:
+                    break
+                self._items.popitem(last=False)
+                self.total_bytes -= len(entry.data)
+                removed += 1
+        return removed
+
+    def _evict_over_budget(self) -> None:
+        while self.total_bytes > self.max_bytes and self._items:
+            _, entry = self._items.popitem(last=False)
+            self.total_bytes -= len(entry.data)
+            self.evicted += 1
+
+    def get(self, track_id: int, default: Optional[bytes] = None) -> Optional[bytes]:
+        entry = self._items.get(track_id)
+        return entry.data if entry is not None else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tracks": len(self._items),
+            "total_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
+
+    def __contains__(self, track_id: int) -> bool:
+        return track_id in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
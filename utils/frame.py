@@ -0,0 +1,94 @@
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from utils.tracing import Trace
+
+# качество cv2.imencode по умолчанию
+DEFAULT_JPEG_QUALITY = 95
+
+
+class Frame:
+    """
+    A video frame together with its encoded forms.
+
+    Holds the decoded image (ndarray) and JPEG bytes per quality. Each form is
+    produced on first use and then reused, so the same frame handed to Redis,
+    the snapshot writer and the OCR upload is encoded once per quality. A
+    frame built from JPEG bytes is decoded only if the image is needed. Crops
+    are cached the same way, keyed by rectangle, size limit and quality.
+
+    ``trace`` is the latency trace started at capture (utils.tracing.Trace);
+    pipeline stages mark it as the frame passes through them.
+    """
+
+    __slots__ = ("_image", "_jpeg", "_crops", "trace")
+
+    def __init__(
+        self,
+        image: Optional[np.ndarray] = None,
+        jpeg: Optional[bytes] = None,
+        quality: int = DEFAULT_JPEG_QUALITY,
+        trace: Optional[Trace] = None,
+    ):
+        if image is None and jpeg is None:
+            raise ValueError("Frame needs an image or encoded bytes")
+        self._image = image
+        self._jpeg: Dict[int, Optional[bytes]] = {quality: jpeg} if jpeg is not None else {}
+        self._crops: Dict[Tuple, Optional[bytes]] = {}
+        self.trace = trace
+
+    @property
+    def image(self) -> np.ndarray:
+        if self._image is None:
+            # кадр пришёл закодированным — декодируем один раз, по требованию
+            data = next(iter(self._jpeg.values()))
+            self._image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._image
+
+    def mark(self, stage: str) -> None:
+        if self.trace is not None:
+            self.trace.mark(stage)
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.image.shape
+
+    def jpeg(self, quality: int = DEFAULT_JPEG_QUALITY) -> Optional[bytes]:
+        if quality not in self._jpeg:
+            self._jpeg[quality] = encode_jpeg(self.image, quality)
+        return self._jpeg[quality]
+
+    def crop_jpeg(
+        self,
+        x1: int,
+        y1: int,
+        x2: int,
+        y2: int,
+        max_side: Optional[int] = None,
+        quality: int = DEFAULT_JPEG_QUALITY,
+    ) -> Optional[bytes]:
+        """JPEG вырезки [y1:y2, x1:x2], уменьшенной до max_side по большей стороне."""
+        key = (x1, y1, x2, y2, max_side, quality)
+        if key not in self._crops:
+            crop = self.image[y1:y2, x1:x2]
+            longest = max(crop.shape[:2])
+            if max_side and longest > max_side:
+                scale = max_side / longest
+                crop = cv2.resize(
+                    crop,
+                    (max(1, int(crop.shape[1] * scale)), max(1, int(crop.shape[0] * scale))),
+                    interpolation=cv2.INTER_AREA,
+                )
+            self._crops[key] = encode_jpeg(crop, quality)
+        return self._crops[key]
+
+
+def encode_jpeg(image: np.ndarray, quality: int = DEFAULT_JPEG_QUALITY) -> Optional[bytes]:
+    ok, buf = cv2.imencode(".jpg", image, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return buf.tobytes() if ok else None
+
+
+def as_frame(frame: Union[Frame, np.ndarray]) -> Frame:
+    return frame if isinstance(frame, Frame) else Frame(frame)
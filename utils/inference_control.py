@@ -0,0 +1,157 @@
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_IMGSZ_LEVELS = (640, 512, 416, 320)
+
+
+def imgsz_levels_from(imgsz: Optional[int]) -> List[int]:
+    """Input sizes the controller may use: the requested one and the smaller defaults."""
+    if not imgsz:
+        return list(DEFAULT_IMGSZ_LEVELS)
+    return [imgsz] + [lvl for lvl in DEFAULT_IMGSZ_LEVELS if lvl < imgsz]
+
+
+class InferenceController:
+    """
+    Keeps capture-to-result latency of one camera under ``budget_ms``.
+
+    The detector reports stage timings of every processed frame. The controller
+    turns three knobs from them:
+
+      - ``imgsz`` and then ``model_tier`` go down when p95 latency of inferred
+        frames is over budget (each inference takes too long);
+      - ``skip_frames`` goes up when the loop spends more time per source frame
+        than the source produces them (the capture buffer grows and lag piles
+        up), and when latency is over budget with the cheapest input size and model;
+      - with enough headroom the knobs are restored in reverse order: sampling
+        rate first, then model tier, then input size.
+
+    One change is made per ``cooldown`` seconds and the window is reset after
+    it, so every decision is based on timings measured with the current knobs.
+    """
+
+    def __init__(
+        self,
+        budget_ms: float = 200.0,
+        source_fps: float = 25.0,
+        skip_frames: int = 1,
+        max_skip: int = 10,
+        imgsz_levels: Sequence[int] = DEFAULT_IMGSZ_LEVELS,
+        model_tiers: Sequence[str] = (),
+        window: int = 30,
+        headroom: float = 0.6,
+        cooldown: float = 2.0,
+    ):
+        self.budget_ms = budget_ms
+        self.frame_interval_ms = 1000.0 / source_fps if source_fps and source_fps > 0 else 40.0
+        self.min_skip = max(1, skip_frames)
+        self.max_skip = max(self.min_skip, max_skip)
+        self.imgsz_levels: List[int] = sorted(set(imgsz_levels), reverse=True) or [640]
+        # 0 — самая точная модель, дальше — всё быстрее
+        self.model_tiers: List[str] = list(model_tiers)
+        self.headroom = headroom
+        self.cooldown = cooldown
+
+        self.skip_frames = self.min_skip
+        self.imgsz_index = 0
+        self.model_tier = 0
+
+        self._latency: Deque[float] = deque(maxlen=window)
+        # время цикла, потраченное на каждый кадр источника (включая пропущенные)
+        self._loop_ms: Deque[float] = deque(maxlen=window)
+        self._stage_avg: Dict[str, float] = {}
+        self._last_change = time.monotonic()
+        self._lock = threading.Lock()
+        self.changes = 0
+        self.reason = "initial"
+
+    # ---------------------- knobs ----------------------
+    @property
+    def imgsz(self) -> int:
+        return self.imgsz_levels[self.imgsz_index]
+
+    @property
+    def model_path(self) -> Optional[str]:
+        return self.model_tiers[self.model_tier] if self.model_tiers else None
+
+    # ---------------------- measurements ----------------------
+    def observe(self, stages: Dict[str, float], inferred: bool, source_frames: int = 1) -> bool:
+        """
+        stages: stage name -> milliseconds for one processed frame. The "grab"
+        stage (frames skipped before it) counts towards loop time only, not
+        towards the frame's latency.
+        source_frames: source frames consumed by this iteration (1 + grabbed).
+        Returns True if any knob changed.
+        """
+        total = sum(stages.values())
+        latency = total - stages.get("grab", 0.0)
+        with self._lock:
+            for name, ms in stages.items():
+                prev = self._stage_avg.get(name)
+                self._stage_avg[name] = ms if prev is None else prev + 0.1 * (ms - prev)
+            if inferred:
+                self._latency.append(latency)
+            self._loop_ms.append(total / max(1, source_frames))
+
+            if len(self._latency) < self._latency.maxlen // 2:
+                return False
+            if time.monotonic() - self._last_change < self.cooldown:
+                return False
+            return self._adjust()
+
+    def _adjust(self) -> bool:
+        p95 = float(np.percentile(self._latency, 95))
+        loop_ms = float(np.mean(self._loop_ms))
+        over_budget = p95 > self.budget_ms
+        falling_behind = loop_ms > self.frame_interval_ms
+
+        if over_budget and self.imgsz_index < len(self.imgsz_levels) - 1:
+            self.imgsz_index += 1
+            return self._changed(f"p95 {p95:.0f}ms > budget: imgsz -> {self.imgsz}")
+        if over_budget and self.model_tier < len(self.model_tiers) - 1:
+            self.model_tier += 1
+            return self._changed(f"p95 {p95:.0f}ms > budget: model -> {self.model_path}")
+        if (over_budget or falling_behind) and self.skip_frames < self.max_skip:
+            self.skip_frames += 1
+            return self._changed(f"{loop_ms:.0f}ms per source frame, p95 {p95:.0f}ms: skip_frames -> {self.skip_frames}")
+
+        # запас по времени — возвращаем качество в обратном порядке
+        relaxed = p95 < self.budget_ms * self.headroom
+        spare = loop_ms < self.frame_interval_ms * self.headroom
+        if relaxed and spare and self.skip_frames > self.min_skip:
+            self.skip_frames -= 1
+            return self._changed(f"headroom: skip_frames -> {self.skip_frames}")
+        if relaxed and spare and self.model_tier > 0:
+            self.model_tier -= 1
+            return self._changed(f"headroom: model -> {self.model_path}")
+        if relaxed and spare and self.imgsz_index > 0:
+            self.imgsz_index -= 1
+            return self._changed(f"headroom: imgsz -> {self.imgsz}")
+        return False
+
+    def _changed(self, reason: str) -> bool:
+        self.reason = reason
+        self.changes += 1
+        self._last_change = time.monotonic()
+        self._latency.clear()
+        self._loop_ms.clear()
+        return True
+
+    # ---------------------- status ----------------------
+    def status(self) -> Dict:
+        with self._lock:
+            latency = list(self._latency)
+            return {
+                "budget_ms": self.budget_ms,
+                "skip_frames": self.skip_frames,
+                "imgsz": self.imgsz,
+                "model": self.model_path,
+                "reason": self.reason,
+                "changes": self.changes,
+                "p95_latency_ms": round(float(np.percentile(latency, 95)), 1) if latency else None,
+                "stage_avg_ms": {k: round(v, 2) for k, v in self._stage_avg.items()},
+            }
@@ -0,0 +1,100 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# от 1 мс до 5 с: кадровые стадии — единицы-десятки мс, OCR — сотни мс
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGE_SECONDS = Histogram(
+    "detector_stage_seconds",
+    "Time spent per frame in each pipeline stage",
+    ["camera", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+FRAMES_TOTAL = Counter(
+    "detector_frames_total",
+    "Frames by outcome: processed, interpolated, skipped (grabbed without decode), read_failed, encode_failed",
+    ["camera", "outcome"],
+)
+ERRORS_TOTAL = Counter(
+    "errors_total",
+    "Errors by component and exception type",
+    ["component", "error"],
+)
+CALL_SECONDS = Histogram(
+    "external_call_seconds",
+    "Latency of calls outside the process (OCR service, database)",
+    ["target"],
+    buckets=LATENCY_BUCKETS,
+)
+STREAM_CLIENTS = Gauge(
+    "stream_clients",
+    "Connected video stream clients",
+    ["endpoint"],
+)
+QUEUE_DEPTH = Gauge(
+    "queue_depth",
+    "Items waiting in background queues",
+    ["queue"],
+)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class StageRecorder:
+    """
+    Per-camera handle for the hot loop.
+
+    ``labels()`` resolves a child metric through a dict lookup and a lock on
+    every call. Here the children are resolved once per stage and outcome and
+    kept, so recording costs one ``observe`` or ``inc`` per frame.
+    """
+
+    def __init__(self, camera: str):
+        self.camera = str(camera)
+        self._stages: Dict[str, object] = {}
+        self._frames: Dict[str, object] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        child = self._stages.get(stage)
+        if child is None:
+            child = self._stages[stage] = STAGE_SECONDS.labels(self.camera, stage)
+        child.observe(seconds)
+
+    def observe_ms(self, stages: Dict[str, float]) -> None:
+        for stage, ms in stages.items():
+            self.observe(stage, ms / 1000)
+
+    def frame(self, outcome: str, count: int = 1) -> None:
+        child = self._frames.get(outcome)
+        if child is None:
+            child = self._frames[outcome] = FRAMES_TOTAL.labels(self.camera, outcome)
+        child.inc(count)
+
+
+def record_error(component: str, error: BaseException) -> None:
+    ERRORS_TOTAL.labels(component, type(error).__name__).inc()
+
+
+@contextmanager
+def timed_call(target: str) -> Iterator[None]:
+    """Замер внешнего вызова; ошибка тоже учитывается (и в времени, и в errors_total)."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(target, e)
+        raise
+    finally:
+        CALL_SECONDS.labels(target).observe(time.perf_counter() - started)
+
+
+def watch_queue(name: str, depth: Callable[[], float]) -> None:
+    """Глубина очереди читается при каждом опросе /metrics, а не в горячем цикле."""
+    QUEUE_DEPTH.labels(name).set_function(depth)
+
+
+def render_metrics() -> bytes:
+    return generate_latest()
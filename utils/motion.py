@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _Track:
+    state: np.ndarray      # cx, cy, w, h
+    velocity: np.ndarray   # vx, vy per frame
+    cls: int
+    conf: float
+    frame: int
+
+
+class BoxPredictor:
+    """
+    Constant-velocity box prediction between inference frames.
+
+    Each track keeps an alpha-beta filter (the steady-state form of a
+    constant-velocity Kalman filter) over the box center, plus smoothed width
+    and height. ``update`` is called with the detections of an inferred
+    frame. ``predict`` extrapolates every live track to any later frame index,
+    so frames that skip YOLO can still be annotated and region-tested.
+    """
+
+    def __init__(self, alpha: float = 0.85, beta: float = 0.3, max_gap: int = 30):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_gap = max_gap
+        self.tracks: Dict[int, _Track] = {}
+
+    @staticmethod
+    def _to_state(box: np.ndarray) -> np.ndarray:
+        x1, y1, x2, y2 = box
+        return np.array([(x1 + x2) / 2, (y1 + y2) / 2, x2 - x1, y2 - y1], dtype=np.float64)
+
+    def update(self, frame: int, ids: Optional[np.ndarray], boxes: np.ndarray, clss: np.ndarray, confs: np.ndarray) -> None:
+        """Detections of an inferred frame. Tracks missing from it are dropped."""
+        if ids is None:
+            self.tracks.clear()
+            return
+
+        tracks: Dict[int, _Track] = {}
+        for track_id, box, cls, conf in zip(ids, boxes, clss, confs):
+            track_id = int(track_id)
+            measured = self._to_state(box)
+            old = self.tracks.get(track_id)
+            if old is None or frame <= old.frame:
+                tracks[track_id] = _Track(measured, np.zeros(2), int(cls), float(conf), frame)
+                continue
+
+            dt = frame - old.frame
+            predicted = old.state.copy()
+            predicted[:2] += old.velocity * dt
+            residual = measured - predicted
+            state = predicted + self.alpha * residual
+            velocity = old.velocity + self.beta * residual[:2] / dt
+            tracks[track_id] = _Track(state, velocity, int(cls), float(conf), frame)
+        self.tracks = tracks
+
+    def predict(self, frame: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Returns ids, boxes (xyxy), classes and confidences extrapolated to ``frame``."""
+        ids, boxes, clss, confs = [], [], [], []
+        for track_id, track in self.tracks.items():
+            dt = frame - track.frame
+            if dt > self.max_gap:
+                continue
+            cx, cy = track.state[:2] + track.velocity * dt
+            w, h = track.state[2:]
+            ids.append(track_id)
+            boxes.append([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2])
+            clss.append(track.cls)
+            confs.append(track.conf)
+        return (
+            np.array(ids, dtype=np.int64),
+            np.array(boxes, dtype=np.float64).reshape(-1, 4),
+            np.array(clss, dtype=np.int64),
+            np.array(confs, dtype=np.float64),
+        )
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU matrix between xyxy boxes ``a`` (N, 4) and ``b`` (M, 4)."""
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class TrackHandover:
+    """
+    Keeps track ids across a tracker reset (a model switch).
+
+    ``start`` takes the tracks of the last inferred frame before the reset.
+    For the next ``max_frames`` frames, ``map`` gives every new track the id
+    of the old track it overlaps most (IoU >= ``min_iou``), greedily and one
+    to one. A vehicle already in a zone then keeps its state and does not
+    produce a second entry. Once matched, a new id keeps its old id for as
+    long as the track lives.
+    """
+
+    def __init__(self, min_iou: float = 0.3, max_frames: int = 30):
+        self.min_iou = min_iou
+        self.max_frames = max_frames
+        self.remap: Dict[int, int] = {}
+        self._pending: Dict[int, np.ndarray] = {}
+        self._started = 0
+
+    def start(self, frame: int, ids: Optional[np.ndarray], boxes: np.ndarray) -> None:
+        self.remap = {}
+        self._pending = {} if ids is None else {int(i): np.asarray(box, dtype=np.float64) for i, box in zip(ids, boxes)}
+        self._started = frame
+
+    def map(self, frame: int, ids: Optional[np.ndarray], boxes: np.ndarray) -> Optional[np.ndarray]:
+        if ids is None or not (self.remap or self._pending):
+            return ids
+        if self._pending and frame - self._started > self.max_frames:
+            self._pending = {}
+
+        out = np.array([self.remap.get(int(i), int(i)) for i in ids], dtype=np.int64)
+        new = [k for k, i in enumerate(ids) if int(i) not in self.remap]
+        if self._pending and new:
+            old_ids = list(self._pending)
+            iou = box_iou(np.asarray(boxes)[new], np.stack([self._pending[i] for i in old_ids]))
+            while iou.size:
+                row, col = np.unravel_index(np.argmax(iou), iou.shape)
+                if iou[row, col] < self.min_iou:
+                    break
+                k, old_id = new[row], old_ids[col]
+                self.remap[int(ids[k])] = old_id
+                out[k] = old_id
+                del self._pending[old_id]
+                iou[row, :] = -1
+                iou[:, col] = -1
+        return out
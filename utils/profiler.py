@@ -0,0 +1,352 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+PROFILES_ROOT = Path("profiles")
+TOP_LIMIT = 30
+# cProfile-сессия, которую поток детекции не подхватил за это время, завершается
+CPROFILE_START_TIMEOUT = 10.0
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+@dataclass
+class ProfileSession:
+    kind: str  # sampling | cprofile | tracemalloc
+    camera_id: Optional[str] = None
+    seconds: Optional[float] = None
+    id: str = field(default_factory=lambda: uuid4().hex[:12])
+    status: str = "running"  # pending | running | done | failed
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    path: Optional[str] = None
+    summary: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    stop_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "camera_id": self.camera_id,
+            "seconds": self.seconds,
+            "status": self.status,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "file": Path(self.path).name if self.path else None,
+            "error": self.error,
+            "summary": self.summary,
+        }
+
+
+class ThreadProfile:
+    """
+    cProfile for one loop thread.
+
+    cProfile only records the thread that enabled it, so the profiled loop
+    enables and disables it itself. The loop calls ``step()`` once per
+    iteration and keeps the returned object; ``None`` means the session
+    is over. With no session the loop only checks one attribute.
+    """
+
+    def __init__(self, profiler: "Profiler", session: ProfileSession):
+        self.profiler = profiler
+        self.session = session
+        self.profile = cProfile.Profile()
+        self.deadline: Optional[float] = None
+
+    def step(self, final: bool = False) -> Optional["ThreadProfile"]:
+        session = self.session
+        if self.deadline is None:
+            if not self.profiler._claim(session):
+                return None  # сессию уже закрыли (stop или таймаут старта)
+            if final or session.stop_event.is_set():
+                self.profiler._finish_cprofile(self, enabled=False)
+                return None
+            try:
+                self.profile.enable()
+            except ValueError as e:  # другой профилировщик уже активен (3.12+)
+                session.error = str(e)
+                self.profiler._finish_cprofile(self, enabled=False)
+                return None
+            self.deadline = time.monotonic() + session.seconds
+            return self
+        if final or session.stop_event.is_set() or time.monotonic() >= self.deadline:
+            self.profile.disable()
+            self.profiler._finish_cprofile(self, enabled=True)
+            return None
+        return self
+
+
+class Profiler:
+    """
+    On-demand profiling of live detection threads and of process memory.
+
+    - ``sampling``: a helper thread reads the target thread's stack every
+      ``interval`` seconds (sys._current_frames); the target is not touched.
+      Results are collapsed stacks (flamegraph.pl / speedscope format).
+    - ``cprofile``: deterministic profile of the target loop, saved as .pstats.
+    - tracemalloc: snapshots to .snapshot files and diffs between two of them.
+
+    Nothing runs between sessions. Files go to ``root``; only the last
+    ``max_sessions`` sessions and their files are kept.
+    """
+
+    def __init__(self, root: Path = PROFILES_ROOT, max_sessions: int = 50):
+        self.root = Path(root)
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._active: Dict[str, ProfileSession] = {}  # camera_id -> session
+        self._cprofile: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+
+    # ---------------------- sessions ----------------------
+    def _add(self, session: ProfileSession) -> ProfileSession:
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                oldest = next((s for s in self._sessions.values() if s.status in ("done", "failed")), None)
+                if oldest is None:
+                    break
+                del self._sessions[oldest.id]
+                if oldest.path:
+                    Path(oldest.path).unlink(missing_ok=True)
+        return session
+
+    def _file(self, session: ProfileSession, ext: str) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{session.kind}_{session.camera_id or 'process'}_{session.id}{ext}"
+        return self.root / name
+
+    def _done(self, session: ProfileSession, error: Optional[str] = None) -> None:
+        with self._lock:
+            if session.finished_at is not None:
+                return
+            session.error = error or session.error
+            session.status = "failed" if session.error else "done"
+            session.finished_at = time.time()
+            if self._active.get(session.camera_id) is session:
+                del self._active[session.camera_id]
+            if self._cprofile is session:
+                self._cprofile = None
+
+    def get(self, session_id: str) -> Optional[ProfileSession]:
+        return self._sessions.get(session_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in reversed(self._sessions.values())]
+
+    def stop(self, session_id: str) -> Optional[ProfileSession]:
+        """Досрочная остановка; результат сохраняется как обычно."""
+        session = self.get(session_id)
+        if session is not None:
+            session.stop_event.set()
+            # поток детекции так и не подхватил сессию (завис или завершился) —
+            # закрываем сами, иначе камера останется занятой
+            self._abandon_pending(session, "stopped before profiling started")
+        return session
+
+    def _claim(self, session: ProfileSession) -> bool:
+        """pending -> running; False if the session was closed before the loop got to it."""
+        with self._lock:
+            if session.status != "pending":
+                return False
+            session.status = "running"
+            return True
+
+    def _abandon_pending(self, session: ProfileSession, error: str) -> None:
+        with self._lock:
+            if session.status != "pending":
+                return
+            session.status = "failed"
+        self._done(session, error)
+
+    # ---------------------- detection threads ----------------------
+    def profile_thread(self, camera_id: str, target: Any, mode: str, seconds: float, interval: float = 0.005) -> ProfileSession:
+        """
+        Profiles the loop thread of ``target`` (YoloClass) for ``seconds``.
+
+        ``target.thread_ident`` identifies the thread for sampling;
+        ``target.profile`` receives the ThreadProfile for cProfile.
+        """
+        with self._lock:
+            if camera_id in self._active:
+                raise ProfilerBusy(f"camera {camera_id} is already being profiled")
+            if mode == "cprofile" and self._cprofile is not None:
+                raise ProfilerBusy("another cProfile session is running")
+            ident = getattr(target, "thread_ident", None)
+            if ident is None:
+                raise ProfilerBusy(f"camera {camera_id} has no running detection thread")
+            session = ProfileSession(kind=mode, camera_id=camera_id, seconds=seconds)
+            self._active[camera_id] = session
+            if mode == "cprofile":
+                self._cprofile = session
+        self._add(session)
+
+        if mode == "cprofile":
+            # включит сам поток детекции на следующей итерации
+            session.status = "pending"
+            target.profile = ThreadProfile(self, session)
+            timer = threading.Timer(
+                CPROFILE_START_TIMEOUT,
+                self._abandon_pending,
+                args=(session, f"detection thread did not start profiling within {CPROFILE_START_TIMEOUT:g}s"),
+            )
+            timer.daemon = True
+            timer.start()
+        else:
+            threading.Thread(
+                target=self._sample,
+                args=(session, ident, seconds, interval),
+                name=f"profiler-{camera_id}",
+                daemon=True,
+            ).start()
+        return session
+
+    def _finish_cprofile(self, handle: ThreadProfile, enabled: bool) -> None:
+        session = handle.session
+        if not enabled:
+            self._done(session, session.error or "detection thread stopped before profiling started")
+            return
+        try:
+            path = self._file(session, ".pstats")
+            handle.profile.dump_stats(str(path))
+            session.path = str(path)
+            session.summary = _pstats_summary(pstats.Stats(handle.profile))
+        except Exception as e:
+            self._done(session, str(e))
+            return
+        self._done(session)
+
+    def _sample(self, session: ProfileSession, ident: int, seconds: float, interval: float) -> None:
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline and not session.stop_event.wait(interval):
+                frame = sys._current_frames().get(ident)
+                if frame is None:
+                    break  # поток завершился
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[";".join(reversed(stack))] += 1
+                samples += 1
+            path = self._file(session, ".collapsed")
+            path.write_text("".join(f"{stack} {count}\n" for stack, count in stacks.most_common()))
+            session.path = str(path)
+            session.summary = _sampling_summary(stacks, samples, interval)
+        except Exception as e:
+            self._done(session, str(e))
+            return
+        self._done(session)
+
+    # ---------------------- tracemalloc ----------------------
+    def tracemalloc_status(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_kb": round(current / 1024, 1),
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def tracemalloc_start(self, frames: int = 1) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        return self.tracemalloc_status()
+
+    def tracemalloc_stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        return self.tracemalloc_status()
+
+    def tracemalloc_snapshot(self, limit: int = TOP_LIMIT) -> ProfileSession:
+        if not tracemalloc.is_tracing():
+            raise ProfilerBusy("tracemalloc is not started")
+        snapshot = _filter_snapshot(tracemalloc.take_snapshot())
+        session = ProfileSession(kind="tracemalloc")
+        path = self._file(session, ".snapshot")
+        snapshot.dump(str(path))
+        session.path = str(path)
+        session.summary = {
+            **self.tracemalloc_status(),
+            "top": [_stat_dict(stat) for stat in snapshot.statistics("lineno")[:limit]],
+        }
+        self._add(session)
+        self._done(session)
+        return session
+
+    def tracemalloc_diff(self, base_id: str, current_id: str, limit: int = TOP_LIMIT) -> Dict[str, Any]:
+        snapshots = []
+        for session_id in (base_id, current_id):
+            session = self.get(session_id)
+            if session is None or session.kind != "tracemalloc" or not session.path:
+                raise KeyError(session_id)
+            snapshots.append(tracemalloc.Snapshot.load(session.path))
+        stats = snapshots[1].compare_to(snapshots[0], "lineno")
+        return {
+            "base": base_id,
+            "current": current_id,
+            "size_diff_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            "top": [
+                {**_stat_dict(stat), "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+                for stat in stats[:limit]
+            ],
+        }
+
+
+def _filter_snapshot(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def _stat_dict(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {"location": f"{frame.filename}:{frame.lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+
+
+def _pstats_summary(stats: pstats.Stats, limit: int = TOP_LIMIT) -> Dict[str, Any]:
+    rows = []
+    for (filename, line, name), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({
+            "function": f"{name} ({os.path.basename(filename)}:{line})",
+            "calls": nc,
+            "self_ms": round(tt * 1000, 3),
+            "cumulative_ms": round(ct * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return {"total_calls": stats.total_calls, "total_ms": round(stats.total_tt * 1000, 3), "top": rows[:limit]}
+
+
+def _sampling_summary(stacks: Counter, samples: int, interval: float, limit: int = TOP_LIMIT) -> Dict[str, Any]:
+    own: Counter = Counter()
+    inclusive: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for name in set(frames):
+            inclusive[name] += count
+
+    def top(counter: Counter) -> List[Dict[str, Any]]:
+        return [
+            {"function": name, "samples": count, "percent": round(100 * count / samples, 1)}
+            for name, count in counter.most_common(limit)
+        ]
+
+    return {"samples": samples, "interval_ms": interval * 1000, "self": top(own), "inclusive": top(inclusive)}
@@ -0,0 +1,55 @@
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+from uuid import uuid4
+
+
+class ResultsTail:
+    """
+    Bounded cache of the most recent results, newest last.
+
+    Results are persisted by a write-behind queue. The tail serves the first
+    page without a DB query, and it also covers items that are not flushed
+    yet, which ``merge`` adds to a DB page. Cost is bounded by ``max_items``,
+    not by history length.
+    """
+
+    def __init__(self, max_items: int = 500):
+        self._items: Deque[Dict[str, Any]] = deque(maxlen=max_items)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_result(source: str = "-", title: str = "", description: str = "", link: str = "") -> Dict[str, Any]:
+        return {
+            "id": uuid4().hex,
+            "created_at": datetime.now(),
+            "source": source or "-",
+            "title": title or "",
+            "description": description or "",
+            "link": link or "",
+        }
+
+    def add(self, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._items.append(result)
+
+    def recent(self, limit: int, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Up to ``limit`` newest cached results (optionally from one source)."""
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for item in reversed(self._items):
+                if source and item["source"] != source:
+                    continue
+                out.append(item)
+                if len(out) >= limit:
+                    break
+        return out
+
+    def merge(self, rows: List[Dict[str, Any]], limit: int, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        """First page from the DB plus cached results it does not have yet."""
+        seen = {row["id"] for row in rows}
+        extra = [item for item in self.recent(limit, source) if item["id"] not in seen]
+        merged = rows + extra
+        merged.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        return merged[:limit]
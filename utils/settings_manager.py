@@ -1,8 +1,11 @@
 import json
+import os
+import tempfile
+import threading
 from copy import deepcopy
 from pathlib import Path
-from threading import Lock
-from typing import Any, Dict
+from threading import RLock
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 DEFAULT_SETTINGS: Dict[str, Any] = {
     "sourceType": None,
@@ -20,7 +23,20 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
 SETTINGS_DIR = Path("config")
 SETTINGS_FILE = SETTINGS_DIR / "detection_settings.json"
 
-_settings_lock = Lock()
+# RLock: update/reset вызывают save под тем же замком
+_settings_lock = RLock()
+
+# Настройки читаются из памяти; файл перечитывается только когда меняется
+# его mtime/размер (фоновый watcher) или при записи через этот модуль.
+SettingsListener = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+_cache: Optional[Dict[str, Any]] = None
+_cache_stamp: Optional[Tuple[int, int]] = None
+# штамп файла, который не удалось разобрать: ошибка пишется в лог один раз
+_invalid_stamp: Optional[Tuple[int, int]] = None
+_listeners: List[SettingsListener] = []
+_watcher: Optional[threading.Thread] = None
+_watcher_stop = threading.Event()
 
 
 def _ensure_settings_file() -> None:
@@ -42,23 +58,108 @@ def _merge_settings(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str
     return result
 
 
-def load_detection_settings() -> Dict[str, Any]:
+def _file_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        stat = SETTINGS_FILE.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _read_settings_file(strict: bool = False) -> Dict[str, Any]:
+    """
+    strict=True: битый или недописанный файл — ValueError вместо настроек
+    по умолчанию (перечитывание не должно сбрасывать рабочие настройки).
+    """
     _ensure_settings_file()
     raw = SETTINGS_FILE.read_text(encoding="utf-8")
     try:
         data = json.loads(raw)
-    except json.JSONDecodeError:
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    except ValueError:
+        if strict:
+            raise
         data = {}
-    merged = _merge_settings(DEFAULT_SETTINGS, data)
-    return merged
+    return _merge_settings(DEFAULT_SETTINGS, data)
+
+
+def _write_settings_file(settings: Dict[str, Any]) -> None:
+    """Пишет во временный файл рядом и атомарно подменяет настройки."""
+    SETTINGS_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=SETTINGS_DIR, prefix=".detection_settings.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, SETTINGS_FILE)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _set_cache(settings: Dict[str, Any], stamp: Optional[Tuple[int, int]]) -> Optional[Dict[str, Any]]:
+    """Returns the previous settings if they changed, otherwise None."""
+    global _cache, _cache_stamp
+    previous = _cache
+    _cache = deepcopy(settings)
+    _cache_stamp = stamp
+    if previous is not None and previous != _cache:
+        return previous
+    return None
+
+
+def _notify(settings: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    for listener in list(_listeners):
+        try:
+            listener(deepcopy(settings), deepcopy(previous))
+        except Exception as e:
+            print(f"Detection settings listener failed: {e}")
+
+
+def load_detection_settings() -> Dict[str, Any]:
+    with _settings_lock:
+        if _cache is None:
+            stamp = _file_stamp()
+            _set_cache(_read_settings_file(), stamp)
+        return deepcopy(_cache)
+
+
+def reload_detection_settings() -> Dict[str, Any]:
+    """
+    Перечитывает файл, если он изменился на диске; оповещает подписчиков.
+    Если файл не разбирается (внешний редактор ещё пишет его), остаются
+    прежние настройки; умолчания — только при первой загрузке.
+    """
+    global _invalid_stamp
+    with _settings_lock:
+        stamp = _file_stamp()
+        if _cache is not None and stamp in (_cache_stamp, _invalid_stamp):
+            return deepcopy(_cache)
+        # штамп до чтения: правка во время чтения подхватится следующей проверкой
+        try:
+            settings = _read_settings_file(strict=_cache is not None)
+        except ValueError as e:
+            _invalid_stamp = stamp
+            print(f"Detection settings file is invalid, keeping previous settings: {e}")
+            return deepcopy(_cache)
+        _invalid_stamp = None
+        previous = _set_cache(settings, stamp)
+    if previous is not None:
+        _notify(settings, previous)
+    return deepcopy(settings)
 
 
 def save_detection_settings(settings: Dict[str, Any]) -> Dict[str, Any]:
     with _settings_lock:
-        SETTINGS_FILE.write_text(
-            json.dumps(settings, ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+        _write_settings_file(settings)
+        previous = _set_cache(settings, _file_stamp())
+    if previous is not None:
+        _notify(settings, previous)
     return settings
 
 
@@ -66,14 +167,57 @@ def update_detection_settings(partial: Dict[str, Any]) -> Dict[str, Any]:
     with _settings_lock:
         current = load_detection_settings()
         updated = _merge_settings(current, partial)
-        save_detection_settings(updated)
-        return updated
+        _write_settings_file(updated)
+        previous = _set_cache(updated, _file_stamp())
+    if previous is not None:
+        _notify(updated, previous)
+    return updated
 
 
 def reset_detection_settings() -> Dict[str, Any]:
-    with _settings_lock:
-        save_detection_settings(DEFAULT_SETTINGS)
-        return deepcopy(DEFAULT_SETTINGS)
+    return deepcopy(save_detection_settings(deepcopy(DEFAULT_SETTINGS)))
+
+
+# ---------------------- change subscribers ----------------------
+def subscribe(listener: SettingsListener) -> Callable[[], None]:
+    """
+    listener(new_settings, old_settings) is called after every change: writes
+    through this module and external edits picked up by the watcher.
+    Returns a function that unsubscribes.
+    """
+    _listeners.append(listener)
+
+    def unsubscribe() -> None:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+    return unsubscribe
+
+
+def start_settings_watcher(interval: float = 1.0) -> None:
+    """Фоновая проверка mtime файла: внешние правки применяются без рестарта."""
+    global _watcher
+    if _watcher is not None and _watcher.is_alive():
+        return
+    _watcher_stop.clear()
+
+    def watch() -> None:
+        while not _watcher_stop.wait(interval):
+            try:
+                reload_detection_settings()
+            except Exception as e:
+                print(f"Detection settings reload failed: {e}")
+
+    _watcher = threading.Thread(target=watch, name="settings-watcher", daemon=True)
+    _watcher.start()
+
+
+def stop_settings_watcher() -> None:
+    global _watcher
+    _watcher_stop.set()
+    if _watcher is not None:
+        _watcher.join(timeout=2)
+        _watcher = None
 
 
 def get_public_detection_settings(settings: Dict[str, Any] | None = None) -> Dict[str, Any]:
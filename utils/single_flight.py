@@ -0,0 +1,75 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Runs one coroutine per key at a time and shares its result with every
+    concurrent caller. Successful results are kept for ``ttl`` seconds
+    (bounded by ``max_items``); failures are never cached. If the caller
+    running the coroutine is cancelled, the others do not inherit the
+    cancellation: one of them runs it again.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_items: int = 256):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._results: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def _cached(self, key: Hashable) -> Tuple[bool, Any]:
+        item = self._results.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._results[key]
+            return False, None
+        self._results.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        self._results[key] = (time.monotonic() + self.ttl, value)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_items:
+            self._results.popitem(last=False)
+
+    def forget(self, key: Hashable) -> None:
+        self._results.pop(key, None)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        found, value = self._cached(key)
+        if found:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # отменили нас самих
+                # владельца отменили — выполняем fn сами (или ждём нового владельца)
+                return await self.do(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved, the caller re-raises it
+            raise
+        else:
+            self._store(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
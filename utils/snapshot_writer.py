@@ -0,0 +1,277 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SNAPSHOT_ROOT = Path("detect_image")
+
+
+def snapshot_path(digest: str, created_at: datetime, ext: str = "jpg") -> str:
+    """Relative path: YYYY/MM/DD/<2 hex>/<sha256>.<ext>."""
+    return f"{created_at:%Y/%m/%d}/{digest[:2]}/{digest}.{ext}"
+
+
+class SnapshotWriter:
+    """
+    Background writer for already-encoded images.
+
+    ``submit`` hashes the bytes, returns the final relative path at once and
+    hands the write to a worker thread through a bounded queue. If the queue
+    is full the snapshot is dropped, so the detection loop never waits on
+    disk. Files are content-addressed (sha256) under date shards, and
+    identical bytes on the same day are stored once.
+
+    A SQLite index keeps one row per file (size, last use) and one row per
+    submit (camera, event, track, kind), so a deduplicated file stays
+    findable by every event that produced it. Files not used for
+    ``max_age_days`` are removed, and the least recently used files are
+    removed while the total size is over ``max_bytes``.
+    """
+
+    _default: Optional["SnapshotWriter"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        root: Path = SNAPSHOT_ROOT,
+        index_path: Optional[Path] = None,
+        max_queue: int = 64,
+        max_bytes: int = 2 * 1024 ** 3,
+        max_age_days: float = 30.0,
+        retention_interval: float = 60.0,
+    ):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.retention_interval = retention_interval
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        # индекс лежит рядом с папкой, а не в ней: папка раздаётся как статика
+        self.index_path = Path(index_path) if index_path else self.root.with_name(f"{self.root.name}_index.sqlite3")
+        self._db = sqlite3.connect(str(self.index_path), check_same_thread=False)
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # snapshots — файлы (created_at — последнее использование),
+            # snapshot_refs — кто и когда на файл сослался
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshots ("
+                "path TEXT PRIMARY KEY, sha256 TEXT NOT NULL, size INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_snapshots_created_at ON snapshots (created_at)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snapshot_refs ("
+                "path TEXT NOT NULL, created_at REAL NOT NULL, "
+                "camera_id TEXT, event_id TEXT, track_id INTEGER, kind TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_snapshot_refs_path ON snapshot_refs (path)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_snapshot_refs_event_id ON snapshot_refs (event_id)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS ix_snapshot_refs_camera_created ON snapshot_refs (camera_id, created_at)")
+            self._db.commit()
+
+        self.written = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.removed = 0
+        self._last_retention = 0.0
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def default(cls) -> "SnapshotWriter":
+        """Один писатель на процесс — все камеры делят очередь и квоту."""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    # ---------------------- producer ----------------------
+    def submit(
+        self,
+        data: bytes,
+        camera_id: Optional[str] = None,
+        event_id: Optional[str] = None,
+        track_id: Optional[int] = None,
+        kind: str = "frame",
+        ext: str = "jpg",
+    ) -> Optional[str]:
+        """Returns the relative path the snapshot will have, or None if dropped."""
+        if not data:
+            return None
+        now = time.time()
+        digest = hashlib.sha256(data).hexdigest()
+        path = snapshot_path(digest, datetime.fromtimestamp(now), ext)
+        item = {
+            "path": path,
+            "sha256": digest,
+            "data": data,
+            "created_at": now,
+            "camera_id": camera_id,
+            "event_id": event_id,
+            "track_id": track_id,
+            "kind": kind,
+        }
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return path
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ждёт, пока очередь опустеет (для остановки сервиса). True — всё записано."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                print(f"Snapshot writer: {self._queue.qsize()} snapshots not written on shutdown")
+                return False
+            time.sleep(0.05)
+        return True
+
+    # ---------------------- worker ----------------------
+    def _run(self) -> None:
+        while True:
+            try:
+                item = self._queue.get(timeout=self.retention_interval)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                try:
+                    self._write(item)
+                except Exception as e:
+                    print(f"Snapshot writer: failed to write {item['path']}: {e}")
+                finally:
+                    self._queue.task_done()
+            if time.monotonic() - self._last_retention >= self.retention_interval:
+                self._last_retention = time.monotonic()
+                try:
+                    self.enforce_retention()
+                except Exception as e:
+                    print(f"Snapshot writer: retention failed: {e}")
+
+    def _write(self, item: Dict[str, Any]) -> None:
+        target = self.root / item["path"]
+        if target.exists():
+            self.deduplicated += 1
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(target.suffix + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(item["data"])
+            os.replace(tmp, target)
+            self.written += 1
+        with self._db_lock:
+            # повторное использование файла продлевает ему жизнь
+            self._db.execute(
+                "INSERT INTO snapshots (path, sha256, size, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET created_at = MAX(created_at, excluded.created_at)",
+                (item["path"], item["sha256"], len(item["data"]), item["created_at"]),
+            )
+            self._db.execute(
+                "INSERT INTO snapshot_refs (path, created_at, camera_id, event_id, track_id, kind) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    item["path"], item["created_at"],
+                    item["camera_id"], item["event_id"], item["track_id"], item["kind"],
+                ),
+            )
+            self._db.commit()
+
+    # ---------------------- retention ----------------------
+    def _remove(self, paths: List[str]) -> None:
+        for path in paths:
+            try:
+                (self.root / path).unlink()
+            except FileNotFoundError:
+                pass
+        with self._db_lock:
+            self._db.executemany("DELETE FROM snapshots WHERE path = ?", [(p,) for p in paths])
+            self._db.executemany("DELETE FROM snapshot_refs WHERE path = ?", [(p,) for p in paths])
+            self._db.commit()
+        self.removed += len(paths)
+
+    def enforce_retention(self) -> int:
+        """Удаляет снимки, не использованные дольше max_age, и самые давние сверх квоты. Возвращает число удалённых."""
+        removed = 0
+        cutoff = time.time() - self.max_age
+        with self._db_lock:
+            expired = [row[0] for row in self._db.execute("SELECT path FROM snapshots WHERE created_at < ?", (cutoff,))]
+        if expired:
+            self._remove(expired)
+            removed += len(expired)
+
+        with self._db_lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM snapshots").fetchone()[0]
+        while total > self.max_bytes:
+            with self._db_lock:
+                oldest = self._db.execute(
+                    "SELECT path, size FROM snapshots ORDER BY created_at LIMIT 500"
+                ).fetchall()
+            if not oldest:
+                break
+            batch = []
+            for path, size in oldest:
+                batch.append(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+            self._remove(batch)
+            removed += len(batch)
+        return removed
+
+    # ---------------------- lookups ----------------------
+    def find(
+        self,
+        event_id: Optional[str] = None,
+        camera_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """Одна строка на ссылку: один файл находится по каждому событию, которое его записало."""
+        clauses, params = [], []
+        if event_id:
+            clauses.append("r.event_id = ?")
+            params.append(event_id)
+        if camera_id:
+            clauses.append("r.camera_id = ?")
+            params.append(camera_id)
+        if since is not None:
+            clauses.append("r.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("r.created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        columns = ("path", "sha256", "size", "created_at", "camera_id", "event_id", "track_id", "kind")
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT r.path, f.sha256, f.size, r.created_at, r.camera_id, r.event_id, r.track_id, r.kind "
+                f"FROM snapshot_refs r JOIN snapshots f ON f.path = r.path {where} "
+                "ORDER BY r.created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._db_lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        return {
+            "files": count,
+            "total_bytes": total,
+            "max_bytes": self.max_bytes,
+            "pending": self.pending(),
+            "written": self.written,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "removed": self.removed,
+        }
@@ -0,0 +1,126 @@
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+HOST = socket.gethostname()
+
+
+class Trace:
+    """
+    Frame-to-decision trace of one entry event.
+
+    It starts when the frame is captured (monotonic ``captured_at`` plus the
+    frame sequence number). ``mark(stage)`` closes a span that runs from the
+    end of the previous span to now. Offsets are kept in ms from capture, so
+    the end of the last span is the car-at-gate to barrier-up time.
+
+    The detector puts its spans into the entry event (``to_dict``). The API
+    continues the same trace with ``from_dict``. time.monotonic() is shared
+    by all processes on one host. If the event came from another host,
+    wall-clock time is used instead, which is less precise.
+    """
+
+    __slots__ = ("seq", "captured_at", "captured_ts", "host", "spans", "_lock")
+
+    def __init__(self, seq: int, captured_at: float, captured_ts: Optional[float] = None, host: str = HOST):
+        self.seq = seq
+        self.captured_at = captured_at
+        self.captured_ts = captured_ts if captured_ts is not None else time.time() - (time.monotonic() - captured_at)
+        self.host = host
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _now_ms(self) -> float:
+        if self.host == HOST:
+            return (time.monotonic() - self.captured_at) * 1000
+        return (time.time() - self.captured_ts) * 1000
+
+    @property
+    def end_ms(self) -> float:
+        return self.spans[-1]["end_ms"] if self.spans else 0.0
+
+    def mark(self, stage: str, at: Optional[float] = None) -> None:
+        """Закрывает стадию stage: от конца предыдущей до at (monotonic) или до сейчас."""
+        end = (at - self.captured_at) * 1000 if at is not None else self._now_ms()
+        with self._lock:
+            start = self.end_ms
+            self.spans.append({"stage": stage, "start_ms": round(start, 3), "end_ms": round(max(end, start), 3)})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [dict(span) for span in self.spans]
+        return {
+            "seq": self.seq,
+            "captured_at": self.captured_at,
+            "captured_ts": self.captured_ts,
+            "host": self.host,
+            "total_ms": spans[-1]["end_ms"] if spans else 0.0,
+            "spans": spans,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["Trace"]:
+        if not isinstance(data, dict) or "captured_at" not in data:
+            return None
+        trace = cls(
+            seq=data.get("seq", 0),
+            captured_at=data["captured_at"],
+            captured_ts=data.get("captured_ts"),
+            host=data.get("host", HOST),
+        )
+        trace.spans = [dict(span) for span in data.get("spans", [])]
+        return trace
+
+
+class TraceRegistry:
+    """
+    Traces of recent entry events, keyed by (camera_id, event_id).
+
+    The decision path and the barrier controller find the trace of an event
+    here. The API serves fresh traces from here, before the access log is
+    flushed to the DB. Bounded LRU.
+    """
+
+    def __init__(self, max_items: int = 1000):
+        self.max_items = max_items
+        self._items: "OrderedDict[Tuple[Optional[str], Optional[str]], Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, event: Dict[str, Any]) -> Optional[Trace]:
+        """Trace события (продолжение трейса детектора); повторный вызов возвращает тот же объект."""
+        key = (event.get("camera_id"), event.get("event_id"))
+        with self._lock:
+            trace = self._items.get(key)
+            if trace is not None:
+                self._items.move_to_end(key)
+                return trace
+        trace = Trace.from_dict(event.get("trace"))
+        if trace is None:
+            return None
+        with self._lock:
+            trace = self._items.setdefault(key, trace)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return trace
+
+    def get(self, camera_id: Optional[str], event_id: Optional[str]) -> Optional[Trace]:
+        with self._lock:
+            return self._items.get((camera_id, event_id))
+
+    def find(self, event_id: str) -> Optional[Trace]:
+        with self._lock:
+            for (_, item_event_id), trace in reversed(self._items.items()):
+                if item_event_id == event_id:
+                    return trace
+        return None
+
+    def mark(self, camera_id: Optional[str], event_id: Optional[str], stage: str) -> None:
+        trace = self.get(camera_id, event_id)
+        if trace is not None:
+            trace.mark(stage)
+
+
+traces = TraceRegistry()
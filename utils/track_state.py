@@ -0,0 +1,146 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from utils.vehicle_events import new_event_id
+
+SEEN = "seen"
+ENTERED = "entered"
+EXITED = "exited"
+
+
+@dataclass
+class TrackState:
+    track_id: int
+    zone: str
+    first_seen: float
+    last_seen: float
+    phase: str = SEEN
+    entered_at: Optional[float] = None
+    exited_at: Optional[float] = None
+    event_id: Optional[str] = None
+    in_streak: int = 0
+    out_streak: int = 0
+
+    @property
+    def dwell(self) -> float:
+        if self.entered_at is None:
+            return 0.0
+        end = self.exited_at if self.exited_at is not None else self.last_seen
+        return max(0.0, end - self.entered_at)
+
+    def to_dict(self) -> Dict:
+        return {
+            "track_id": self.track_id,
+            "zone": self.zone,
+            "phase": self.phase,
+            "first_seen": self.first_seen,
+            "entered_at": self.entered_at,
+            "exited_at": self.exited_at,
+            "dwell": round(self.dwell, 3),
+            "event_id": self.event_id,
+        }
+
+
+class TrackStateMachine:
+    """
+    Per-track, per-zone presence with debounce and hysteresis.
+
+    A track enters a zone after ``enter_frames`` consecutive frames inside it.
+    It exits after ``exit_frames`` consecutive frames outside, or when it has
+    not been detected at all for ``exit_grace`` seconds. Shorter detection
+    dropouts are ignored, so one missed frame does not produce an exit and a
+    new entry. States not updated for ``stale_after`` seconds are removed.
+
+    ``update`` returns compact events:
+        {"type": "enter"|"exit", "track_id", "zone", "event_id", "ts", "dwell"}
+    """
+
+    def __init__(self, enter_frames: int = 2, exit_frames: int = 5, exit_grace: float = 1.5, stale_after: float = 10.0):
+        self.enter_frames = enter_frames
+        self.exit_frames = exit_frames
+        self.exit_grace = exit_grace
+        self.stale_after = stale_after
+        self.states: Dict[Tuple[int, str], TrackState] = {}
+        # update идёт в потоке детекции, snapshot — из обработчиков API
+        self._lock = threading.Lock()
+
+    def _event(self, kind: str, state: TrackState, now: float) -> Dict:
+        return {
+            "type": kind,
+            "track_id": state.track_id,
+            "zone": state.zone,
+            "event_id": state.event_id,
+            "ts": now,
+            "dwell": round(state.dwell, 3),
+        }
+
+    def _enter(self, state: TrackState, now: float) -> Dict:
+        state.phase = ENTERED
+        state.entered_at = now
+        state.exited_at = None
+        state.event_id = new_event_id()
+        return self._event("enter", state, now)
+
+    def _exit(self, state: TrackState, now: float, exited_at: float) -> Dict:
+        state.phase = EXITED
+        state.exited_at = exited_at
+        event = self._event("exit", state, now)
+        state.in_streak = 0
+        return event
+
+    def update(self, observations: Dict[int, Set[str]], zones: Iterable[str], now: Optional[float] = None) -> List[Dict]:
+        """
+        observations: track_id -> names of the zones its anchor is in on this
+        frame. ``zones`` lists every zone being watched.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._update(observations, set(zones), now)
+
+    def _update(self, observations: Dict[int, Set[str]], zones: Set[str], now: float) -> List[Dict]:
+        events: List[Dict] = []
+
+        for track_id, inside in observations.items():
+            for zone in zones:
+                key = (track_id, zone)
+                state = self.states.get(key)
+                if state is None:
+                    state = self.states[key] = TrackState(track_id=track_id, zone=zone, first_seen=now, last_seen=now)
+                state.last_seen = now
+
+                if zone in inside:
+                    state.in_streak += 1
+                    state.out_streak = 0
+                    if state.phase != ENTERED and state.in_streak >= self.enter_frames:
+                        events.append(self._enter(state, now))
+                else:
+                    state.out_streak += 1
+                    state.in_streak = 0
+                    if state.phase == ENTERED and state.out_streak >= self.exit_frames:
+                        events.append(self._exit(state, now, now))
+
+        # треки, которых нет на кадре (или зоны, которые убрали):
+        # выход по таймауту и сборка мусора
+        for key, state in list(self.states.items()):
+            if key[0] in observations and key[1] in zones:
+                continue
+            missing_for = now - state.last_seen
+            if state.phase == ENTERED and missing_for >= self.exit_grace:
+                events.append(self._exit(state, now, state.last_seen))
+            elif state.phase != ENTERED:
+                # пропуск кадра обнуляет накопление въезда
+                state.in_streak = 0
+            if missing_for >= self.stale_after and state.phase != ENTERED:
+                del self.states[key]
+
+        return events
+
+    def inside(self, zone: str) -> List[TrackState]:
+        with self._lock:
+            return [s for s in self.states.values() if s.zone == zone and s.phase == ENTERED]
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [s.to_dict() for s in self.states.values()]
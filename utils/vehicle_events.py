@@ -0,0 +1,47 @@
+import json
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+# Redis keys written by the detector when a vehicle enters the region.
+# The unprefixed keys hold the latest event of any camera (legacy consumers),
+# the "<camera_id>_" ones are per camera.
+VEHICLE_IN_KEY = "vehicle_in"
+VEHICLE_EVENT_KEY = "vehicle_in_event"
+
+# Pub/Sub channel with region "enter"/"exit" events for push-based consumers
+VEHICLE_EVENTS_CHANNEL = "vehicle_events"
+
+
+def vehicle_in_key(camera_id: Optional[str] = None) -> str:
+    return f"{camera_id}_{VEHICLE_IN_KEY}" if camera_id else VEHICLE_IN_KEY
+
+
+def vehicle_event_key(camera_id: Optional[str] = None) -> str:
+    return f"{camera_id}_{VEHICLE_EVENT_KEY}" if camera_id else VEHICLE_EVENT_KEY
+
+
+# crop каждого въезда хранится и под своим event_id: пока решение считается,
+# следующая машина в той же зоне перезаписывает ключи камеры
+VEHICLE_CROP_TTL = 300
+
+
+def vehicle_crop_key(camera_id: Optional[str], event_id: str) -> str:
+    return f"{camera_id or ''}_{VEHICLE_IN_KEY}:{event_id}"
+
+
+def new_event_id() -> str:
+    return uuid4().hex
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+
+def decode_event(raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+
@@ -0,0 +1,107 @@
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Mapping, Optional, Tuple
+
+VEHICLE_FIELDS = ("license_plate", "owner_name", "notes", "is_active")
+EXPORT_FIELDS = ("id",) + VEHICLE_FIELDS + ("created_at",)
+
+ImportRecord = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Splits a streamed UTF-8 body into numbered lines as chunks arrive.
+    A BOM is dropped; a multi-byte character split between chunks is handled
+    by the incremental decoder.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield line_no + 1, buffer.rstrip("\r")
+
+
+async def iter_import_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ImportRecord]:
+    """
+    Yields (line number, record, error) for every non-empty data line.
+
+    csv    — header line with column names (license_plate, owner_name, notes,
+             is_active in any order, unknown columns ignored). A quoted field
+             cannot span lines.
+    ndjson — one JSON object per line.
+    """
+    header: Optional[list] = None
+    async for line_no, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if fmt == "ndjson":
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, None, f"invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, record, None
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            if "license_plate" not in header or "owner_name" not in header:
+                yield line_no, None, "CSV header must contain license_plate and owner_name"
+                return
+            continue
+        if len(values) > len(header):
+            yield line_no, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        record = {name: value for name, value in zip(header, values) if name in VEHICLE_FIELDS}
+        # пустой is_active — значение по умолчанию
+        if not record.get("is_active", "").strip():
+            record.pop("is_active", None)
+        yield line_no, record, None
+
+
+def _export_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def export_csv(rows: AsyncIterator[Mapping[str, Any]], batch_size: int = 500) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    count = 0
+    async for row in rows:
+        writer.writerow([_export_value(row[name]) for name in EXPORT_FIELDS])
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def export_ndjson(rows: AsyncIterator[Mapping[str, Any]], batch_size: int = 500) -> AsyncIterator[str]:
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps({name: _export_value(row[name]) for name in EXPORT_FIELDS}, ensure_ascii=False))
+        if len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def format_validation_errors(errors: Iterable[Dict[str, Any]]) -> str:
+    return "; ".join(f"{'.'.join(map(str, e.get('loc', ()))) or 'row'}: {e.get('msg')}" for e in errors)
@@ -1,13 +1,17 @@
 import threading
 import time
 from pathlib import Path
-from typing import Callable, Dict, Iterator, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Optional, Tuple
 
 import cv2
 import numpy as np
-from ultralytics import YOLO
 
-from utils.settings_manager import load_detection_settings
+if TYPE_CHECKING:
+    # ultralytics тянет torch — модель создаёт model_loader, здесь нужен только тип
+    from ultralytics import YOLO
+
+from utils.metrics import StageRecorder, record_error
+from utils.settings_manager import load_detection_settings, subscribe
 
 DETECTION_CLASS_MAP = {
     "vehicles": [2, 3, 5, 7],  # car, motorcycle, bus, truck
@@ -16,40 +20,66 @@ DETECTION_CLASS_MAP = {
 
 FRAME_BOUNDARY = b"--frame"
 
+# повтор загрузки модели после ошибки: 0.5, 1, 2, 4, 5, 5... секунд
+MODEL_RETRY_BASE_SECONDS = 0.5
+MODEL_RETRY_MAX_SECONDS = 5.0
+
+
+def source_key(settings: Dict) -> Tuple:
+    """Settings that define the capture; only their change reopens the stream."""
+    source_type = settings.get("sourceType")
+    if source_type == "rtsp":
+        return source_type, settings.get("rtspUrl")
+    if source_type == "file":
+        return source_type, settings.get("videoFileName")
+    return (source_type,)
+
 
 class VideoStreamManager:
     def __init__(
         self,
         demo_dir: Path,
-        model_loader: Callable[[str], YOLO],
+        model_loader: Callable[[str], "YOLO"],
     ):
         self.demo_dir = demo_dir
         self.model_loader = model_loader
-        self.model_name = load_detection_settings().get("detectionModel", "yolo11l.pt")
+        self.settings = load_detection_settings()
+        self.model_name = self.settings.get("detectionModel", "yolo11l.pt")
         # Lazy-load model to avoid heavy operations during import/startup
         self.model = None
-        self.settings = load_detection_settings()
-        self.capture: Optional[cv2.VideoCapture] = None
+        self._model_lock = threading.Lock()
+        self._model_loading: Optional[str] = None
+        # последняя неудачная загрузка: модель, число ошибок подряд, когда повторять
+        self._model_failed: Optional[str] = None
+        self._model_failures = 0
+        self._model_retry_at = 0.0
+        self._reopen = threading.Event()
         self.thread: Optional[threading.Thread] = None
-        self.running = False
+        # у каждого потока своё событие остановки: поток, не успевший выйти
+        # за stop(), не оживает от следующего start()
+        self._stop_event: Optional[threading.Event] = None
         self.frame_lock = threading.Lock()
         self.latest_frame = self._create_placeholder("Источник не настроен")
         self.active_clients = 0
+        self.metrics = StageRecorder("stream")
+        # изменения настроек (API или правка файла) применяются сами
+        self._unsubscribe = subscribe(self._on_settings_changed)
 
     def start(self) -> None:
-        if self.thread and self.thread.is_alive():
+        if self.thread and self.thread.is_alive() and not self._stop_event.is_set():
             return
-        self.running = True
-        self.thread = threading.Thread(target=self._process_loop, daemon=True)
+        stop = threading.Event()
+        self._stop_event = stop
+        self.thread = threading.Thread(target=self._process_loop, args=(stop,), daemon=True)
         self.thread.start()
 
     def stop(self) -> None:
         if not self.thread:
             return
-        self.running = False
-        if self.capture:
-            self.capture.release()
-            self.capture = None
+        # захват закрывает сам поток: release() во время read() в другом
+        # потоке роняет OpenCV (SIGSEGV). Поток, застрявший в read() дольше
+        # join, доработает со своим захватом и выйдет сам
+        self._stop_event.set()
         self.thread.join(timeout=1)
         self.thread = None
 
@@ -60,16 +90,79 @@ class VideoStreamManager:
             self.start()
 
     def update_settings(self, settings: Dict, restart: bool = True) -> None:
+        """
+        Настройки применяются на лету со следующего кадра. Захват
+        переоткрывается (в том же потоке, без остановки) только если
+        сменился источник и restart=True.
+        """
+        source_changed = source_key(settings) != source_key(self.settings)
         self.settings = settings
-        if restart:
-            self.restart()
+        if source_changed and restart:
+            self._reopen.set()
 
-    def update_model(self, model_name: str, restart: bool = True) -> None:
+    def update_model(self, model_name: str) -> None:
+        """
+        Новая модель грузится в фоне; до замены кадры идут через текущую.
+        Замена — одно присваивание между кадрами, захват не трогается.
+        """
+        if model_name == self.model_name and (self.model is not None or self._model_loading == model_name):
+            return
         self.model_name = model_name
-        # reset model so it will be loaded lazily on first inference
-        self.model = None
-        if restart:
-            self.restart()
+        if self.model is None and not (self.thread and self.thread.is_alive()):
+            # поток не запущен — загрузится лениво на первом кадре
+            return
+        self._load_model_async(model_name)
+
+    def _load_model_async(self, model_name: str) -> None:
+        with self._model_lock:
+            if self._model_loading == model_name:
+                return
+            if self._model_failed == model_name and time.monotonic() < self._model_retry_at:
+                return
+            self._model_loading = model_name
+
+        def load() -> None:
+            try:
+                model = self.model_loader(model_name)
+            except Exception as e:
+                print(f"Failed to load YOLO model '{model_name}': {e}")
+                model = None
+            with self._model_lock:
+                if model is None:
+                    failures = self._model_failures + 1 if self._model_failed == model_name else 1
+                    self._model_failed, self._model_failures = model_name, failures
+                    delay = min(MODEL_RETRY_MAX_SECONDS, MODEL_RETRY_BASE_SECONDS * 2 ** (failures - 1))
+                    self._model_retry_at = time.monotonic() + delay
+                elif self._model_failed == model_name:
+                    self._model_failed, self._model_failures = None, 0
+                # пока грузили, могли выбрать другую модель — эту выбрасываем
+                if self._model_loading == model_name:
+                    self._model_loading = None
+                    if model is not None and self.model_name == model_name:
+                        self.model = model
+
+        threading.Thread(target=load, name=f"model-load-{model_name}", daemon=True).start()
+
+    def warm_up(self) -> str:
+        """
+        Загружает модель текущих настроек и делает пробный инференс, чтобы
+        первый кадр потока не ждал ни загрузки, ни инициализации бэкенда.
+        """
+        model_name = self.model_name
+        model = self.model if self.model is not None else self.model_loader(model_name)
+        target = self.settings.get("detectionTarget", "vehicles")
+        model(np.zeros((480, 640, 3), dtype=np.uint8), classes=DETECTION_CLASS_MAP.get(target, [0]), verbose=False)
+        with self._model_lock:
+            # пока грели, могли выбрать другую модель — эту не подставляем
+            if self.model is None and self.model_name == model_name:
+                self.model = model
+        return model_name
+
+    def _on_settings_changed(self, settings: Dict, previous: Dict) -> None:
+        model_name = settings.get("detectionModel", "yolo11l.pt")
+        if model_name != self.model_name:
+            self.update_model(model_name)
+        self.update_settings(settings)
 
     def get_frame_bytes(self) -> bytes:
         with self.frame_lock:
@@ -93,43 +186,74 @@ class VideoStreamManager:
             if self.active_clients == 0:
                 self.stop()
 
-    def _process_loop(self) -> None:
-        while self.running:
-            try:
-                if not self.capture or not self.capture.isOpened():
-                    self.capture = self._open_capture()
-                    if not self.capture or not self.capture.isOpened():
-                        self._set_placeholder("Ожидание источника")
-                        time.sleep(1)
-                        continue
-
-                ok, frame = self.capture.read()
-                if not ok or frame is None:
-                    if self.settings.get("sourceType") == "file" and self.capture:
-                        self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        continue
-                    else:
-                        if self.capture:
-                            self.capture.release()
-                            self.capture = None
-                        time.sleep(1)
-                        continue
-
-                processed = self._run_detection(frame)
-                success, buffer = cv2.imencode(".jpg", processed)
-                if success:
-                    data = buffer.tobytes()
-                    with self.frame_lock:
-                        self.latest_frame = data
-                else:
-                    self._set_placeholder("Ошибка кодирования кадра")
-
-            except Exception:
-                self._set_placeholder("Ошибка обработки потока")
-                if self.capture:
-                    self.capture.release()
-                    self.capture = None
-                time.sleep(1)
+    def _process_loop(self, stop: threading.Event) -> None:
+        # захват живёт только в этом потоке — другой поток его не прочитает
+        # и не закроет
+        capture: Optional[cv2.VideoCapture] = None
+        try:
+            while not stop.is_set():
+                capture = self._capture_frame(capture, stop)
+        finally:
+            if capture:
+                capture.release()
+
+    def _capture_frame(self, capture: Optional[cv2.VideoCapture], stop: threading.Event) -> Optional[cv2.VideoCapture]:
+        """Один шаг цикла; возвращает захват для следующего шага."""
+        try:
+            if self._reopen.is_set():
+                self._reopen.clear()
+                if capture:
+                    capture.release()
+                    capture = None
+                self._set_placeholder("Переключение источника")
+
+            if not capture or not capture.isOpened():
+                capture = self._open_capture()
+                if not capture or not capture.isOpened():
+                    self._set_placeholder("Ожидание источника")
+                    stop.wait(1)
+                    return capture
+
+            t0 = time.perf_counter()
+            ok, frame = capture.read()
+            if not ok or frame is None:
+                self.metrics.frame("read_failed")
+                if self.settings.get("sourceType") == "file":
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    return capture
+                capture.release()
+                stop.wait(1)
+                return None
+
+            t_read = time.perf_counter()
+            processed = self._run_detection(frame)
+            t_detect = time.perf_counter()
+            success, buffer = cv2.imencode(".jpg", processed)
+            t_encode = time.perf_counter()
+            self.metrics.observe("read", t_read - t0)
+            self.metrics.observe("detect", t_detect - t_read)
+            self.metrics.observe("encode", t_encode - t_detect)
+            if stop.is_set():
+                # поток уже остановлен — кадр не перетирает вывод нового
+                return capture
+            if success:
+                data = buffer.tobytes()
+                with self.frame_lock:
+                    self.latest_frame = data
+                self.metrics.frame("processed")
+            else:
+                self.metrics.frame("encode_failed")
+                self._set_placeholder("Ошибка кодирования кадра")
+            return capture
+
+        except Exception as e:
+            record_error("video_stream", e)
+            print(f"Video stream error: {type(e).__name__}: {e}")
+            self._set_placeholder("Ошибка обработки потока")
+            if capture:
+                capture.release()
+            stop.wait(1)
+            return None
 
     def _open_capture(self) -> Optional[cv2.VideoCapture]:
         source_type = self.settings.get("sourceType")
@@ -151,14 +275,12 @@ class VideoStreamManager:
 
         target = self.settings.get("detectionTarget", "vehicles")
         classes = DETECTION_CLASS_MAP.get(target, [0])
-        # load model lazily if needed
-        if self.model is None:
-            try:
-                self.model = self.model_loader(self.model_name)
-            except Exception:
-                # if model cannot be loaded, return original frame
-                return frame
-        results = self.model(frame, classes=classes)
+        # модель грузится в фоне; пока её нет, отдаём кадр без разметки
+        model = self.model
+        if model is None:
+            self._load_model_async(self.model_name)
+            return frame
+        results = model(frame, classes=classes)
         annotated = results[0].plot()
         return annotated
 
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+
+class WriteBehindQueue:
+    """
+    Asynchronous write-behind buffer.
+
+    ``put`` never blocks or awaits. It appends to an in-memory queue and
+    returns, so callers on a latency-sensitive path pay no I/O cost. A
+    background task drains the queue in batches of up to ``max_batch`` items.
+    It flushes as soon as a batch is full, or ``flush_interval`` seconds after
+    the first pending item. A failed batch is retried with backoff up to
+    ``max_retries`` times and then dropped. ``stop`` writes out what is left. When the queue is full the oldest
+    item is dropped. Both drop kinds are counted in ``stats``.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Awaitable[None]],
+        name: str = "write-behind",
+        max_batch: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        max_retries: int = 3,
+    ):
+        self.flush = flush
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self._items: Deque[Any] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_flush_ms: Optional[float] = None
+
+    # ---------------------- lifecycle ----------------------
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает фоновую задачу, дописав то, что успеет за timeout."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            print(f"{self.name}: {len(self._items)} items not written on shutdown")
+        self._task = None
+
+    # ---------------------- producer ----------------------
+    def put(self, item: Any) -> None:
+        if len(self._items) >= self.max_queue:
+            self._items.popleft()
+            self.dropped += 1
+        self._items.append(item)
+        if self._wakeup is not None and len(self._items) >= self.max_batch:
+            self._wakeup.set()
+
+    # ---------------------- consumer ----------------------
+    async def _run(self) -> None:
+        while not self._stopping:
+            # ждём полную пачку, но не дольше flush_interval
+            if len(self._items) < self.max_batch:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._items and not self._stopping:
+                await self._flush_batch()
+        # остановка: дописываем остаток без повторов
+        while self._items:
+            await self._flush_batch(retries=0)
+
+    async def _flush_batch(self, retries: Optional[int] = None) -> None:
+        batch = [self._items.popleft() for _ in range(min(self.max_batch, len(self._items)))]
+        retries = self.max_retries if retries is None else retries
+        try:
+            for attempt in range(retries + 1):
+                started = time.perf_counter()
+                try:
+                    await self.flush(batch)
+                except Exception as e:
+                    if attempt >= retries:
+                        self.failed += len(batch)
+                        print(f"{self.name}: dropping {len(batch)} items after error: {e}")
+                        return
+                    await asyncio.sleep(min(2 ** attempt, 10))
+                else:
+                    self.last_flush_ms = (time.perf_counter() - started) * 1000
+                    self.written += len(batch)
+                    return
+        except asyncio.CancelledError:
+            # не теряем пачку, если задачу отменили посреди записи
+            self._items.extendleft(reversed(batch))
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._items),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "last_flush_ms": self.last_flush_ms,
+        }
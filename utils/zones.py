@@ -0,0 +1,236 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+RegionType = Union[Tuple[int, int, int, int], List[Tuple[int, int]]]
+PointType = Tuple[int, int]
+
+# Default zone name for the single entry region of a camera
+REGION_ZONE = "region"
+# Label mask is uint64, one bit per zone
+MAX_ZONES = 64
+ZONE_COLOR = (0, 255, 0)
+LINE_COLOR = (0, 200, 255)
+
+
+def region_to_points(region: RegionType) -> np.ndarray:
+    """
+    region:
+      - (x1, y1, x2, y2)  -> rectangle
+      - [(x1,y1), (x2,y2), ...] -> polygon
+    """
+    if isinstance(region, tuple) and len(region) == 4:
+        x1, y1, x2, y2 = region
+        pts = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.int32)
+    else:
+        # assume polygon-like list of tuples
+        pts = np.array(region, dtype=np.int32)
+
+    # ensure shape (N, 2)
+    if pts.ndim != 2 or pts.shape[1] != 2 or len(pts) < 3:
+        raise ValueError("region must be (x1,y1,x2,y2) or list of (x,y) tuples")
+    return pts
+
+
+@dataclass
+class Zone:
+    name: str
+    points: np.ndarray
+
+
+@dataclass
+class CountingLine:
+    name: str
+    p1: PointType
+    p2: PointType
+    # "in" — crossing from the right-hand side of p1->p2 to the left-hand one
+    # (as seen on screen, y axis pointing down)
+    counts: Dict[str, int] = field(default_factory=lambda: {"in": 0, "out": 0})
+
+
+class ZoneEngine:
+    """
+    Named zones and counting lines of one camera.
+
+    Zones are rasterized once per frame size into a label mask where bit ``i``
+    marks zone ``i``. All box anchors are then hit-tested against all zones
+    in a single NumPy lookup. Line crossings are computed for all tracks at
+    once from each track's previous and current anchor point.
+    """
+
+    def __init__(self, max_track_age: int = 150):
+        self.zones: List[Zone] = []
+        self.lines: List[CountingLine] = []
+        self.max_track_age = max_track_age
+        self._lock = threading.Lock()
+        self._mask: Optional[np.ndarray] = None
+        self._mask_shape: Optional[Tuple[int, int]] = None
+        # track_id -> (x, y, frame_index) последней точки трека
+        self._last_points: Dict[int, Tuple[float, float, int]] = {}
+        self._frame_index = 0
+
+    # ---------------------- configuration ----------------------
+    def set_zone(self, name: str, region: RegionType) -> None:
+        zone = Zone(name=name, points=region_to_points(region))
+        with self._lock:
+            zones = [z for z in self.zones if z.name != name] + [zone]
+            if len(zones) > MAX_ZONES:
+                raise ValueError(f"at most {MAX_ZONES} zones per camera")
+            self.zones = zones
+            self._mask = None
+
+    def remove_zone(self, name: str) -> None:
+        with self._lock:
+            self.zones = [z for z in self.zones if z.name != name]
+            self._mask = None
+
+    def set_line(self, name: str, p1: PointType, p2: PointType) -> None:
+        line = CountingLine(name=name, p1=tuple(p1), p2=tuple(p2))
+        with self._lock:
+            self.lines = [l for l in self.lines if l.name != name] + [line]
+
+    def remove_line(self, name: str) -> None:
+        with self._lock:
+            self.lines = [l for l in self.lines if l.name != name]
+
+    def configure(self, zones: Dict[str, RegionType], lines: Dict[str, Tuple[PointType, PointType]]) -> None:
+        """Replaces all zones and lines at once."""
+        new_zones = [Zone(name=name, points=region_to_points(region)) for name, region in zones.items()]
+        if len(new_zones) > MAX_ZONES:
+            raise ValueError(f"at most {MAX_ZONES} zones per camera")
+        new_lines = [CountingLine(name=name, p1=tuple(p1), p2=tuple(p2)) for name, (p1, p2) in lines.items()]
+        with self._lock:
+            self.zones = new_zones
+            self.lines = new_lines
+            self._mask = None
+
+    # ---------------------- hit testing ----------------------
+    def _label_mask(self, shape: Tuple[int, ...]) -> np.ndarray:
+        h, w = shape[:2]
+        mask = self._mask
+        if mask is not None and self._mask_shape == (h, w):
+            return mask
+
+        mask = np.zeros((h, w), dtype=np.uint64)
+        layer = np.zeros((h, w), dtype=np.uint8)
+        for i, zone in enumerate(self.zones):
+            layer.fill(0)
+            cv2.fillPoly(layer, [zone.points.reshape((-1, 1, 2))], 1)
+            mask[layer.astype(bool)] |= np.uint64(1 << i)
+
+        self._mask, self._mask_shape = mask, (h, w)
+        return mask
+
+    def hit_test(self, points: np.ndarray, shape: Tuple[int, ...]) -> Tuple[np.ndarray, List[str]]:
+        """
+        points: (N, 2) array of x, y. Returns a bool matrix (N, n_zones) and
+        the zone names for its columns. Points outside the frame are outside
+        every zone.
+        """
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        with self._lock:
+            names = [zone.name for zone in self.zones]
+            if not names or len(points) == 0:
+                return np.zeros((len(points), len(names)), dtype=bool), names
+            mask = self._label_mask(shape)
+
+        h, w = mask.shape
+        xs, ys = points[:, 0], points[:, 1]
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        labels = np.zeros(len(points), dtype=np.uint64)
+        labels[inside] = mask[ys[inside], xs[inside]]
+
+        bits = np.arange(len(names), dtype=np.uint64)
+        return ((labels[:, None] >> bits[None, :]) & np.uint64(1)).astype(bool), names
+
+    # ---------------------- line crossing ----------------------
+    def update_tracks(self, track_ids: Sequence[int], points: np.ndarray) -> List[Dict]:
+        """
+        Remembers the anchor point of every track and returns line crossings
+        since the previous call: [{"line", "track_id", "direction"}, ...].
+        """
+        self._frame_index += 1
+        crossings: List[Dict] = []
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        lines = self.lines
+        if lines and len(track_ids):
+            known = [i for i, tid in enumerate(track_ids) if tid in self._last_points]
+            if known:
+                prev = np.array([self._last_points[track_ids[i]][:2] for i in known])
+                curr = points[known]
+                a = np.array([l.p1 for l in lines], dtype=np.float64)   # (L, 2)
+                b = np.array([l.p2 for l in lines], dtype=np.float64)   # (L, 2)
+                d = b - a
+
+                def side(p: np.ndarray) -> np.ndarray:
+                    # (T, L): сторона линии по знаку (p - a) x (b - a);
+                    # точка на самой линии относится к "+", чтобы не терять пересечение
+                    rel = p[:, None, :] - a[None, :, :]
+                    cross = rel[..., 0] * d[None, :, 1] - rel[..., 1] * d[None, :, 0]
+                    return np.where(cross >= 0, 1, -1)
+
+                s_prev, s_curr = side(prev), side(curr)
+                # отрезок трека тоже должен пересекать отрезок линии, а не её продолжение
+                move = curr - prev
+                def track_side(p: np.ndarray) -> np.ndarray:
+                    rel = p[None, :, :] - prev[:, None, :]
+                    return np.sign(rel[..., 0] * move[:, None, 1] - rel[..., 1] * move[:, None, 0])
+
+                crossed = (s_prev * s_curr < 0) & (track_side(a) * track_side(b) <= 0)
+                for t, l in zip(*np.nonzero(crossed)):
+                    direction = "in" if s_prev[t, l] < 0 else "out"
+                    line = lines[l]
+                    line.counts[direction] += 1
+                    crossings.append({
+                        "line": line.name,
+                        "track_id": int(track_ids[known[t]]),
+                        "direction": direction,
+                    })
+
+        for tid, (x, y) in zip(track_ids, points):
+            self._last_points[tid] = (x, y, self._frame_index)
+        if self._frame_index % 30 == 0:
+            stale = self._frame_index - self.max_track_age
+            self._last_points = {k: v for k, v in self._last_points.items() if v[2] > stale}
+        return crossings
+
+    # ---------------------- drawing / status ----------------------
+    def draw(self, img: np.ndarray, alpha: float = 0.15) -> np.ndarray:
+        """Рисует полупрозрачные зоны с подписями и линии подсчёта."""
+        if not self.zones and not self.lines:
+            return img
+
+        out = img.copy()
+        if self.zones:
+            overlay = img.copy()
+            for zone in self.zones:
+                cv2.fillPoly(overlay, [zone.points.reshape((-1, 1, 2))], color=ZONE_COLOR)
+            cv2.addWeighted(overlay, alpha, out, 1 - alpha, 0, out)
+
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        for zone in self.zones:
+            pts = zone.points.reshape((-1, 1, 2))
+            cv2.polylines(out, [pts], isClosed=True, color=ZONE_COLOR, thickness=2)
+            x, y, _, _ = cv2.boundingRect(pts)
+            (tw, th), _ = cv2.getTextSize(zone.name, font, 0.6, 1)
+            cv2.rectangle(out, (x, y - th - 8), (x + tw + 8, y), ZONE_COLOR, -1)
+            cv2.putText(out, zone.name, (x + 4, y - 6), font, 0.6, (0, 0, 0), 1, cv2.LINE_AA)
+
+        for line in self.lines:
+            cv2.line(out, tuple(map(int, line.p1)), tuple(map(int, line.p2)), LINE_COLOR, 2)
+            text = f"{line.name} in:{line.counts['in']} out:{line.counts['out']}"
+            cv2.putText(out, text, (int(line.p1[0]), int(line.p1[1]) - 6), font, 0.5, LINE_COLOR, 1, cv2.LINE_AA)
+        return out
+
+    def to_dict(self) -> Dict:
+        return {
+            "zones": [{"name": z.name, "points": z.points.tolist()} for z in self.zones],
+            "lines": [
+                {"name": l.name, "p1": list(l.p1), "p2": list(l.p2), "counts": dict(l.counts)}
+                for l in self.lines
+            ],
+        }